@@ -6,6 +6,11 @@ from flask_wtf.csrf import CSRFProtect
 import os
 from app.utils import format_cop
 from flask_mail import Mail
+from app.utils.scheduler import TaskScheduler
+from app.utils.rate_limit import RateLimiter
+from app.utils.static_assets import StaticAssets
+from app.utils.image_processing import ImageProcessor
+from app.utils import uploads  # noqa: F401  Listeners que borran subidas sin referencias
 import logging
 
 # Definir extensiones
@@ -14,6 +19,10 @@ migrate = Migrate()
 login_manager = LoginManager()
 csrf = CSRFProtect()
 mail = Mail()
+scheduler = TaskScheduler()
+limiter = RateLimiter()
+static_assets = StaticAssets()
+image_processor = ImageProcessor()
 # Configuración de login
 login_manager.login_view = 'admin.login'  # Vista predeterminada para admin
 login_manager.login_message = 'Por favor, inicia sesión para acceder a esta página.'
@@ -108,6 +117,9 @@ def create_app(config_name='default'):
     from app.config import config_dict
     app.config.from_object(config_dict[config_name])
     mail.init_app(app)
+    limiter.init_app(app)
+    static_assets.init_app(app)  # url_for('static') con huella de contenido
+    image_processor.init_app(app)  # Verificación y derivados de imágenes subidas fuera del request
     
     # Integrar el manejador de errores personalizado
     try:
@@ -188,7 +200,14 @@ def create_app(config_name='default'):
     
     from app.barbero import bp as barbero_bp
     app.register_blueprint(barbero_bp, url_prefix='/barbero')
-    
+
+    # Planificador de tareas de mantenimiento (un solo worker por tarea vía lease en BD)
+    scheduler.init_app(app)
+
+    # Registrar comandos CLI de mantenimiento (`flask mantenimiento ...`)
+    from app.cli import register_cli
+    register_cli(app)
+
     return app
 
 
@@ -41,8 +41,10 @@ Resumen de formularios y validaciones
       consistencia si se habilita el acceso web.
 
 - ServicioForm:
-  - Campos: `nombre`, `descripcion`, `precio`, `duracion_estimada`, `activo`,
-    `orden` (posición en Home).
+  - Campos: `nombre`, `descripcion`, `precio`, `duracion_estimada`,
+    `duracion_minutos`, `activo`, `orden` (posición en Home).
+  - `validate`: si no se indican los minutos se derivan del texto de duración;
+    un texto que no se puede interpretar es un error.
   - Imagen principal por URL o archivo, y soporte de carga múltiple con
     `imagenes_files` para galería del servicio (tipos permitidos: jpg, jpeg,
     png, gif, webp).
@@ -74,6 +76,7 @@ from wtforms import StringField, PasswordField, SubmitField, BooleanField, Float
 from wtforms.validators import DataRequired, Email, Length, NumberRange, Optional, URL, ValidationError # Añadir ValidationError
 from flask_wtf.file import FileField, FileAllowed, MultipleFileField
 from app.models.categoria import Categoria # Importar el modelo Categoria
+from app.models.servicio import parsear_duracion
 
 # Validador personalizado para campos que pueden tener valor 0
 class DataRequiredAllowZero(DataRequired):
@@ -174,6 +177,7 @@ class ServicioForm(FlaskForm):
     descripcion = TextAreaField('Descripción', validators=[Optional(), Length(max=500)])
     precio = DecimalField('Precio (COP)', validators=[DataRequired(), NumberRange(min=0)])
     duracion_estimada = StringField('Duración Estimada', validators=[Optional(), Length(max=50)])
+    duracion_minutos = IntegerField('Duración (minutos)', validators=[Optional(), NumberRange(min=5, max=480)])
     activo = BooleanField('Servicio Activo', default=True)
     
     orden = IntegerField('Posición en el Home', validators=[DataRequired(), NumberRange(min=0)], default=0)
@@ -194,7 +198,30 @@ class ServicioForm(FlaskForm):
     
     submit = SubmitField('Guardar Servicio')
 
-    
+    def validate(self, extra_validators=None):
+        """
+        Deriva `duracion_minutos` del texto si no se indicó o si, al editar (la
+        ruta asigna `duracion_anterior = (texto, minutos)`), solo cambió el texto.
+        """
+        if not super().validate(extra_validators):
+            return False
+        texto, minutos = self.duracion_estimada.data, self.duracion_minutos.data
+        anterior = getattr(self, 'duracion_anterior', None)
+        solo_cambio_texto = (anterior is not None and (texto or '') != (anterior[0] or '')
+                             and minutos == anterior[1])
+        if minutos is None or solo_cambio_texto:
+            derivados = parsear_duracion(texto)
+            if texto and derivados is None:
+                self.duracion_minutos.errors.append('No se pudo interpretar la duración; indícala en minutos.')
+                return False
+            minutos = derivados or minutos or 30
+            if not 5 <= minutos <= 480:
+                self.duracion_minutos.errors.append('La duración debe estar entre 5 y 480 minutos.')
+                return False
+            self.duracion_minutos.data = minutos
+        return True
+
+
 class DisponibilidadForm(FlaskForm):
     dia_semana = SelectField('Día de la Semana', choices=[
         (-1, 'Selecciona un día'),
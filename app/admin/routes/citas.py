@@ -4,6 +4,7 @@ from flask_login import login_required
 from app.admin import bp
 from app.utils.decorators import admin_required
 from app.models.cliente import Cliente, Cita
+from app.models.barbero import Barbero
 from app import db
 from app.admin.forms import CitaForm
 from datetime import datetime
@@ -32,45 +33,18 @@ def gestionar_citas():
                 cliente_nombre_form = form.cliente_nombre.data.strip()
                 cliente_email_form = form.cliente_email.data.strip().lower() # Guardar email en minúsculas
 
-                # Buscar cliente por email primero (más único)
-                cliente = Cliente.query.filter(db.func.lower(Cliente.email) == cliente_email_form).first()
-                
-                if not cliente:
-                    # Si no se encuentra por email, intentar por nombre (menos fiable, pero como fallback)
-                    cliente_por_nombre = Cliente.query.filter(db.func.lower(Cliente.nombre) == db.func.lower(cliente_nombre_form)).first()
-                    if cliente_por_nombre:
-                        # Si existe un cliente con ese nombre pero diferente email, podría ser un problema.
-                        # Por ahora, se creará uno nuevo si el email no coincide.
-                        # Considerar una lógica más avanzada si es necesario.
-                        pass
-
-                    # Crear nuevo cliente si no se encontró por email
-                    cliente_telefono_form = request.form.get('cliente_telefono', '').strip()
-                    cliente = Cliente(nombre=cliente_nombre_form, email=cliente_email_form, telefono=cliente_telefono_form if cliente_telefono_form else None)
-                    db.session.add(cliente)
-                    flash(f'Nuevo cliente "{cliente_nombre_form}" con email "{cliente_email_form}" será creado.', 'info')
-                elif cliente.nombre.lower() != cliente_nombre_form.lower():
-                    # Si el email existe pero el nombre es diferente, actualizar el nombre.
-                    flash(f'Cliente encontrado por email. Nombre actualizado de "{cliente.nombre}" a "{cliente_nombre_form}".', 'info')
-                    cliente.nombre = cliente_nombre_form
-                
-                # Actualizar teléfono del cliente existente si se proporciona
+                # Alta o actualización del cliente en una sola sentencia (clave: email normalizado)
                 cliente_telefono_form = request.form.get('cliente_telefono', '').strip()
-                if cliente_telefono_form:
-                    cliente.telefono = cliente_telefono_form
-                
-                # Aquí 'cliente' ya está definido (existente o nuevo)
+                cliente_id = Cliente.upsert(cliente_nombre_form, cliente_email_form, cliente_telefono_form)
+
                 nueva_cita = Cita(
-                    cliente_id=cliente.id if cliente.id else None, 
+                    cliente_id=cliente_id,
                     barbero_id=form.barbero_id.data,
                     servicio_id=form.servicio_id.data,
                     fecha=fecha_hora_obj,
                     estado=form.estado.data,
                     notas=request.form.get('notas_cita', '')
                 )
-                if not cliente.id: 
-                    nueva_cita.cliente = cliente 
-
                 db.session.add(nueva_cita)
                 db.session.commit()
                 flash('Cita creada correctamente.', 'success')
@@ -164,7 +138,7 @@ def editar_cita(id):
 
                 # Lógica para manejar el cliente
                 cliente_actual_id = cita.cliente_id
-                cliente_encontrado_por_email = Cliente.query.filter(db.func.lower(Cliente.email) == cliente_email_form).first()
+                cliente_encontrado_por_email = Cliente.query.filter_by(email=cliente_email_form).first()
 
                 if cliente_encontrado_por_email:
                     # Si el email ya existe y pertenece a otro cliente, es un error.
@@ -195,14 +169,12 @@ def editar_cita(id):
                          # Opción: Crear nuevo cliente si el email es nuevo y diferente al original
                          cliente_telefono_form = request.form.get('cliente_telefono', '').strip()
                          telefono_cliente = cliente_telefono_form if cliente_telefono_form else (cita.cliente.telefono if cita.cliente else None)
-                         cliente_para_cita = Cliente(nombre=cliente_nombre_form, email=cliente_email_form, telefono=telefono_cliente)
-                         db.session.add(cliente_para_cita)
+                         cliente_para_cita = db.session.get(Cliente, Cliente.upsert(cliente_nombre_form, cliente_email_form, telefono_cliente))
                          flash(f'Nuevo cliente creado con email "{cliente_email_form}" ya que el email cambió.', 'info')
 
                     elif not cita.cliente: # La cita no tenía cliente, crear uno nuevo
                         cliente_telefono_form = request.form.get('cliente_telefono', '').strip()
-                        cliente_para_cita = Cliente(nombre=cliente_nombre_form, email=cliente_email_form, telefono=cliente_telefono_form if cliente_telefono_form else None)
-                        db.session.add(cliente_para_cita)
+                        cliente_para_cita = db.session.get(Cliente, Cliente.upsert(cliente_nombre_form, cliente_email_form, cliente_telefono_form))
                         flash(f'Nuevo cliente "{cliente_nombre_form}" será creado.', 'info')
                     else: # El email no cambió, y el cliente ya existía
                         cita.cliente.nombre = cliente_nombre_form # Actualizar nombre
@@ -213,10 +185,24 @@ def editar_cita(id):
                         cliente_para_cita = cita.cliente
 
 
-                if cliente_para_cita: 
+                conflicto = None
+                if cliente_para_cita and form.estado.data in Cita.ESTADOS_OCUPAN_HORARIO:
+                    # Misma verificación que al reservar, con la agenda del barbero bloqueada
+                    Barbero.bloquear_agenda(form.barbero_id.data)
+                    conflicto = Cita.buscar_solapamiento(form.barbero_id.data, fecha_hora_obj,
+                                                         cita.duracion or 30, excluir_id=cita.id)
+                    if conflicto:
+                        db.session.rollback()
+                        flash(f'El horario se solapa con otra cita del barbero '
+                              f'({conflicto.fecha.strftime("%d/%m/%Y %H:%M")}).', 'danger')
+
+                if cliente_para_cita and not conflicto:
                     cita.cliente = cliente_para_cita
                     cita.barbero_id = form.barbero_id.data
                     cita.servicio_id = form.servicio_id.data
+                    if cita.fecha != fecha_hora_obj:
+                        cita.recordatorio_24h_enviado = None
+                        cita.recordatorio_2h_enviado = None
                     cita.fecha = fecha_hora_obj
                     cita.estado = form.estado.data
                     cita.notas = request.form.get('notas_cita', cita.notas)
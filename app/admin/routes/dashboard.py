@@ -73,15 +73,6 @@ def dashboard():
     # Citas pendientes de confirmación
     citas_pendientes = Cita.query.filter_by(estado='pendiente_confirmacion').count()
     
-    # Ejecutar limpieza de citas expiradas (aquellas pendientes que pasaron el tiempo límite)
-    try:
-        citas_limpiadas = Cita.limpiar_citas_expiradas()
-        if citas_limpiadas > 0:
-            flash(f'Se han detectado {citas_limpiadas} citas expiradas sin confirmar', 'warning')
-    except Exception as e:
-        current_app.logger.error(f"Error al limpiar citas expiradas: {str(e)}")
-        print(f"Error al limpiar citas expiradas: {str(e)}")
-    
     # Citas de hoy
     citas_hoy = Cita.query.filter(
         Cita.fecha >= datetime.combine(today, time.min),
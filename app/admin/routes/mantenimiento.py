@@ -0,0 +1,36 @@
+"""Panel de tareas programadas: última ejecución, duración y resultado de cada una."""
+from flask import render_template, redirect, url_for, flash, current_app, abort
+from flask_login import login_required
+from app.admin import bp
+from app.utils.decorators import admin_required
+from app.models.tareas import TareaProgramada
+
+
+@bp.route('/mantenimiento')
+@login_required
+@admin_required
+def listar_tareas():
+    scheduler = current_app.extensions['scheduler']
+    estados = {t.nombre: t for t in TareaProgramada.query.all()}
+    tareas = [
+        {'definicion': definicion, 'estado': estados.get(nombre)}
+        for nombre, definicion in sorted(scheduler.tareas.items())
+    ]
+    return render_template('admin/mantenimiento.html',
+                           title="Tareas Programadas",
+                           tareas=tareas,
+                           scheduler_activo=current_app.config.get('SCHEDULER_ENABLED'))
+
+
+@bp.route('/mantenimiento/<nombre>/ejecutar', methods=['POST'])
+@login_required
+@admin_required
+def ejecutar_tarea(nombre):
+    if nombre not in current_app.extensions['scheduler'].tareas:
+        abort(404)
+    try:
+        TareaProgramada.solicitar_ejecucion(nombre)
+        flash(f'La tarea "{nombre}" se ejecutará en la próxima vuelta del planificador.', 'success')
+    except Exception as e:
+        flash(f'Error al programar la tarea: {str(e)}', 'danger')
+    return redirect(url_for('admin.listar_tareas'))
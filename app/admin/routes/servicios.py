@@ -28,6 +28,7 @@ def gestionar_servicios():
                 descripcion=form.descripcion.data,
                 precio=form.precio.data,
                 duracion_estimada=form.duracion_estimada.data,
+                duracion_minutos=form.duracion_minutos.data,
                 activo=form.activo.data,
                 imagen_url=imagen_url,
                 orden=form.orden.data
@@ -87,12 +88,14 @@ def gestionar_servicios():
 def editar_servicio(id):
     servicio = Servicio.query.get_or_404(id)
     form = ServicioForm(obj=servicio if request.method == 'GET' else None)
+    form.duracion_anterior = (servicio.duracion_estimada, servicio.duracion_minutos)
 
     if form.validate_on_submit():
         servicio.nombre = form.nombre.data
         servicio.descripcion = form.descripcion.data
         servicio.precio = form.precio.data
         servicio.duracion_estimada = form.duracion_estimada.data
+        servicio.duracion_minutos = form.duracion_minutos.data
         servicio.activo = form.activo.data
         servicio.orden = form.orden.data
         
@@ -136,6 +139,7 @@ def editar_servicio(id):
         form.descripcion.data = servicio.descripcion
         form.precio.data = servicio.precio
         form.duracion_estimada.data = servicio.duracion_estimada
+        form.duracion_minutos.data = servicio.duracion_minutos
         form.activo.data = servicio.activo
         form.imagen_url.data = servicio.imagen_url
         form.orden.data = servicio.orden
@@ -1,5 +1,5 @@
 """CRUD de sliders (portada) del sitio publico."""
-from flask import render_template, redirect, url_for, flash, current_app
+from flask import render_template, redirect, url_for, flash
 from flask_login import login_required
 from app.admin import bp
 from app.utils.decorators import admin_required
@@ -12,7 +12,6 @@ from app import db
 from app.admin.slider_forms import SliderForm
 from app.admin.utils import save_image
 from datetime import datetime
-import os
 
 import logging
 
@@ -94,18 +93,8 @@ def editar_slider(id):
             # Procesar según el tipo de slide
             if form.tipo.data == 'imagen':
                 if form.imagen.data:
-                    # Eliminar imagen anterior si existe
-                    if slider.imagen_url:
-                        old_filename = slider.imagen_url.split('/')[-1]
-                        old_path = os.path.join(current_app.config['UPLOAD_FOLDER'], 'sliders', old_filename)
-                        try:
-                            if os.path.exists(old_path):
-                                os.remove(old_path)
-                                logger.info(f"Imagen anterior eliminada: {old_path}")
-                        except Exception as e:
-                            logger.warning(f"No se pudo eliminar la imagen anterior: {str(e)}")
-                    
-                    # Guardar nueva imagen
+                    # Guardar nueva imagen; la anterior se borra al hacer commit
+                    # si ya nadie la usa (ver app/utils/uploads.py)
                     filename = save_image(form.imagen.data, 'sliders')
                     slider.imagen_url = filename
                 
@@ -118,15 +107,6 @@ def editar_slider(id):
                 
                 # Limpiar imagen si cambió a Instagram
                 if slider.tipo != 'instagram':
-                    if slider.imagen_url:
-                        old_filename = slider.imagen_url.split('/')[-1]
-                        old_path = os.path.join(current_app.config['UPLOAD_FOLDER'], 'sliders', old_filename)
-                        try:
-                            if os.path.exists(old_path):
-                                os.remove(old_path)
-                                logger.info(f"Imagen eliminada al cambiar a Instagram: {old_path}")
-                        except Exception as e:
-                            logger.warning(f"No se pudo eliminar la imagen: {str(e)}")
                     slider.imagen_url = None
             
             db.session.commit()
@@ -157,41 +137,13 @@ def eliminar_slider(id):
     
     try:
         titulo = slider.titulo
-        imagen_eliminada = False
-        error_imagen = None
-        
-        # Eliminar imagen asociada si existe
-        if slider.imagen_url and slider.tipo == 'imagen':
-            try:
-                filename = slider.imagen_url.split('/')[-1]
-                file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], 'sliders', filename)
-                
-                logger.info(f"Intentando eliminar archivo: {file_path}")
-                
-                if os.path.exists(file_path):
-                    os.remove(file_path)
-                    imagen_eliminada = True
-                    logger.info(f"Imagen eliminada exitosamente: {file_path}")
-                else:
-                    logger.warning(f"El archivo no existe: {file_path}")
-                    error_imagen = f"El archivo de imagen no fue encontrado en el servidor"
-                    
-            except Exception as e:
-                error_imagen = f"Error al eliminar la imagen: {str(e)}"
-                logger.error(f"Error al eliminar imagen del slide: {str(e)}", exc_info=True)
-        
+
         # Eliminar el slider de la base de datos
         db.session.delete(slider)
         db.session.commit()
         
-        # Mostrar mensaje de éxito con información adicional
-        if error_imagen:
-            flash(f'Slide "{titulo}" eliminado de la base de datos, pero hubo un problema con la imagen: {error_imagen}', 'warning')
-        else:
-            mensaje = f'Slide "{titulo}" eliminado exitosamente.'
-            if imagen_eliminada:
-                mensaje += ' La imagen también fue eliminada del servidor.'
-            flash(mensaje, 'success')
+        # La imagen se borra del servidor al hacer commit si ningún otro elemento la usa
+        flash(f'Slide "{titulo}" eliminado exitosamente.', 'success')
         
     except Exception as e:
         db.session.rollback()
@@ -1,8 +1,9 @@
 import os
-import uuid
 from werkzeug.utils import secure_filename
 from flask import current_app
 from PIL import Image, UnidentifiedImageError
+from app.models.imagen import ProcesamientoImagen
+from app.utils.uploads import guardar_por_contenido
 
 def allowed_file(filename):
     allowed_extensions = current_app.config['ALLOWED_EXTENSIONS']
@@ -57,29 +58,21 @@ def save_image(file, subfolder):
     
     # Si el archivo tiene una extensión permitida
     if file and allowed_file(file.filename):
-        # Generar nombre seguro y único para el archivo
+        # El nombre es el hash del contenido: subidas idénticas comparten archivo
         original_filename = secure_filename(file.filename)
         file_extension = os.path.splitext(original_filename)[1]
-        unique_filename = f"{uuid.uuid4().hex}{file_extension}"
-        
-        # Crear la subcarpeta si no existe
         subfolder_path = os.path.join(upload_folder, subfolder)
-        if not os.path.exists(subfolder_path):
-            os.makedirs(subfolder_path)
-        
-        # Ruta completa donde se guardará el archivo
-        file_path = os.path.join(subfolder_path, unique_filename)
-        
-        # Guardar el archivo
+
+        # Guardar el archivo (se calcula el hash mientras se escribe)
         try:
-            file.save(file_path)
+            unique_filename, es_nuevo = guardar_por_contenido(file, subfolder_path, file_extension)
+            file_path = os.path.join(subfolder_path, unique_filename)
 
-            # Verificar si el archivo existe después de guardarlo
-            if os.path.exists(file_path):
+            if es_nuevo:
                 logger.info(f"✅ Archivo guardado exitosamente y verificado")
                 logger.info(f"   - Tamaño del archivo: {os.path.getsize(file_path)} bytes")
             else:
-                logger.error(f"❌ El archivo no existe después de guardarlo")
+                logger.info(f"♻️ Contenido ya existente, se reutiliza el archivo")
 
             logger.info(f"   - Ruta del sistema: {file_path}")
             logger.info(f"   - URL relativa: /static/uploads/{subfolder}/{unique_filename}")
@@ -88,18 +81,25 @@ def save_image(file, subfolder):
             logger.error(f"❌ Error al guardar: {str(e)}")
             return None
 
-        # Verificar que el contenido guardado sea realmente una imagen,
-        # no solo que la extensión del nombre lo parezca
+        # Comprobación rápida de que el contenido parece una imagen (solo lee la
+        # cabecera); la verificación completa y los derivados se hacen en segundo plano
         try:
-            with Image.open(file_path) as img:
-                img.verify()
+            with Image.open(file_path):
+                pass
         except (UnidentifiedImageError, OSError) as e:
             logger.warning(f"⚠️ Archivo rechazado, el contenido no es una imagen válida: {file.filename} ({e})")
-            os.remove(file_path)
+            if es_nuevo:
+                os.remove(file_path)
             return None
 
+        url = f'/static/uploads/{subfolder}/{unique_filename}'
+        # Se procesa cuando la vista haga commit (ver app/utils/image_processing.py);
+        # un archivo reutilizado ya se procesó al subirse por primera vez
+        if es_nuevo or not ProcesamientoImagen.query.filter_by(ruta=url).first():
+            current_app.extensions['image_processor'].encolar(url)
+
         logger.info(f"--- FIN GUARDADO DE IMAGEN ---")
-        return f'/static/uploads/{subfolder}/{unique_filename}'
+        return url
     
     logger.warning(f"Extensión no permitida: {file.filename}")
     return None
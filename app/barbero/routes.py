@@ -53,15 +53,6 @@ def dashboard():
     if not hasattr(current_user, 'tiene_acceso_web') or not current_user.tiene_acceso_web:
         abort(403)
     
-    # Ejecutar limpieza de bloqueos pasados
-    try:
-        from app.models.tareas import limpiar_bloqueos_pasados
-        bloqueos_eliminados = limpiar_bloqueos_pasados()
-        if bloqueos_eliminados > 0:
-            print(f"Se han eliminado {bloqueos_eliminados} bloqueos de horario pasados.")
-    except Exception as e:
-        print(f"Error al limpiar bloqueos pasados: {str(e)}")
-    
     barbero = current_user
     
     # Manejar creación de nueva cita desde el dashboard
@@ -80,18 +71,14 @@ def dashboard():
                 return redirect(url_for('barbero.dashboard'))
             
             # Buscar o crear cliente
-            cliente = Cliente.query.filter_by(email=cliente_email).first()
-            if not cliente:
-                cliente = Cliente(nombre=cliente_nombre, email=cliente_email)
-                db.session.add(cliente)
-                db.session.flush()
+            cliente_id = Cliente.upsert(cliente_nombre, cliente_email)
             
             # Crear fecha y hora completa
             fecha_completa = datetime.strptime(f"{fecha_str} {hora_str}", '%Y-%m-%d %H:%M')
             
             # Crear nueva cita
             nueva_cita = Cita(
-                cliente_id=cliente.id,
+                cliente_id=cliente_id,
                 barbero_id=barbero.id,
                 servicio_id=int(servicio_id),
                 fecha=fecha_completa,
@@ -252,18 +239,11 @@ def nueva_cita():
     if form.validate_on_submit():
         try:
             # Buscar o crear cliente
-            cliente = Cliente.query.filter_by(email=form.cliente_email.data).first()
-            if not cliente:
-                cliente = Cliente(
-                    nombre=form.cliente_nombre.data,
-                    email=form.cliente_email.data
-                )
-                db.session.add(cliente)
-                db.session.flush()  # Para obtener el ID
+            cliente_id = Cliente.upsert(form.cliente_nombre.data, form.cliente_email.data)
             
             # Crear la cita
             nueva_cita = Cita(
-                cliente_id=cliente.id,
+                cliente_id=cliente_id,
                 barbero_id=barbero.id,
                 servicio_id=form.servicio_id.data,
                 estado=form.estado.data
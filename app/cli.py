@@ -0,0 +1,144 @@
+"""
+Comandos de línea de comandos de Barber Brothers.
+
+Agrupa las tareas de mantenimiento que no deben ejecutarse dentro de un request
+(limpiezas, recálculos, procesos por lotes). Se invocan con el CLI de Flask:
+
+    flask mantenimiento expirar-citas
+    flask mantenimiento ejecutar-tarea actualizar_segmentos
+    flask mantenimiento fusionar-clientes --simular
+    flask mantenimiento comprimir-estaticos
+    flask mantenimiento recolectar-subidas --simular
+    flask mantenimiento reoptimizar-imagenes
+"""
+import click
+from flask.cli import AppGroup
+
+mantenimiento_cli = AppGroup('mantenimiento', help='Tareas de mantenimiento fuera del request.')
+
+
+@mantenimiento_cli.command('expirar-citas')
+@click.option('--horas', default=1, show_default=True, type=int,
+              help='Horas sin confirmar tras las cuales una cita pendiente expira.')
+def expirar_citas(horas):
+    """Marca como expiradas las citas pendientes de confirmación vencidas."""
+    from app.models.cliente import Cita
+
+    total = Cita.limpiar_citas_expiradas(horas=horas)
+    click.echo(f'{total} citas marcadas como expiradas.')
+
+
+@mantenimiento_cli.command('fusionar-clientes')
+@click.option('--lote', default=500, show_default=True, type=int, help='Duplicados por transacción.')
+@click.option('--simular', is_flag=True, help='Solo informa cuántos clientes se fusionarían.')
+def fusionar_clientes(lote, simular):
+    """Fusiona clientes duplicados por email normalizado e informa de los que solo comparten teléfono."""
+    from app.models.tareas import fusionar_clientes_duplicados
+
+    resumen = fusionar_clientes_duplicados(tamano_lote=lote, simular=simular)
+    accion = 'Se fusionarían' if simular else 'Fusionados'
+    click.echo(f"{accion} {resumen['duplicados']} clientes duplicados en {resumen['grupos']} grupos "
+               f"({resumen['citas_reasignadas']} citas y {resumen['mensajes_reasignados']} mensajes reasignados).")
+    if resumen['por_confirmar']:
+        click.echo(f"{len(resumen['por_confirmar'])} grupos comparten teléfono con distinto email "
+                   f"(no se fusionan; revisar a mano):")
+        for grupo in resumen['por_confirmar']:
+            click.echo('  clientes ' + ', '.join(str(cliente_id) for cliente_id in grupo))
+
+
+@mantenimiento_cli.command('comprimir-estaticos')
+@click.option('--forzar', is_flag=True, help='Regenera también las variantes que ya están al día.')
+def comprimir_estaticos(forzar):
+    """Genera las variantes .gz/.br de CSS, JS y demás estáticos de texto (paso de build)."""
+    from flask import current_app
+    from app.utils.static_assets import brotli, comprimir_carpeta
+
+    resumen = comprimir_carpeta(current_app.static_folder, forzar=forzar)
+    click.echo(f"{resumen['generados']} variantes generadas para {resumen['archivos']} archivos "
+               f"({resumen['bytes_originales']} -> {resumen['bytes_comprimidos']} bytes).")
+    if brotli is None:
+        click.echo('Paquete brotli no instalado: solo se generaron variantes .gz.')
+
+
+@mantenimiento_cli.command('recolectar-subidas')
+@click.option('--gracia-horas', default=None, type=int,
+              help='Antigüedad mínima de un archivo para tocarlo (por defecto UPLOAD_GC_GRACIA_HORAS).')
+@click.option('--cuarentena', default=None, type=click.Path(file_okay=False),
+              help='Mueve los huérfanos a esta carpeta en lugar de borrarlos.')
+@click.option('--simular', is_flag=True, help='Solo informa qué se liberaría.')
+def recolectar_subidas(gracia_horas, cuarentena, simular):
+    """Elimina las subidas que ninguna columna de imagen referencia."""
+    from flask import current_app
+    from app.utils.uploads import recolectar_huerfanas
+
+    if gracia_horas is None:
+        gracia_horas = current_app.config.get('UPLOAD_GC_GRACIA_HORAS', 24)
+    cuarentena = cuarentena or current_app.config.get('UPLOAD_GC_CUARENTENA')
+    resumen = recolectar_huerfanas(gracia_segundos=gracia_horas * 3600, cuarentena=cuarentena, simular=simular)
+    if simular:
+        accion = 'Se liberarían'
+    else:
+        accion = 'Movidos a cuarentena' if cuarentena else 'Eliminados'
+    click.echo(f"{accion} {resumen['huerfanos']} archivos huérfanos ({resumen['bytes']} bytes) "
+               f"de {resumen['revisados']} revisados; {resumen['en_gracia']} aún en periodo de gracia.")
+
+
+@mantenimiento_cli.command('reoptimizar-imagenes')
+@click.option('--procesos', default=None, type=int, help='Procesos en paralelo (por defecto IMAGE_WORKERS).')
+@click.option('--ancho-maximo', default=None, type=int,
+              help='Lado máximo en píxeles (por defecto IMAGE_MAX_DIMENSION).')
+@click.option('--reiniciar', is_flag=True, help='Ignora el manifiesto y vuelve a procesar todo.')
+def reoptimizar_imagenes(procesos, ancho_maximo, reiniciar):
+    """Recodifica las imágenes ya subidas y genera los derivados que falten (reanudable)."""
+    from flask import current_app
+    from app.utils.image_processing import reoptimizar_biblioteca
+
+    resumen = reoptimizar_biblioteca(
+        procesos=procesos,
+        ancho_maximo=ancho_maximo or current_app.config.get('IMAGE_MAX_DIMENSION', 2560),
+        reiniciar=reiniciar,
+    )
+    antes, despues = resumen['antes'], resumen['despues']
+    ahorro = f' ({100 * (antes - despues) / antes:.1f}% menos)' if antes else ''
+    click.echo(f"{resumen['archivos']} originales revisados: {resumen['recodificados']} recodificados, "
+               f"{resumen['renombrados']} renombrados, {resumen['derivados']} derivados generados, "
+               f"{resumen['errores']} errores.")
+    click.echo(f'Originales: {antes} -> {despues} bytes{ahorro}.')
+
+
+@mantenimiento_cli.command('ejecutar-tarea')
+@click.argument('nombre')
+def ejecutar_tarea(nombre):
+    """Ejecuta ya una tarea programada (respetando el lease de otros workers)."""
+    from flask import current_app
+
+    scheduler = current_app.extensions['scheduler']
+    tarea = scheduler.tareas.get(nombre)
+    if tarea is None:
+        raise click.BadParameter(f'Tareas disponibles: {", ".join(sorted(scheduler.tareas))}',
+                                 param_hint='NOMBRE')
+    if scheduler.ejecutar_si_corresponde(tarea, forzar=True):
+        from app.models.tareas import TareaProgramada
+        from app import db
+        estado = db.session.get(TareaProgramada, nombre)
+        click.echo(f'{nombre}: {estado.ultima_duracion_ms} ms -> {estado.ultimo_error or estado.ultimo_resultado}')
+    else:
+        click.echo(f'{nombre} está en ejecución en otro proceso.')
+
+
+@mantenimiento_cli.command('listar-tareas')
+def listar_tareas():
+    """Muestra las tareas programadas y su última ejecución."""
+    from flask import current_app
+    from app import db
+    from app.models.tareas import TareaProgramada
+
+    for nombre, tarea in sorted(current_app.extensions['scheduler'].tareas.items()):
+        estado = db.session.get(TareaProgramada, nombre)
+        ultima = estado.ultima_ejecucion if estado and estado.ultima_ejecucion else 'nunca'
+        click.echo(f'{nombre:<24} cada {tarea.cada}  última: {ultima}')
+
+
+def register_cli(app):
+    """Registra los grupos de comandos en la aplicación."""
+    app.cli.add_command(mantenimiento_cli)
@@ -22,10 +22,53 @@ class Config:
     # Forma recomendada de configurar MAIL_DEFAULT_SENDER
     MAIL_DEFAULT_SENDER_NAME = os.environ.get('MAIL_DEFAULT_SENDER', 'Barber Brothers')
     MAIL_DEFAULT_SENDER = (MAIL_DEFAULT_SENDER_NAME, os.environ.get('MAIL_USERNAME'))
+    REMINDER_BATCH_SIZE = int(os.environ.get('REMINDER_BATCH_SIZE') or 100)  # correos por conexión SMTP
+    # URL pública del sitio para enlaces en correos enviados fuera de un request (p. ej. recordatorios)
+    EXTERNAL_BASE_URL = os.environ.get('EXTERNAL_BASE_URL')
+    # Planificador de tareas de mantenimiento (ver app/utils/scheduler.py)
+    SCHEDULER_ENABLED = os.environ.get('SCHEDULER_ENABLED', 'True').lower() in ['true', '1', 't']
+    SCHEDULER_TICK_SECONDS = int(os.environ.get('SCHEDULER_TICK_SECONDS') or 30)
+    # Límite de peticiones por IP en las APIs públicas (ver app/utils/rate_limit.py).
+    # Formato '<cantidad>/<periodo>' con periodo second, minute, hour o day.
+    RATELIMIT_ENABLED = os.environ.get('RATELIMIT_ENABLED', 'True').lower() in ['true', '1', 't']
+    RATELIMIT_STORAGE_URL = os.environ.get('RATELIMIT_STORAGE_URL')  # redis://... para compartir entre workers
+    # Proxies propios delante de la app cuyo X-Forwarded-For es fiable; 0 = usar la IP de la conexión.
+    # Con nginx delante de gunicorn (ver deployment/) debe ser 1; sin proxy, un cliente elegiría su propio cubo
+    RATELIMIT_PROXY_COUNT = int(os.environ.get('RATELIMIT_PROXY_COUNT') or 0)
+    RATELIMIT_LIMITS = {
+        'disponibilidad': os.environ.get('RATELIMIT_DISPONIBILIDAD', '60/minute'),
+        'agendar_cita': os.environ.get('RATELIMIT_AGENDAR_CITA', '10/minute'),
+        'servicio': os.environ.get('RATELIMIT_SERVICIO', '60/minute'),
+        'contacto': os.environ.get('RATELIMIT_CONTACTO', '5/minute'),
+    }
+    # Caché de catálogo en memoria: cada cuánto se consulta catalogo_version (0 = nunca)
+    # y caducidad máxima de cada entrada como red de seguridad
+    CATALOG_VERSION_POLL_SECONDS = float(os.environ.get('CATALOG_VERSION_POLL_SECONDS') or 5)
+    CATALOG_CACHE_SECONDS = int(os.environ.get('CATALOG_CACHE_SECONDS') or 300)
+    PRODUCTOS_CACHE_SECONDS = int(os.environ.get('PRODUCTOS_CACHE_SECONDS') or 60)  # precio y existencias
+    SITEMAP_URLS_POR_ARCHIVO = int(os.environ.get('SITEMAP_URLS_POR_ARCHIVO') or 50000)  # límite del protocolo
+    # URLs de estáticos con hash de contenido y caché de un año (ver app/utils/static_assets.py)
+    STATIC_FINGERPRINT = os.environ.get('STATIC_FINGERPRINT', 'True').lower() in ['true', '1', 't']
+    # Delegar el envío de archivos en el servidor web: 'x-accel' (nginx), 'x-sendfile' o vacío (Flask)
+    FILE_OFFLOAD = (os.environ.get('FILE_OFFLOAD') or '').lower()
+    FILE_OFFLOAD_PREFIX = os.environ.get('FILE_OFFLOAD_PREFIX') or '/_archivos/'  # location interna de nginx
+    # Procesos para verificar imágenes subidas y generar derivados (0 = en línea, al hacer commit)
+    # y máximo de imágenes en vuelo por worker (ver app/utils/image_processing.py)
+    IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS') or 2)
+    IMAGE_QUEUE_MAX = int(os.environ.get('IMAGE_QUEUE_MAX') or 20)
+    # Lado máximo (px) de los originales al reoptimizar la biblioteca (flask mantenimiento reoptimizar-imagenes)
+    IMAGE_MAX_DIMENSION = int(os.environ.get('IMAGE_MAX_DIMENSION') or 2560)
+    # Una subida sin referencias no se borra si se (re)escribió hace menos de esto (ver app/utils/uploads.py)
+    UPLOAD_REUSO_SEGUNDOS = int(os.environ.get('UPLOAD_REUSO_SEGUNDOS') or 300)
+    # Recolector de subidas huérfanas: antigüedad mínima y carpeta de cuarentena (vacía = borrar)
+    UPLOAD_GC_GRACIA_HORAS = int(os.environ.get('UPLOAD_GC_GRACIA_HORAS') or 24)
+    UPLOAD_GC_CUARENTENA = os.environ.get('UPLOAD_GC_CUARENTENA') or None
 
     
 class DevelopmentConfig(Config):
     DEBUG = True
+    # Los archivos cambian sin reiniciar el servidor: la huella calculada al arrancar quedaría vieja
+    STATIC_FINGERPRINT = os.environ.get('STATIC_FINGERPRINT', 'False').lower() in ['true', '1', 't']
     # Lee la URL de PostgreSQL del entorno, si no existe, usa SQLite como fallback
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or \
         'sqlite:///' + os.path.join(basedir, '..', 'app.db') # Ruta relativa a la raíz del proyecto
@@ -46,6 +89,12 @@ class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
     WTF_CSRF_ENABLED = False
+    SCHEDULER_ENABLED = False
+    RATELIMIT_ENABLED = False
+    # La consulta de catalogo_version usa su propia conexión, que con StaticPool es la misma
+    # de la sesión y al devolverse al pool desharía la transacción en curso de la prueba
+    CATALOG_VERSION_POLL_SECONDS = 0
+    IMAGE_WORKERS = 0
     # Comparte una única conexión en memoria entre requests/hilos de prueba;
     # sin esto, cada conexión nueva del pool ve una base de datos SQLite distinta y vacía.
     SQLALCHEMY_ENGINE_OPTIONS = {
@@ -69,11 +69,20 @@ class AdminMiddleware:
             if section:
                 g.admin_filter_history = AdminCookieManager.get_filter_history(section)
             
-            # Calcular métricas si es el dashboard
+            # Calcular métricas si es el dashboard. Se usa el resumen precalculado por la
+            # tarea 'estadisticas_dashboard' y solo se recalcula en vivo si no hay uno reciente.
             if request.endpoint == 'admin.dashboard':
                 try:
-                    g.admin_productivity_metrics = AdminMetricsCalculator.calculate_productivity_metrics()
-                    g.admin_trending_data = AdminMetricsCalculator.get_trending_data()
+                    from datetime import timedelta
+                    from app.models.tareas import TareaProgramada
+                    resumen = TareaProgramada.resultado_de('estadisticas_dashboard',
+                                                           max_antiguedad=timedelta(minutes=30))
+                    if resumen:
+                        g.admin_productivity_metrics = resumen.get('metrics', {})
+                        g.admin_trending_data = resumen.get('trending', {})
+                    else:
+                        g.admin_productivity_metrics = AdminMetricsCalculator.calculate_productivity_metrics()
+                        g.admin_trending_data = AdminMetricsCalculator.get_trending_data()
                 except Exception as e:
                     logger.error(f"Error calculating dashboard metrics: {e}")
                     g.admin_productivity_metrics = {'error': str(e)}
@@ -7,6 +7,9 @@ from app.models.admin import User
 from .servicio import Servicio 
 from .servicio_imagen import ServicioImagen
 from .pedido import Pedido, PedidoItem
+from .tareas import TareaProgramada
+from .catalogo import CatalogoVersion
+from .imagen import ProcesamientoImagen
 try:
     from .slider import Slider
 except Exception as e:
@@ -4,8 +4,9 @@ from datetime import datetime, timedelta, date
 from sqlalchemy.orm import validates
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import UserMixin
+from app.utils.images import ImagenResponsiveMixin
 
-class Barbero(db.Model, UserMixin):
+class Barbero(db.Model, UserMixin, ImagenResponsiveMixin):
     id = db.Column(db.Integer, primary_key=True)
     nombre = db.Column(db.String(100), nullable=False)
     especialidad = db.Column(db.String(100))
@@ -67,7 +68,7 @@ class Barbero(db.Model, UserMixin):
                 cita_existente = Cita.query.filter_by(
                     barbero_id=self.id,
                     fecha=fecha_propuesta
-                ).filter(Cita.estado.in_(['confirmada', 'pendiente_confirmacion', 'expirada'])).first()
+                ).filter(Cita.estado.in_(Cita.ESTADOS_OCUPAN_HORARIO)).first()
                 return cita_existente is None
                 
         return False
@@ -76,13 +77,14 @@ class Barbero(db.Model, UserMixin):
         """Obtener todos los bloques de disponibilidad para un día específico"""
         return self.disponibilidad.filter_by(dia_semana=dia_semana, activo=True).all()
     
-    def obtener_horarios_disponibles(self, fecha, duracion=30):
+    def obtener_horarios_disponibles(self, fecha, duracion=30, excluir_cita_id=None):
         """
         Obtiene todos los horarios disponibles para una fecha específica
         
         Args:
             fecha (date): Fecha para la que se quieren obtener los horarios
             duracion (int): Duración de cada slot en minutos
+            excluir_cita_id (int, optional): Cita que no ocupa horario (la que se está reprogramando)
             
         Returns:
             list: Lista de diccionarios con la información de cada slot de tiempo disponible
@@ -114,7 +116,7 @@ class Barbero(db.Model, UserMixin):
             todos_los_slots = []
             for i, disp in enumerate(disponibilidades):
                 current_app.logger.debug(f"Barbero {self.id}: Procesando bloque {i+1}: {disp.hora_inicio}-{disp.hora_fin}")
-                slots = disp.generar_slots_disponibles(fecha, duracion)
+                slots = disp.generar_slots_disponibles(fecha, duracion, excluir_cita_id)
                 todos_los_slots.extend(slots)
                 
             # Ordenar los slots por hora
@@ -129,13 +131,14 @@ class Barbero(db.Model, UserMixin):
                     BloqueoHorario.fecha == fecha
                 ).all()
                 
-                # Marcar como no disponibles los slots que coincidan con bloqueos
+                # Marcar como no disponibles los slots que se solapen con bloqueos (igual que cubre_horario)
                 if bloqueos:
                     current_app.logger.info(f"Barbero {self.id}: Encontrados {len(bloqueos)} bloqueos para fecha {fecha}")
                     for slot in todos_los_slots:
-                        hora_slot = datetime.strptime(slot['hora'], '%H:%M').time()
+                        inicio_slot = datetime.combine(fecha, datetime.strptime(slot['hora'], '%H:%M').time())
+                        fin_slot = (inicio_slot + timedelta(minutes=duracion)).time()
                         for bloqueo in bloqueos:
-                            if bloqueo.hora_inicio <= hora_slot < bloqueo.hora_fin:
+                            if bloqueo.hora_inicio < fin_slot and bloqueo.hora_fin > inicio_slot.time():
                                 slot['disponible'] = False
                                 slot['bloqueado'] = True
                                 break
@@ -304,6 +307,39 @@ class Barbero(db.Model, UserMixin):
             print(f"Error en get_bloqueos_horario: {str(e)}")
             return []
 
+    def cubre_horario(self, inicio, duracion=30):
+        """
+        Indica si el intervalo [inicio, inicio + duracion) cae dentro de un bloque de
+        disponibilidad activo del barbero y no choca con un bloqueo temporal.
+        No revisa citas (ver `Cita.buscar_solapamiento`).
+        """
+        if inicio.weekday() > 5:  # Domingo
+            return False
+        fin = inicio + timedelta(minutes=duracion)
+        dentro_de_bloque = any(
+            disp.hora_inicio <= inicio.time() and fin <= datetime.combine(inicio.date(), disp.hora_fin)
+            for disp in self.get_disponibilidad_por_dia(inicio.weekday())
+        )
+        if not dentro_de_bloque:
+            return False
+        bloqueo = BloqueoHorario.query.filter(
+            BloqueoHorario.barbero_id == self.id,
+            BloqueoHorario.fecha == inicio.date(),
+            BloqueoHorario.hora_inicio < fin.time(),
+            BloqueoHorario.hora_fin > inicio.time()
+        ).first()
+        return bloqueo is None
+
+    @staticmethod
+    def bloquear_agenda(barbero_id):
+        """
+        Serializa las operaciones sobre la agenda de un barbero hasta el fin de la
+        transacción actual (SELECT ... FOR UPDATE sobre su fila). Toda reserva o
+        cambio de horario debe llamarlo antes de comprobar solapamientos. En SQLite
+        no hay FOR UPDATE; ahí la propia base serializa las escrituras.
+        """
+        return db.session.query(Barbero.id).filter(Barbero.id == barbero_id).with_for_update().scalar()
+
     def __repr__(self):
         return f'<Barbero {self.nombre}>'
     
@@ -328,7 +364,7 @@ class DisponibilidadBarbero(db.Model):
             raise ValueError("La hora de fin debe ser posterior a la hora de inicio")
         return hora_fin
     
-    def generar_slots_disponibles(self, fecha, duracion=30):
+    def generar_slots_disponibles(self, fecha, duracion=30, excluir_cita_id=None):
         """
         Genera slots de tiempo disponibles para una fecha específica
         considerando solapamientos de citas existentes
@@ -336,6 +372,7 @@ class DisponibilidadBarbero(db.Model):
         Args:
             fecha (date): Fecha para la que se quieren generar los slots
             duracion (int): Duración de cada slot en minutos
+            excluir_cita_id (int, optional): Cita que no ocupa horario (la que se está reprogramando)
             
         Returns:
             list: Lista de diccionarios con la información de cada slot
@@ -360,12 +397,15 @@ class DisponibilidadBarbero(db.Model):
             # Obtener todas las citas que ocupan espacio para este día y barbero
             try:
                 # Incluimos 'expirada' para mantener esos slots ocupados como solicitado por el cliente
-                citas_del_dia = Cita.query.filter(
+                query = Cita.query.filter(
                     Cita.barbero_id == self.barbero_id,
                     Cita.fecha >= datetime.combine(fecha, self.hora_inicio),
                     Cita.fecha < datetime.combine(fecha + timedelta(days=1), self.hora_inicio),
-                    Cita.estado.in_(['confirmada', 'pendiente_confirmacion', 'expirada'])
-                ).all()
+                    Cita.estado.in_(Cita.ESTADOS_OCUPAN_HORARIO)
+                )
+                if excluir_cita_id is not None:
+                    query = query.filter(Cita.id != excluir_cita_id)
+                citas_del_dia = query.all()
                 
                 current_app.logger.debug(f"Bloque {self.id}: Encontradas {len(citas_del_dia)} citas para este día")
                 
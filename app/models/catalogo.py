@@ -0,0 +1,256 @@
+# filepath: app/models/catalogo.py
+"""
+Instantánea del catálogo público (barberos, servicios, sliders) y listado de productos.
+
+Las páginas públicas (home, servicios, productos, sitemap) leen siempre los
+mismos datos de catálogo. `CatalogoPublico.construir` los carga con una sola
+tanda de consultas (las galerías de todos los servicios en una consulta, con
+`selectinload(Servicio.imagenes_activas)`) y los
+copia a objetos simples e inmutables, de modo que la misma instancia se puede
+compartir entre peticiones e hilos sin tocar la sesión de SQLAlchemy.
+
+Los productos van en un objeto aparte (`ListadoProductos`), construido con una
+sola consulta y con una caducidad corta (`PRODUCTOS_CACHE_SECONDS`) además de la
+invalidación por versión, porque precio y existencias cambian más a menudo.
+
+Cada copia con imagen lleva su `placeholder` (LQIP, ver `app/utils/images.py`),
+leído de `procesamiento_imagen` (una consulta más en la instantánea; un LEFT
+JOIN en el listado de productos).
+
+Ambos se cachean por versión de catálogo (ver `app/utils/catalog_cache.py`);
+la tabla `catalogo_version` propaga los cambios entre workers.
+"""
+from collections import namedtuple
+from datetime import datetime
+from itertools import groupby
+
+from flask import current_app
+from sqlalchemy.orm import selectinload
+
+from app import db
+from app.utils.images import ImagenResponsiveMixin, srcset
+
+
+class CatalogoVersion(db.Model):
+    """
+    Contador global de cambios del catálogo (una sola fila, id=1).
+
+    Cada commit que modifica un modelo de catálogo lo incrementa; los workers lo
+    consultan cada pocos segundos y descartan su caché si cambió.
+    """
+    __tablename__ = 'catalogo_version'
+
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    actualizado = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<CatalogoVersion {self.version}>'
+
+
+class _Inmutable:
+    """Base de los objetos de la instantánea: atributos fijados en el constructor."""
+    __slots__ = ()
+
+    def __init__(self, **campos):
+        for nombre in self.__slots__:
+            object.__setattr__(self, nombre, campos.get(nombre))
+
+    def __setattr__(self, nombre, valor):
+        raise AttributeError(f'{type(self).__name__} es inmutable')
+
+    def __repr__(self):
+        return f'<{type(self).__name__} {getattr(self, "id", "")}>'
+
+
+class BarberoPublico(ImagenResponsiveMixin, _Inmutable):
+    __slots__ = ('id', 'nombre', 'especialidad', 'descripcion', 'imagen_url', 'placeholder')
+
+
+class ImagenPublica(ImagenResponsiveMixin, _Inmutable):
+    __slots__ = ('id', 'ruta_imagen', 'orden', 'placeholder')
+    campo_imagen = 'ruta_imagen'
+
+
+class ServicioPublico(_Inmutable):
+    """Copia de `Servicio` con la misma interfaz que usan las plantillas."""
+    __slots__ = ('id', 'nombre', 'descripcion', 'precio', 'duracion_estimada', 'duracion_minutos',
+                 'imagen_url', 'orden', 'creado', 'actualizado', 'imagenes', 'placeholder')
+
+    def get_imagenes_activas(self):
+        return self.imagenes
+
+    def get_imagen_principal(self):
+        return self.imagenes[0].ruta_imagen if self.imagenes else self.imagen_url
+
+    def srcset(self, formato='webp'):
+        return srcset(self.get_imagen_principal(), formato)
+
+    def get_duracion_minutos(self):
+        return self.duracion_minutos or 30
+
+    def get_duracion_hhmm(self):
+        horas, minutos = divmod(self.get_duracion_minutos(), 60)
+        return f"{horas:02d}:{minutos:02d}"
+
+
+class SliderPublico(ImagenResponsiveMixin, _Inmutable):
+    __slots__ = ('id', 'titulo', 'subtitulo', 'tipo', 'imagen_url', 'instagram_embed_code', 'orden',
+                 'fecha_actualizacion', 'placeholder')
+
+    @property
+    def imagen_url_or_placeholder(self):
+        return self.imagen_url or '/static/images/placeholder_slide.jpg'
+
+
+class ProductoPublico(ImagenResponsiveMixin, _Inmutable):
+    __slots__ = ('id', 'nombre', 'descripcion', 'precio', 'imagen_url', 'categoria_id', 'cantidad',
+                 'creado', 'actualizado', 'placeholder')
+
+
+class CategoriaPublica(_Inmutable):
+    __slots__ = ('id', 'nombre', 'actualizado')
+
+
+# Elemento de `categorias_con_productos` (la plantilla usa item.categoria / item.productos)
+GrupoCategoria = namedtuple('GrupoCategoria', 'categoria productos')
+
+
+def _copiar(clase, fila, **extra):
+    valores = {nombre: getattr(fila, nombre, None) for nombre in clase.__slots__ if nombre not in extra}
+    return clase(**valores, **extra)
+
+
+def _placeholders():
+    """{url: data URI} de las imágenes subidas que ya tienen placeholder."""
+    from app.models.imagen import ProcesamientoImagen
+
+    return dict(db.session.query(ProcesamientoImagen.ruta, ProcesamientoImagen.placeholder)
+                .filter(ProcesamientoImagen.placeholder.is_not(None)))
+
+
+def _copiar_con_imagen(clase, fila, placeholders, **extra):
+    return _copiar(clase, fila, placeholder=placeholders.get(getattr(fila, clase.campo_imagen)), **extra)
+
+
+def _copiar_servicio(servicio, placeholders):
+    imagenes = tuple(_copiar_con_imagen(ImagenPublica, i, placeholders) for i in servicio.imagenes_activas)
+    principal = imagenes[0].placeholder if imagenes else placeholders.get(servicio.imagen_url)
+    return _copiar(ServicioPublico, servicio, imagenes=imagenes, placeholder=principal)
+
+
+class CatalogoPublico(_Inmutable):
+    """
+    Instantánea inmutable del catálogo público.
+
+    Attributes:
+        version (int): Versión de catálogo con la que se construyó
+        barberos (tuple[BarberoPublico]): Activos, en el orden de la base de datos
+        servicios (tuple[ServicioPublico]): Activos, por `orden` y `nombre`
+        sliders (tuple[SliderPublico]): Activos, por `orden`
+    """
+    __slots__ = ('version', 'barberos', 'servicios', 'sliders')
+
+    def servicio(self, servicio_id):
+        """Servicio activo con ese id, o None."""
+        return next((s for s in self.servicios if s.id == servicio_id), None)
+
+    @property
+    def servicios_por_nombre(self):
+        return tuple(sorted(self.servicios, key=lambda s: s.nombre))
+
+    @classmethod
+    def construir(cls, version):
+        from app.models.barbero import Barbero
+        from app.models.servicio import Servicio
+
+        placeholders = _placeholders()
+        barberos = tuple(_copiar_con_imagen(BarberoPublico, b, placeholders)
+                         for b in Barbero.query.filter_by(activo=True).all())
+
+        # Galerías de todos los servicios activos en una sola consulta (SELECT ... WHERE servicio_id IN)
+        servicios = tuple(
+            _copiar_servicio(s, placeholders)
+            for s in Servicio.query.options(selectinload(Servicio.imagenes_activas))
+            .filter_by(activo=True).order_by(Servicio.orden.asc(), Servicio.nombre.asc())
+        )
+
+        sliders = ()
+        try:
+            from app.models.slider import Slider
+            sliders = tuple(_copiar_con_imagen(SliderPublico, s, placeholders)
+                            for s in Slider.get_active_slides_ordered())
+        except Exception:
+            db.session.rollback()  # El modelo Slider es opcional
+
+        return cls(version=version, barberos=barberos, servicios=servicios, sliders=sliders)
+
+
+class ListadoProductos(_Inmutable):
+    """
+    Productos activos agrupados por categoría, cargados con una sola consulta.
+
+    Attributes:
+        version (int): Versión de catálogo con la que se construyó
+        categorias_con_productos (tuple[GrupoCategoria]): Por nombre de categoría y de producto
+        productos (tuple[ProductoPublico]): Todos los activos, incluidos los sin categoría
+        productos_destacados (tuple[ProductoPublico]): Los 3 productos activos más recientes
+    """
+    __slots__ = ('version', 'categorias_con_productos', 'productos', 'productos_destacados')
+
+    @classmethod
+    def construir(cls, version):
+        from app.models.categoria import Categoria
+        from app.models.imagen import ProcesamientoImagen
+        from app.models.producto import Producto
+
+        # producto LEFT JOIN categorias (y el placeholder de su imagen), ordenado para agrupar en una pasada
+        filas = db.session.query(Producto, Categoria, ProcesamientoImagen.placeholder) \
+            .outerjoin(Categoria, Producto.categoria_rel) \
+            .outerjoin(ProcesamientoImagen, ProcesamientoImagen.ruta == Producto.imagen_url) \
+            .filter(Producto.activo.is_(True)) \
+            .order_by(Categoria.nombre.is_(None), Categoria.nombre, Categoria.id, Producto.nombre) \
+            .all()
+
+        grupos, productos = [], []
+        for categoria, filas_categoria in groupby(filas, key=lambda fila: fila[1]):
+            copias = tuple(_copiar(ProductoPublico, producto, placeholder=placeholder)
+                           for producto, _, placeholder in filas_categoria)
+            productos.extend(copias)
+            if categoria is not None:  # La página solo muestra productos con categoría
+                grupos.append(GrupoCategoria(_copiar(CategoriaPublica, categoria), copias))
+
+        destacados = tuple(sorted(productos, key=lambda p: p.creado or datetime.min, reverse=True)[:3])
+        return cls(version=version, categorias_con_productos=tuple(grupos), productos=tuple(productos),
+                   productos_destacados=destacados)
+
+    def como_dict(self):
+        """Versión JSON del listado (para `/api/productos`)."""
+        return {
+            'categorias': [{
+                'id': grupo.categoria.id,
+                'nombre': grupo.categoria.nombre,
+                'productos': [{
+                    'id': p.id,
+                    'nombre': p.nombre,
+                    'descripcion': p.descripcion,
+                    'precio': float(p.precio),
+                    'imagen_url': p.imagen_url,
+                    'placeholder': p.placeholder,
+                    'disponible': (p.cantidad or 0) > 0,
+                } for p in grupo.productos],
+            } for grupo in self.categorias_con_productos],
+        }
+
+
+def obtener_catalogo_publico():
+    """Instantánea vigente del catálogo público (compartida entre peticiones)."""
+    from app.utils.catalog_cache import obtener_en_cache
+    return obtener_en_cache('catalogo_publico', CatalogoPublico.construir)
+
+
+def obtener_listado_productos():
+    """Listado de productos vigente (caduca a los `PRODUCTOS_CACHE_SECONDS` segundos)."""
+    from app.utils.catalog_cache import obtener_en_cache
+    return obtener_en_cache('listado_productos', ListadoProductos.construir,
+                            ttl=current_app.config.get('PRODUCTOS_CACHE_SECONDS', 60))
@@ -4,12 +4,16 @@ from flask import current_app
 from itsdangerous import URLSafeTimedSerializer, SignatureExpired, BadTimeSignature
 from app.models.barbero import Barbero
 from app.models.servicio import Servicio # Importar Servicio
-from sqlalchemy import event
+from sqlalchemy import event, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import validates
 
 class Cliente(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     nombre = db.Column(db.String(100), nullable=False)
-    email = db.Column(db.String(120), nullable=False, index=True)
+    email = db.Column(db.String(120), nullable=False, unique=True, index=True)  # Normalizado (ver normalizar_email)
     telefono = db.Column(db.String(20))
     creado = db.Column(db.DateTime, default=datetime.utcnow)
     ultima_visita = db.Column(db.DateTime, nullable=True)
@@ -21,6 +25,63 @@ class Cliente(db.Model):
     
     def __repr__(self):
         return f'<Cliente {self.nombre}>'
+
+    @staticmethod
+    def normalizar_email(email):
+        """Forma canónica del email: la clave única de un cliente."""
+        return (email or '').strip().lower()
+
+    @validates('email')
+    def validate_email(self, key, email):
+        return Cliente.normalizar_email(email)
+
+    @staticmethod
+    def upsert(nombre, email, telefono=None):
+        """
+        Crea el cliente o actualiza sus datos de contacto en una sola sentencia
+        (`INSERT ... ON CONFLICT (email) DO UPDATE ... RETURNING id`).
+
+        Es el punto único por el que las reservas (web, admin y barbero) y el
+        formulario de contacto dan de alta clientes; el índice único sobre el email
+        normalizado evita duplicados incluso con peticiones simultáneas. Un teléfono
+        vacío no sobrescribe el que ya estaba guardado.
+
+        Returns:
+            int: ID del cliente
+        """
+        valores = {
+            'nombre': (nombre or '').strip(),
+            'email': Cliente.normalizar_email(email),
+            'telefono': (telefono or '').strip() or None,
+        }
+        dialecto = db.engine.dialect
+        if dialecto.name in ('postgresql', 'sqlite') and dialecto.insert_returning:
+            insertar = pg_insert if dialecto.name == 'postgresql' else sqlite_insert
+            stmt = insertar(Cliente).values(**valores)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[Cliente.email],
+                set_={
+                    'nombre': stmt.excluded.nombre,
+                    'telefono': db.func.coalesce(stmt.excluded.telefono, Cliente.telefono),
+                },
+            ).returning(Cliente.id)
+            return db.session.execute(stmt).scalar_one()
+
+        # Otros motores: buscar y, si no existe, insertar en un savepoint
+        cliente = Cliente.query.filter_by(email=valores['email']).first()
+        if cliente is None:
+            try:
+                with db.session.begin_nested():
+                    cliente = Cliente(**valores)
+                    db.session.add(cliente)
+                return cliente.id
+            except IntegrityError:
+                cliente = Cliente.query.filter_by(email=valores['email']).one()
+        cliente.nombre = valores['nombre']
+        if valores['telefono']:
+            cliente.telefono = valores['telefono']
+        db.session.flush()
+        return cliente.id
     
     def clasificar_segmento(self):
         """Clasifica al cliente según su patrón de visitas"""
@@ -69,6 +130,11 @@ class Mensaje(db.Model):
 
 # Corregir la clase Cita
 class Cita(db.Model):
+    __table_args__ = (
+        # Búsquedas por estado en un rango de fechas (recordatorios, agenda del día)
+        db.Index('ix_cita_estado_fecha', 'estado', 'fecha'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     cliente_id = db.Column(db.Integer, db.ForeignKey('cliente.id'), nullable=False)
     barbero_id = db.Column(db.Integer, db.ForeignKey('barbero.id'), nullable=False)
@@ -83,12 +149,22 @@ class Cita(db.Model):
     # Campos para registro de precio al momento de la reserva
     precio_cobrado = db.Column(db.Numeric(10, 2), nullable=True)  # Precio al momento de reserva
     es_precio_personalizado = db.Column(db.Boolean, default=False)  # True si usó precio personalizado del barbero
+
+    # Recordatorios enviados (momento del envío); NULL = pendiente. Hacen idempotente la tarea.
+    recordatorio_24h_enviado = db.Column(db.DateTime, nullable=True)
+    recordatorio_2h_enviado = db.Column(db.DateTime, nullable=True)
     
     # Relaciones
     # cliente ya está en Cliente model via backref='cliente'
     # barbero ya está en Barbero model via backref='barbero'
     servicio_rel = db.relationship('Servicio', backref='citas_servicio', foreign_keys=[servicio_id]) # Cambiado backref para evitar conflicto si Servicio tiene otras citas
 
+    # Estados que ocupan el horario del barbero. 'expirada' se incluye a propósito:
+    # una cita pendiente que expira mantiene su horario cerrado.
+    ESTADOS_OCUPAN_HORARIO = ('confirmada', 'pendiente_confirmacion', 'expirada')
+    # Estados desde los que el enlace del correo todavía puede confirmar la cita
+    ESTADOS_CONFIRMABLES = ('pendiente_confirmacion', 'expirada')
+
     # Alias para compatibilidad con plantillas que usan cita.servicio
     @property
     def servicio(self):
@@ -99,28 +175,52 @@ class Cita(db.Model):
         self.servicio_rel = value
     
     @staticmethod
-    def limpiar_citas_expiradas():
-        """Registra citas que han expirado pero NO las marca como expiradas para mantener horarios cerrados"""
-        from datetime import datetime, timedelta
-        from app import db
-        
-        limite_expiracion = datetime.utcnow() - timedelta(hours=1)
-        
-        citas_expiradas = Cita.query.filter(
+    def limpiar_citas_expiradas(horas=1):
+        """
+        Marca como 'expirada' las citas pendientes de confirmación cuyo plazo ya pasó.
+
+        Se resuelve con un único UPDATE set-based (con RETURNING cuando el dialecto lo
+        soporta) en vez de cargar cada cita en memoria. El estado 'expirada' sigue
+        contando como ocupado en la agenda (ver ESTADOS_OCUPAN_HORARIO), así que el
+        horario se mantiene cerrado. No se ejecuta dentro de requests: se lanza con
+        `flask mantenimiento expirar-citas`.
+
+        Args:
+            horas (int): Horas sin confirmar tras las cuales una cita se considera expirada
+
+        Returns:
+            int: Número de citas marcadas como expiradas
+        """
+        limite_expiracion = datetime.utcnow() - timedelta(hours=horas)
+        condiciones = (
             Cita.estado == 'pendiente_confirmacion',
-            Cita.creado < limite_expiracion
-        ).all()
-        
-        # Solo registrar en logs, NO cambiar estado
-        for cita in citas_expiradas:
-            current_app.logger.info(f"Cita ID {cita.id} ha expirado pero mantiene horario ocupado - "
-                                f"Cliente: {cita.cliente.email}, Fecha cita: {cita.fecha}")
-        
-        if citas_expiradas:
-            # NO hacer commit - no hay cambios que guardar
-            current_app.logger.info(f"Se detectaron {len(citas_expiradas)} citas expiradas (horarios mantenidos cerrados)")
-        
-        return len(citas_expiradas)
+            Cita.creado < limite_expiracion,
+        )
+
+        if db.engine.dialect.update_returning:
+            stmt = (
+                update(Cita)
+                .where(*condiciones)
+                .values(estado='expirada')
+                .returning(Cita.id)
+                .execution_options(synchronize_session=False)
+            )
+            ids_expirados = db.session.execute(stmt).scalars().all()
+        else:
+            # Fallback para SQLite < 3.35 (sin RETURNING): seleccionar ids y actualizar por lote
+            ids_expirados = [cita_id for (cita_id,) in db.session.query(Cita.id).filter(*condiciones)]
+            if ids_expirados:
+                db.session.query(Cita).filter(Cita.id.in_(ids_expirados)).update(
+                    {'estado': 'expirada'}, synchronize_session=False
+                )
+
+        db.session.commit()
+
+        if ids_expirados:
+            current_app.logger.info(f"Se marcaron {len(ids_expirados)} citas como expiradas "
+                                    f"(horarios mantenidos cerrados): {ids_expirados}")
+
+        return len(ids_expirados)
 
     def actualizar_segmentacion_cliente(self):
         """Actualiza la segmentación del cliente cuando se completa una cita"""
@@ -166,7 +266,7 @@ class Cita(db.Model):
             )
             cita = Cita.query.get(cita_id)
             # Verificar que la cita aún esté esperando confirmación
-            if cita and cita.estado == 'pendiente_confirmacion':
+            if cita and cita.estado in Cita.ESTADOS_CONFIRMABLES:
                 return cita
         except (SignatureExpired, BadTimeSignature):
             return None # Token expirado o inválido
@@ -192,6 +292,89 @@ class Cita(db.Model):
         except Exception:
             return None
 
+    # --- Gestión por el cliente (reprogramar / cancelar desde el enlace del correo) ---
+
+    # Estados en los que el cliente todavía puede mover o cancelar su cita
+    ESTADOS_GESTIONABLES = ('pendiente_confirmacion', 'confirmada', 'expirada')
+
+    def generate_manage_token(self):
+        return Cita.manage_token_for(self.id)
+
+    @staticmethod
+    def manage_token_for(cita_id):
+        """Token del enlace de gestión a partir del id (útil con filas planas, sin instancia)."""
+        serializer = URLSafeTimedSerializer(current_app.config['SECRET_KEY'])
+        return serializer.dumps(cita_id, salt='cita-gestion-salt')
+
+    @staticmethod
+    def get_cita_from_manage_token(token, max_age_seconds=60 * 60 * 24 * 60):  # 60 días
+        """Devuelve la cita del enlace de gestión, o None si el token no es válido o expiró."""
+        serializer = URLSafeTimedSerializer(current_app.config['SECRET_KEY'])
+        try:
+            cita_id = serializer.loads(token, salt='cita-gestion-salt', max_age=max_age_seconds)
+            return db.session.get(Cita, cita_id)
+        except (SignatureExpired, BadTimeSignature):
+            return None
+        except Exception:
+            return None
+
+    def puede_gestionarse(self):
+        return self.estado in Cita.ESTADOS_GESTIONABLES and self.fecha > datetime.now()
+
+    @staticmethod
+    def buscar_solapamiento(barbero_id, inicio, duracion, excluir_id=None):
+        """
+        Devuelve la primera cita del barbero que se solapa con [inicio, inicio + duracion),
+        o None si el intervalo está libre. Considera los estados que ocupan horario.
+        """
+        fin = inicio + timedelta(minutes=duracion)
+        inicio_dia = datetime.combine(inicio.date(), datetime.min.time())
+        query = Cita.query.filter(
+            Cita.barbero_id == barbero_id,
+            Cita.estado.in_(Cita.ESTADOS_OCUPAN_HORARIO),
+            Cita.fecha >= inicio_dia,
+            Cita.fecha < fin,
+        )
+        if excluir_id is not None:
+            query = query.filter(Cita.id != excluir_id)
+        for cita in query.all():
+            fin_existente = cita.fecha + timedelta(minutes=cita.duracion or 30)
+            if not (fin <= cita.fecha or inicio >= fin_existente):
+                return cita
+        return None
+
+    def reprogramar(self, nueva_fecha):
+        """
+        Mueve la cita a `nueva_fecha` en una sola transacción: con la agenda del
+        barbero bloqueada se verifica el nuevo intervalo (ignorando el de la propia
+        cita) y se actualiza la fila, de modo que el horario anterior se libera y el
+        nuevo se ocupa a la vez.
+
+        Returns:
+            tuple: (ok, motivo) donde motivo es None, 'fuera_de_horario' o 'solapamiento'
+        """
+        duracion = self.duracion or 30
+        Barbero.bloquear_agenda(self.barbero_id)
+
+        if nueva_fecha <= datetime.now() or not self.barbero.cubre_horario(nueva_fecha, duracion):
+            db.session.rollback()
+            return False, 'fuera_de_horario'
+        if Cita.buscar_solapamiento(self.barbero_id, nueva_fecha, duracion, excluir_id=self.id):
+            db.session.rollback()
+            return False, 'solapamiento'
+
+        self.fecha = nueva_fecha
+        # Los recordatorios se refieren al horario anterior
+        self.recordatorio_24h_enviado = None
+        self.recordatorio_2h_enviado = None
+        db.session.commit()
+        return True, None
+
+    def cancelar(self):
+        """Cancela la cita y libera su horario."""
+        self.estado = 'cancelada'
+        db.session.commit()
+
     def __repr__(self):
         return f'<Cita {self.id} - {self.fecha} - {self.estado}>'
     
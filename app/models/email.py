@@ -3,6 +3,7 @@ from flask import current_app, render_template, url_for
 from flask_mail import Message
 from app import mail # Asegúrate que mail esté disponible aquí (desde app/__init__.py)
 from threading import Thread
+from datetime import datetime, timedelta
 
 def send_async_email(app, msg):
     with app.app_context():
@@ -24,6 +25,7 @@ def send_email(subject, recipients, text_body, html_body, sender=None):
 def send_appointment_confirmation_email(cliente_email, cliente_nombre, cita, token):
     # Asegúrate que 'public.confirmar_cita_route' sea el nombre de tu endpoint de confirmación
     confirm_url = url_for('public.confirmar_cita_route', token=token, _external=True)
+    manage_url = url_for('public.gestionar_cita', token=cita.generate_manage_token(), _external=True)
     subject = "Confirma tu cita en Barber Brothers"
 
     # Para acceder a cita.servicio_rel.nombre y cita.barbero.nombre en la plantilla,
@@ -39,9 +41,120 @@ def send_appointment_confirmation_email(cliente_email, cliente_nombre, cita, tok
         text_body=render_template('email/confirm_appointment.txt',
                                   cliente_nombre=cliente_nombre,
                                   cita=cita, # Pasas el objeto cita completo
-                                  confirm_url=confirm_url),
+                                  confirm_url=confirm_url,
+                                  manage_url=manage_url),
         html_body=render_template('email/confirm_appointment.html',
                                   cliente_nombre=cliente_nombre,
                                   cita=cita, # Pasas el objeto cita completo
-                                  confirm_url=confirm_url)
-    )
\ No newline at end of file
+                                  confirm_url=confirm_url,
+                                  manage_url=manage_url)
+    )
+
+# Ventanas de recordatorio: (columna de control, desde, hasta) relativas a ahora.
+# Las citas que ya están dentro de las 2 horas solo reciben el recordatorio corto.
+VENTANAS_RECORDATORIO = {
+    '24h': ('recordatorio_24h_enviado', timedelta(hours=2), timedelta(hours=24)),
+    '2h': ('recordatorio_2h_enviado', timedelta(0), timedelta(hours=2)),
+}
+
+
+def citas_para_recordatorio(ventana, ahora=None):
+    """
+    Citas confirmadas dentro de la ventana que aún no recibieron ese recordatorio.
+
+    Una sola consulta con JOIN a cliente, barbero y servicio que devuelve filas
+    planas (sin instancias ORM), así no hay consultas por cita al renderizar.
+
+    Returns:
+        list: Filas con id, fecha, cliente_nombre, cliente_email, barbero_nombre, servicio_nombre
+    """
+    from app import db
+    from app.models.cliente import Cita, Cliente
+    from app.models.barbero import Barbero
+    from app.models.servicio import Servicio
+
+    columna, desde, hasta = VENTANAS_RECORDATORIO[ventana]
+    ahora = ahora or datetime.now()  # `Cita.fecha` se guarda en hora local
+    return db.session.query(
+        Cita.id,
+        Cita.fecha,
+        Cliente.nombre.label('cliente_nombre'),
+        Cliente.email.label('cliente_email'),
+        Barbero.nombre.label('barbero_nombre'),
+        Servicio.nombre.label('servicio_nombre'),
+    ).join(Cliente, Cita.cliente_id == Cliente.id) \
+     .join(Barbero, Cita.barbero_id == Barbero.id) \
+     .outerjoin(Servicio, Cita.servicio_id == Servicio.id) \
+     .filter(
+        Cita.estado == 'confirmada',
+        Cita.fecha > ahora + desde,
+        Cita.fecha <= ahora + hasta,
+        getattr(Cita, columna).is_(None),
+    ).order_by(Cita.fecha).all()
+
+
+def send_appointment_reminders(ventana, tamano_lote=None):
+    """
+    Envía los recordatorios de una ventana ('24h' o '2h') en lotes.
+
+    Las plantillas se compilan una vez por ejecución y cada lote se envía sobre una
+    sola conexión SMTP. Tras cada lote, las citas enviadas se marcan con un UPDATE
+    masivo; si el proceso se corta, una nueva ejecución solo retoma las pendientes.
+
+    Returns:
+        dict: Contadores de enviados y fallidos
+    """
+    from app import db
+    from app.models.cliente import Cita
+
+    app = current_app._get_current_object()
+    tamano_lote = tamano_lote or app.config.get('REMINDER_BATCH_SIZE', 100)
+    columna = VENTANAS_RECORDATORIO[ventana][0]
+
+    if not app.config.get('MAIL_SERVER') and not app.extensions['mail'].suppress:
+        app.logger.warning("Recordatorios omitidos: MAIL_SERVER no está configurado")
+        return {'ventana': ventana, 'enviados': 0, 'fallidos': 0, 'omitido': 'sin MAIL_SERVER'}
+
+    filas = citas_para_recordatorio(ventana)
+    # El enlace de gestión necesita una URL absoluta; fuera de un request se arma con EXTERNAL_BASE_URL
+    base_url = app.config.get('EXTERNAL_BASE_URL')
+    manage_urls = {}
+    if base_url and filas:
+        with app.test_request_context(base_url=base_url):
+            manage_urls = {
+                fila.id: url_for('public.gestionar_cita', token=Cita.manage_token_for(fila.id), _external=True)
+                for fila in filas
+            }
+    plantilla_html = app.jinja_env.get_template('email/reminder_appointment.html')
+    plantilla_txt = app.jinja_env.get_template('email/reminder_appointment.txt')
+    sender = app.config.get('MAIL_DEFAULT_SENDER', 'noreply@example.com')
+    subject = ("Tu cita en Barber Brothers es mañana" if ventana == '24h'
+               else "Tu cita en Barber Brothers es en unas horas")
+
+    enviados, fallidos = 0, 0
+    for inicio in range(0, len(filas), tamano_lote):
+        lote = filas[inicio:inicio + tamano_lote]
+        ids_enviados = []
+        with mail.connect() as conexion:
+            for fila in lote:
+                contexto = {'ventana': ventana, 'cita': fila, 'manage_url': manage_urls.get(fila.id)}
+                msg = Message(subject, sender=sender, recipients=[fila.cliente_email])
+                msg.body = plantilla_txt.render(contexto)
+                msg.html = plantilla_html.render(contexto)
+                try:
+                    conexion.send(msg)
+                    ids_enviados.append(fila.id)
+                except Exception as e:
+                    fallidos += 1
+                    app.logger.error(f"Error al enviar recordatorio {ventana} de la cita {fila.id}: {e}")
+
+        if ids_enviados:
+            Cita.query.filter(Cita.id.in_(ids_enviados)).update(
+                {columna: datetime.utcnow()}, synchronize_session=False
+            )
+            db.session.commit()
+            enviados += len(ids_enviados)
+
+    if filas:
+        app.logger.info(f"Recordatorios {ventana}: {enviados} enviados, {fallidos} fallidos")
+    return {'ventana': ventana, 'enviados': enviados, 'fallidos': fallidos}
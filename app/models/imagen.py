@@ -0,0 +1,35 @@
+# filepath: app/models/imagen.py
+from datetime import datetime
+
+from app import db
+
+
+class ProcesamientoImagen(db.Model):
+    """
+    Estado del procesamiento en segundo plano de una imagen subida.
+
+    `save_image` crea la fila como `pendiente`; el pool de procesos (ver
+    `app/utils/image_processing.py`) la pasa a `procesando` y luego a `listo`
+    (derivados generados) o `error` (el archivo no era una imagen válida).
+
+    La fila es por archivo (varias filas de modelos pueden compartir la misma
+    subida), así que aquí se guarda también su `placeholder` (LQIP).
+    """
+    __tablename__ = 'procesamiento_imagen'
+
+    PENDIENTE = 'pendiente'
+    PROCESANDO = 'procesando'
+    LISTO = 'listo'
+    ERROR = 'error'
+
+    id = db.Column(db.Integer, primary_key=True)
+    ruta = db.Column(db.String(255), nullable=False, unique=True, index=True)  # URL /static/uploads/...
+    estado = db.Column(db.String(20), nullable=False, default=PENDIENTE, index=True)
+    derivados = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text, nullable=True)
+    placeholder = db.Column(db.Text, nullable=True)  # data:image/webp;base64,... (ver app/utils/images.py)
+    creado = db.Column(db.DateTime, default=datetime.utcnow)
+    actualizado = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<ProcesamientoImagen {self.ruta} {self.estado}>'
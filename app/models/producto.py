@@ -1,8 +1,9 @@
 from app import db
 from datetime import datetime
 from .categoria import Categoria
+from app.utils.images import ImagenResponsiveMixin
 
-class Producto(db.Model):
+class Producto(db.Model, ImagenResponsiveMixin):
     __tablename__ = 'productos'
     
     id = db.Column(db.Integer, primary_key=True)
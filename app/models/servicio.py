@@ -1,27 +1,67 @@
 # filepath: app/models/servicio.py
+import re
 from app import db
 from datetime import datetime
+from sqlalchemy.orm import validates
+
+
+def parsear_duracion(texto):
+    """
+    Interpreta una duración en texto libre ("30 min", "1 hora", "90") como minutos.
+
+    Returns:
+        int | None: Minutos, o None si el texto no contiene un número
+    """
+    if not texto:
+        return None
+    texto = str(texto).lower()
+    numeros = re.findall(r'\d+', texto)
+    if not numeros:
+        return None
+    numero = int(numeros[0])
+    # Determinar si es horas o minutos (minutos por defecto)
+    if 'hora' in texto or 'hour' in texto or 'hr' in texto:
+        return numero * 60
+    return numero
+
 
 class Servicio(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     nombre = db.Column(db.String(100), nullable=False, index=True)
     descripcion = db.Column(db.Text, nullable=True)
     precio = db.Column(db.Numeric(10, 2), nullable=False) # Para manejar decimales de dinero
-    duracion_estimada = db.Column(db.String(50), nullable=True) # Ej: "30 min", "1 hora"
+    duracion_estimada = db.Column(db.String(50), nullable=True) # Ej: "30 min", "1 hora" (texto mostrado)
+    duracion_minutos = db.Column(db.Integer, nullable=False, default=30, server_default='30') # Duración usada en agenda y precios
     activo = db.Column(db.Boolean, default=True, nullable=False) # Para mostrar/ocultar en el sitio público
     creado = db.Column(db.DateTime, default=datetime.utcnow)
+    actualizado = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # lastmod del sitemap
     imagen_url = db.Column(db.String(255), nullable=True) # URL de la imagen del servicio (mantener por compatibilidad)
     
     orden = db.Column(db.Integer, nullable=False, default=0, index=True)  # Nuevo campo para el orden de aparición
     # Relación con múltiples imágenes
     imagenes = db.relationship('ServicioImagen', back_populates='servicio', lazy='dynamic', cascade='all, delete-orphan')
+    # Galería pública (activas y ordenadas) como lista normal: se carga una vez por
+    # instancia, o para varios servicios de golpe con `selectinload(Servicio.imagenes_activas)`
+    imagenes_activas = db.relationship(
+        'ServicioImagen',
+        primaryjoin='and_(Servicio.id == ServicioImagen.servicio_id, ServicioImagen.activa.is_(True))',
+        order_by='(ServicioImagen.orden, ServicioImagen.creado)',
+        viewonly=True,
+    )
     
     def __repr__(self):
         return f'<Servicio {self.nombre}>'
+
+    @validates('duracion_estimada')
+    def validate_duracion_estimada(self, key, texto):
+        # Si no se indicó la duración en minutos se deriva del texto (p. ej. datos iniciales)
+        if self.duracion_minutos is None:
+            self.duracion_minutos = parsear_duracion(texto) or 30
+        return texto
     
     def get_imagenes_activas(self):
-        """Obtiene las imágenes activas ordenadas"""
-        return self.imagenes.filter_by(activa=True).order_by('orden', 'creado').all()
+        """Obtiene las imágenes activas ordenadas (sin consulta si ya están cargadas)"""
+        return self.imagenes_activas
     
     def get_imagen_principal(self):
         """Obtiene la imagen principal (primera) o fallback a imagen_url"""
@@ -29,34 +69,20 @@ class Servicio(db.Model):
         if imagenes:
             return imagenes[0].ruta_imagen
         return self.imagen_url
+
+    def srcset(self, formato='webp'):
+        """`srcset` de la imagen principal (ver `app/utils/images.py`)"""
+        from app.utils.images import srcset
+        return srcset(self.get_imagen_principal(), formato)
     
     def get_duracion_minutos(self):
         """
-        Extrae la duración en minutos del campo duracion_estimada
-        
+        Duración del servicio en minutos
+
         Returns:
-            int: Duración en minutos, 30 por defecto si no se puede parsear
+            int: Duración en minutos, 30 por defecto si no está definida
         """
-        if not self.duracion_estimada:
-            return 30
-            
-        duracion_str = str(self.duracion_estimada).lower()
-        
-        # Extraer números del string
-        import re
-        numeros = re.findall(r'\d+', duracion_str)
-        
-        if not numeros:
-            return 30
-            
-        numero = int(numeros[0])
-        
-        # Determinar si es horas o minutos
-        if 'hora' in duracion_str or 'hour' in duracion_str or 'hr' in duracion_str:
-            return numero * 60
-        else:
-            # Asumir que son minutos por defecto
-            return numero
+        return self.duracion_minutos or 30
 
     def get_duracion_hhmm(self):
         """
@@ -1,7 +1,9 @@
 from app import db
 from datetime import datetime
+from app.utils.images import ImagenResponsiveMixin
 
-class ServicioImagen(db.Model):
+class ServicioImagen(db.Model, ImagenResponsiveMixin):
+    campo_imagen = 'ruta_imagen'
     __tablename__ = 'servicio_imagenes'
     
     id = db.Column(db.Integer, primary_key=True)
@@ -1,7 +1,8 @@
 from datetime import datetime
 from app import db
+from app.utils.images import ImagenResponsiveMixin
 
-class Slider(db.Model):
+class Slider(db.Model, ImagenResponsiveMixin):
     __tablename__ = 'sliders'
     
     id = db.Column(db.Integer, primary_key=True)
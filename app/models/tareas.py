@@ -1,45 +1,345 @@
 # filepath: app/models/tareas.py
 """
 Módulo para tareas programadas y mantenimiento del sistema.
+
+Las funciones decoradas con `scheduler.tarea(...)` las ejecuta periódicamente el
+planificador de `app/utils/scheduler.py` (un solo worker por tarea gracias al
+lease de `TareaProgramada`). También pueden lanzarse a mano con
+`flask mantenimiento ...`.
 """
-from app import db
+import hashlib
+import json
+import re
+from flask import current_app
+from app import db, scheduler
 from datetime import datetime, date, timedelta
+from sqlalchemy.exc import IntegrityError
 from app.models.barbero import BloqueoHorario
 
+
+class TareaProgramada(db.Model):
+    """
+    Estado persistido de cada tarea periódica.
+
+    La fila hace de lease: el worker que logra escribir su `lease_owner` con un
+    UPDATE condicional es el único que ejecuta la tarea en esa vuelta.
+    """
+    __tablename__ = 'tarea_programada'
+
+    nombre = db.Column(db.String(80), primary_key=True)
+    lease_owner = db.Column(db.String(120), nullable=True)
+    lease_expira = db.Column(db.DateTime, nullable=True)
+    proxima_ejecucion = db.Column(db.DateTime, nullable=True)
+    ultima_ejecucion = db.Column(db.DateTime, nullable=True)
+    ultima_duracion_ms = db.Column(db.Integer, nullable=True)
+    ultimo_resultado = db.Column(db.Text, nullable=True)  # JSON con lo que devolvió la tarea
+    ultimo_error = db.Column(db.Text, nullable=True)
+    ejecuciones = db.Column(db.Integer, default=0, nullable=False)
+
+    @staticmethod
+    def asegurar_registro(nombre):
+        """Crea la fila de la tarea si todavía no existe (tolerante a carreras entre workers)."""
+        if db.session.get(TareaProgramada, nombre) is not None:
+            return
+        try:
+            db.session.add(TareaProgramada(nombre=nombre, ejecuciones=0))
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+
+    @staticmethod
+    def solicitar_ejecucion(nombre):
+        """Adelanta la próxima ejecución para que el planificador la tome en su siguiente vuelta."""
+        TareaProgramada.asegurar_registro(nombre)
+        TareaProgramada.query.filter_by(nombre=nombre).update(
+            {'proxima_ejecucion': datetime.utcnow()}, synchronize_session=False
+        )
+        db.session.commit()
+
+    @staticmethod
+    def resultado_de(nombre, max_antiguedad=None):
+        """
+        Devuelve el último resultado (deserializado) de una tarea.
+
+        Args:
+            nombre (str): Nombre de la tarea
+            max_antiguedad (timedelta, optional): Si se indica, descarta resultados más viejos
+
+        Returns:
+            Any: El resultado, o None si no hay uno utilizable
+        """
+        tarea = db.session.get(TareaProgramada, nombre)
+        if not tarea or not tarea.ultimo_resultado or tarea.ultimo_error:
+            return None
+        if max_antiguedad and (not tarea.ultima_ejecucion
+                               or datetime.utcnow() - tarea.ultima_ejecucion > max_antiguedad):
+            return None
+        try:
+            return json.loads(tarea.ultimo_resultado)
+        except ValueError:
+            return None
+
+    def __repr__(self):
+        return f'<TareaProgramada {self.nombre} última={self.ultima_ejecucion}>'
+
+
+@scheduler.tarea('expirar_citas', cada=timedelta(minutes=5),
+                 descripcion='Marca como expiradas las citas sin confirmar tras 1 hora')
+def expirar_citas_pendientes():
+    from app.models.cliente import Cita
+    return {'expiradas': Cita.limpiar_citas_expiradas()}
+
+
+@scheduler.tarea('limpiar_bloqueos', cada=timedelta(hours=24),
+                 descripcion='Elimina bloqueos de horario de días ya pasados')
 def limpiar_bloqueos_pasados():
     """
     Elimina los bloqueos de horario que ya han pasado.
     Esta función debe ejecutarse periódicamente, idealmente una vez al día.
-    
+
     Returns:
         int: Número de bloqueos eliminados
     """
     try:
-        # Verificar si la tabla existe
-        from sqlalchemy import inspect
-        inspector = inspect(db.engine)
-        if 'bloqueo_horario' not in inspector.get_table_names():
-            print("La tabla bloqueo_horario no existe en la base de datos")
-            return 0
-            
         # Obtener la fecha de ayer
         fecha_limite = date.today() - timedelta(days=1)
-        
-        # Buscar bloqueos anteriores a la fecha límite
-        bloqueos_pasados = BloqueoHorario.query.filter(
+
+        # Un único DELETE en vez de cargar y borrar fila por fila
+        count = BloqueoHorario.query.filter(
             BloqueoHorario.fecha <= fecha_limite
-        ).all()
-        
-        # Eliminar los bloqueos
-        count = 0
-        for bloqueo in bloqueos_pasados:
-            db.session.delete(bloqueo)
-            count += 1
-        
+        ).delete(synchronize_session=False)
+
         db.session.commit()
         return count
-    
+
     except Exception as e:
         db.session.rollback()
-        print(f"Error al limpiar bloqueos pasados: {str(e)}")
-        return 0
+        # Se relanza para que el planificador registre la ejecución como fallida
+        current_app.logger.error(f"Error al limpiar bloqueos pasados: {e}", exc_info=True)
+        raise
+
+
+@scheduler.tarea('actualizar_segmentos', cada=timedelta(hours=24),
+                 descripcion='Recalcula el segmento de todos los clientes')
+def actualizar_segmentacion_clientes():
+    """
+    Recalcula `Cliente.segmento` para todos los clientes con un único UPDATE.
+
+    Replica en SQL las reglas de `Cliente.clasificar_segmento()` (ver `_segmento_calculado`).
+
+    Returns:
+        dict: Número de clientes cuyo segmento cambió
+    """
+    from app.models.cliente import Cliente
+
+    nuevo_segmento = _segmento_calculado()
+    cambiados = Cliente.query.filter(
+        db.or_(Cliente.segmento.is_(None), Cliente.segmento != nuevo_segmento)
+    ).update({Cliente.segmento: nuevo_segmento}, synchronize_session=False)
+    db.session.commit()
+    return {'clientes_actualizados': cambiados}
+
+
+def _segmento_calculado():
+    """Expresión SQL con las reglas de `Cliente.clasificar_segmento()`."""
+    from app.models.cliente import Cliente
+
+    ahora = datetime.utcnow()
+    visitas = db.func.coalesce(Cliente.total_visitas, 0)
+    # (hoy - ultima_visita).days <= N  equivale a  ultima_visita > hoy - (N + 1) días
+    reciente_45 = Cliente.ultima_visita > ahora - timedelta(days=46)
+    reciente_60 = Cliente.ultima_visita > ahora - timedelta(days=61)
+
+    return db.case(
+        (Cliente.ultima_visita.is_(None), 'nuevo'),
+        (visitas >= 10, 'vip'),
+        (db.and_(visitas >= 5, reciente_45), 'recurrente'),
+        (visitas >= 5, 'inactivo'),
+        (db.and_(visitas >= 2, reciente_60), 'ocasional'),
+        (visitas >= 2, 'inactivo'),
+        else_='nuevo',
+    )
+
+
+def _clave_hash(prefijo, valor):
+    """Huella corta (8 bytes) de un valor normalizado; evita guardar emails y teléfonos en memoria."""
+    return prefijo + hashlib.blake2b(valor.encode('utf-8'), digest_size=8).digest()
+
+
+def _normalizar_telefono(telefono):
+    """Solo dígitos y, para números con indicativo (+57...), los 10 últimos. None si es demasiado corto."""
+    digitos = re.sub(r'\D', '', telefono or '')
+    return digitos[-10:] if len(digitos) >= 7 else None
+
+
+def agrupar_clientes_duplicados(tamano_lote=1000):
+    """
+    Recorre la tabla cliente por lotes (paginación por id) y agrupa los registros
+    con el mismo email normalizado. Dentro de cada grupo se conserva el cliente
+    más antiguo (id menor).
+
+    El teléfono no basta para fusionar: una familia o una empresa comparten
+    número. Los clientes de distintos grupos que coinciden solo en el teléfono
+    normalizado se devuelven aparte para que un administrador los confirme.
+
+    Solo se guardan en memoria huellas de 8 bytes y enteros, así que el recorrido
+    no depende del tamaño de las filas.
+
+    Returns:
+        tuple: ({id_duplicado: id_conservado}, [ids que comparten teléfono, ...])
+    """
+    from app.models.cliente import Cliente
+
+    padre = {}              # union-find por email: id -> id padre
+    dueno_email = {}        # huella de email -> id que la reclamó primero
+    por_telefono = {}       # huella de teléfono -> ids con ese número
+
+    def raiz(cliente_id):
+        while padre.get(cliente_id, cliente_id) != cliente_id:
+            cliente_id = padre[cliente_id]
+        return cliente_id
+
+    ultimo_id = 0
+    while True:
+        lote = db.session.query(Cliente.id, Cliente.email, Cliente.telefono) \
+            .filter(Cliente.id > ultimo_id).order_by(Cliente.id).limit(tamano_lote).all()
+        if not lote:
+            break
+        for cliente_id, email, telefono in lote:
+            telefono_normalizado = _normalizar_telefono(telefono)
+            if telefono_normalizado:
+                por_telefono.setdefault(_clave_hash(b't', telefono_normalizado), []).append(cliente_id)
+            if not email:
+                continue
+            clave = _clave_hash(b'e', Cliente.normalizar_email(email))
+            if clave not in dueno_email:
+                dueno_email[clave] = cliente_id
+                continue
+            # Unir grupos: siempre gana la raíz con menor id
+            a, b = raiz(dueno_email[clave]), raiz(cliente_id)
+            if a != b:
+                padre[max(a, b)] = min(a, b)
+        ultimo_id = lote[-1][0]
+        db.session.rollback()  # No mantener abierta la transacción de lectura entre lotes
+
+    mapeo = {cliente_id: raiz(cliente_id) for cliente_id in list(padre) if raiz(cliente_id) != cliente_id}
+    # Un teléfono compartido dentro de un mismo grupo de email no necesita confirmación
+    por_confirmar = {tuple(sorted({raiz(i) for i in ids})) for ids in por_telefono.values()}
+    return mapeo, sorted(list(grupo) for grupo in por_confirmar if len(grupo) > 1)
+
+
+def fusionar_clientes_duplicados(tamano_lote=500, simular=False):
+    """
+    Fusiona los clientes con el mismo email normalizado en el registro más
+    antiguo de cada grupo. Se ejecuta a mano (`flask mantenimiento
+    fusionar-clientes`, primero con `--simular`); los clientes que solo
+    comparten teléfono se informan en `por_confirmar` y no se tocan.
+
+    Con el índice único de `cliente.email` ya no se crean duplicados por email:
+    la fusión limpia los de antes y es el paso previo que exige la migración
+    `c3e5a7b9d1f2` para crear ese índice. Después solo aporta la lista de
+    coincidencias por teléfono para revisar.
+
+    Cada lote de duplicados se procesa en su propia transacción corta: se
+    reasignan `Cita.cliente_id` y `Mensaje.cliente_id` con un UPDATE por tabla
+    (CASE sobre el id), se suman los contadores de visitas en el cliente
+    conservado y se borran los duplicados. Así la tabla nunca queda bloqueada
+    durante toda la operación y el proceso puede interrumpirse y relanzarse.
+
+    Args:
+        tamano_lote (int): Duplicados por transacción
+        simular (bool): Solo cuenta lo que se fusionaría, sin modificar nada
+
+    Returns:
+        dict: Grupos, duplicados, citas/mensajes reasignados y grupos por confirmar
+    """
+    from app.models.cliente import Cliente, Cita, Mensaje
+
+    mapeo, por_confirmar = agrupar_clientes_duplicados()
+    resumen = {'grupos': len(set(mapeo.values())), 'duplicados': len(mapeo),
+               'citas_reasignadas': 0, 'mensajes_reasignados': 0, 'por_confirmar': por_confirmar}
+    if simular or not mapeo:
+        return resumen
+
+    duplicados = sorted(mapeo)
+    for inicio in range(0, len(duplicados), tamano_lote):
+        lote = {dup: mapeo[dup] for dup in duplicados[inicio:inicio + tamano_lote]}
+        try:
+            for modelo, contador in ((Cita, 'citas_reasignadas'), (Mensaje, 'mensajes_reasignados')):
+                resumen[contador] += modelo.query.filter(modelo.cliente_id.in_(lote)).update(
+                    {modelo.cliente_id: db.case(lote, value=modelo.cliente_id)},
+                    synchronize_session=False
+                )
+
+            # Contadores y datos de contacto del cliente conservado
+            ids = set(lote) | set(lote.values())
+            filas = {fila.id: fila for fila in db.session.query(
+                Cliente.id, Cliente.total_visitas, Cliente.ultima_visita, Cliente.telefono
+            ).filter(Cliente.id.in_(ids))}
+            conservados = {}
+            for dup, destino in lote.items():
+                if dup not in filas or destino not in filas:
+                    continue  # Ya fusionado por una ejecución anterior
+                actual = conservados.setdefault(destino, {
+                    'id': destino,
+                    'total_visitas': filas[destino].total_visitas or 0,
+                    'ultima_visita': filas[destino].ultima_visita,
+                    'telefono': filas[destino].telefono,
+                })
+                actual['total_visitas'] += filas[dup].total_visitas or 0
+                if filas[dup].ultima_visita and (not actual['ultima_visita']
+                                                 or filas[dup].ultima_visita > actual['ultima_visita']):
+                    actual['ultima_visita'] = filas[dup].ultima_visita
+                actual['telefono'] = actual['telefono'] or filas[dup].telefono
+            if conservados:
+                db.session.bulk_update_mappings(Cliente, list(conservados.values()))
+                # Los contadores cambiaron: segmento de los conservados en la misma transacción
+                Cliente.query.filter(Cliente.id.in_(conservados)).update(
+                    {Cliente.segmento: _segmento_calculado()}, synchronize_session=False)
+
+            Cliente.query.filter(Cliente.id.in_(lote)).delete(synchronize_session=False)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+    return resumen
+
+
+@scheduler.tarea('estadisticas_dashboard', cada=timedelta(minutes=15),
+                 descripcion='Precalcula las métricas y tendencias del dashboard de administración')
+def calcular_estadisticas_dashboard():
+    """
+    Precalcula las métricas de productividad y tendencias del dashboard.
+
+    El middleware de administración usa este resultado en lugar de recalcularlo
+    en cada carga del dashboard.
+    """
+    from app.utils.admin_cookies import AdminMetricsCalculator
+    return {
+        'metrics': AdminMetricsCalculator.calculate_productivity_metrics(),
+        'trending': AdminMetricsCalculator.get_trending_data(),
+    }
+
+
+@scheduler.tarea('procesar_imagenes_pendientes', cada=timedelta(minutes=10),
+                 descripcion='Reenvía al pool de procesos las imágenes subidas que quedaron sin procesar')
+def procesar_imagenes_pendientes():
+    from app.utils.image_processing import reprocesar_pendientes
+    return reprocesar_pendientes()
+
+
+@scheduler.tarea('recolectar_subidas', cada=timedelta(hours=24), lease_segundos=1800,
+                 descripcion='Borra (o pone en cuarentena) las subidas que ninguna imagen referencia')
+def recolectar_subidas_huerfanas():
+    from flask import current_app
+    from app.utils.uploads import recolectar_huerfanas
+    return recolectar_huerfanas(gracia_segundos=current_app.config.get('UPLOAD_GC_GRACIA_HORAS', 24) * 3600,
+                                cuarentena=current_app.config.get('UPLOAD_GC_CUARENTENA'))
+
+
+@scheduler.tarea('recordatorios_citas', cada=timedelta(minutes=15),
+                 descripcion='Envía los recordatorios de citas confirmadas (24 h y 2 h antes)')
+def enviar_recordatorios_citas():
+    from app.models.email import send_appointment_reminders
+    return [send_appointment_reminders('24h'), send_appointment_reminders('2h')]
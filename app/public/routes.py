@@ -7,9 +7,13 @@ tienda, contacto, y APIs de soporte para disponibilidad y agenda de citas.
 
 Resumen de rutas y responsabilidades
 - Home (`GET /`):
-  - Carga sliders activos (si el modelo `Slider` está disponible) en orden.
-  - Obtiene productos destacados (últimos por fecha de creación).
-  - Lista barberos activos y servicios activos (ordenados por `orden`, `nombre`).
+  - Sliders activos, productos destacados, barberos y servicios activos
+    (ordenados por `orden`, `nombre`) salen de la instantánea de catálogo
+    (`obtener_catalogo_publico`), compartida entre peticiones y reconstruida
+    solo cuando cambia el catálogo.
+  - Sliders, selects de barbero/servicio, calendario y equipo se renderizan
+    como fragmentos HTML cacheados (`fragmento_cacheado`); la personalización
+    por cookies (barbero/servicio favorito) se aplica fuera de ellos.
   - Genera un rango de fechas próximas para el calendario de cita.
   - Renderiza `templates/public/Home.html`.
 
@@ -21,9 +25,10 @@ Resumen de rutas y responsabilidades
   - Realiza `flush()` para obtener IDs y `commit()` con manejo básico de errores.
   - Renderiza `contacto.html` en GET; retorna estado 201 en POST exitoso.
 
-- Productos (`GET /productos`):
-  - Construye `categorias_con_productos` agrupando productos activos por
-    `Categoria` para la vista pública.
+- Productos (`GET /productos`, `GET /api/productos`):
+  - `categorias_con_productos` (productos activos agrupados por `Categoria`)
+    sale de `obtener_listado_productos`: una sola consulta agrupada con
+    `itertools.groupby` y cacheada. `/api/productos` devuelve lo mismo en JSON.
   - Renderiza `templates/public/productos.html`.
 
 - Checkout y confirmación de pedido:
@@ -32,22 +37,38 @@ Resumen de rutas y responsabilidades
     confirma transacción. Renderiza `templates/public/checkout.html`.
   - `GET /confirmacion-pedido/<pedido_id>`: Muestra `templates/public/confirmacion_pedido.html`.
 
+- Sitemap (`GET /sitemap.xml`, `/sitemap-index.xml`, `/sitemap-<n>.xml`):
+  - Generado por `utils.sitemap` a partir del catálogo cacheado, con `lastmod`
+    real y ETag; se reparte en varios archivos con índice si crece mucho.
+
 - Servicios (`GET /servicios`):
-  - Verifica conectividad y lista solo `Servicio` activos.
+  - Lista los `Servicio` activos con su galería desde la instantánea de catálogo.
   - Renderiza `templates/public/servicios.html`.
 
 - API: Servicio (`GET /api/servicio/<servicio_id>`):
   - Retorna JSON con datos de un servicio activo, precio formateado con
-    `utils.format_cop`, imagen principal y galería (`get_imagenes_activas`).
+    `utils.format_cop`, imagen principal y galería (con el placeholder LQIP de
+    cada imagen). Lee el servicio de la instantánea de catálogo, con la galería
+    ya cargada (sin consultas).
+
+- API: Catálogo de reservas (`GET /api/catalogo-reservas`):
+  - Barberos y servicios activos, precio por barbero, duración e imagen en un
+    solo JSON con ETag. Se construye una vez por versión de catálogo
+    (`utils.catalog_cache`) y lo usa `booking.js` al cargar la página.
 
 - API: Disponibilidad (`GET /api/disponibilidad/<barbero_id>/<fecha>`):
   - Calcula horarios disponibles para un barbero y fecha dada (YYYY-MM-DD),
     considerando la duración del servicio (`get_duracion_minutos`) y su
     disponibilidad horaria. Devuelve lista de strings de horas y mensaje.
 
+- Gestión por el cliente (`/cita/gestionar/<token>`): enlace firmado (incluido en
+  los correos) para reprogramar o cancelar. Reprogramar actualiza la misma fila
+  con la agenda del barbero bloqueada (`Cita.reprogramar`).
+
 - API: Agendar Cita (`POST /api/agendar-cita`):
   - Valida datos obligatorios, calcula rango horario de la nueva cita y verifica
-    solapamientos con citas existentes del día (confirmadas o pendientes).
+    solapamientos con citas existentes del día (confirmadas, pendientes o
+    expiradas, que mantienen el horario cerrado).
   - Crea/actualiza `Cliente`, crea `Cita` con duración del servicio y estado
     inicial `pendiente_confirmacion`. Genera token y envía correo de
     confirmación (`send_appointment_confirmation_email`). Responde JSON.
@@ -61,7 +82,7 @@ Dependencias clave
 - Modelos: `Producto`, `Categoria`, `Servicio`, `Barbero`, `DisponibilidadBarbero`,
   `Cliente`, `Mensaje`, `Cita`, `Pedido`, `PedidoItem`, `Slider` (opcional).
 - Formularios: `CheckoutForm` (en `app/public/forms.py`).
-- Utilidades: `send_appointment_confirmation_email`, `utils.format_cop`.
+- Utilidades: `send_appointment_confirmation_email`, `utils.format_cop`, `utils.rate_limit`.
 - Plantillas: `public/Home.html`, `public/productos.html`, `public/servicios.html`,
   `public/checkout.html`, `public/confirmacion_pedido.html`,
   `public/confirmation_status.html`, `contacto.html`, `about.html`.
@@ -69,10 +90,13 @@ Dependencias clave
 Seguridad y notas
 - Rutas públicas sin autenticación. La integridad se asegura con validaciones de
   servidor y verificación de solapamientos al agendar.
+- `/api/disponibilidad`, `/api/agendar-cita`, `/api/servicio` y el POST de
+  `/contacto` tienen límite de peticiones por IP (`rate_limit`, 429 con
+  `Retry-After`); los límites se configuran en `RATELIMIT_LIMITS`.
 - El modelo `Slider` es opcional: si no está disponible, se procede con lista
-  vacía. Existen logs/prints de depuración en `home()` y APIs para diagnóstico.
+  vacía.
 """
-from flask import render_template, request, redirect, url_for, flash, jsonify, current_app, make_response, Response
+from flask import render_template, request, redirect, url_for, flash, jsonify, current_app, make_response, Response, abort
 from datetime import datetime
 from flask_login import login_required, current_user
 from app.public import bp
@@ -87,11 +111,16 @@ try:
 except Exception as e:
     print(f"Warning: No se pudo importar el modelo Slider: {e}")
     Slider = None
+from app.models.catalogo import obtener_catalogo_publico, obtener_listado_productos
 from app.models.email import send_appointment_confirmation_email # Importar la función de envío
 from app import db
+from app.utils.rate_limit import rate_limit
 from datetime import datetime, timedelta, time
-from flask import send_from_directory
+from app.utils.static_assets import enviar_archivo
 from flask import Response
+import hashlib
+import json
+from collections import namedtuple
 
 @bp.route('/privacidad')
 def privacidad():
@@ -108,8 +137,6 @@ def cookies():
     """Renderiza la página de política de cookies."""
     return render_template('public/cookies.html', now=datetime.utcnow())
 
-# Sitemap duplicado eliminado - usando sitemap_xml() en su lugar
-
 # Redirecciones 301 para canonicalización SEO - Simplificadas
 @bp.route('/index')
 @bp.route('/home')
@@ -126,14 +153,12 @@ def home():
     
     # Inicializar todas las variables al principio para evitar errores
     featured_products = []
-    barberos = []
-    servicios = []
-    fechas_disponibles = []
-    sliders = []
+    fragmentos = {}
     
     # NUEVO: Cargar personalización comercial
     from app.utils.business_cookies import BusinessCookieManager, ConversionOptimizer
     from app.utils.cart_optimizer import CartOptimizer
+    from app.utils.catalog_cache import fragmento_cacheado
     from flask import g
     
     personalization_data = getattr(g, 'personalization', BusinessCookieManager.get_personalization_data())
@@ -141,80 +166,31 @@ def home():
     conversion_probability = getattr(g, 'conversion_probability', BusinessCookieManager.calculate_conversion_probability())
     
     try:
-        # Obtener sliders activos ordenados por orden
-        if Slider is not None:
-            sliders = Slider.get_active_slides_ordered()
-        else:
-            print("Warning: Modelo Slider no disponible, usando lista vacía")
-            sliders = []
-        
-        # Productos destacados
-        # CORREGIDO: Usar 'creado' en lugar de 'created_at'
-        featured_products = Producto.query.order_by(Producto.creado.desc()).limit(3).all() 
-        
-        # --- START REFINED DEBUG ---
-        print("--- DEBUG: Querying ALL Barberos ---")
-        all_barberos = Barbero.query.all()
-        print(f"Total barberos found (before filter): {len(all_barberos)}")
-        for b in all_barberos:
-            # Imprimir valor y tipo del campo activo
-            print(f"  ID: {b.id}, Nombre: {b.nombre}, Activo (DB value): {b.activo}, Type: {type(b.activo)}")
-            
-        print("--- DEBUG: Querying ACTIVE Barberos ---")
-        barberos = Barbero.query.filter_by(activo=True).all()
-        print(f"Barberos found with filter_by(activo=True): {len(barberos)}")
-        for b in barberos:
-            print(f"  Active Barbero ID: {b.id}, Nombre: {b.nombre}")
-
-        print("--- DEBUG: Querying ALL Servicios ---")
-        all_servicios = Servicio.query.all()
-        print(f"Total servicios found (before filter): {len(all_servicios)}")
-        for s in all_servicios:
-             # Imprimir valor y tipo del campo activo
-             print(f"  ID: {s.id}, Nombre: {s.nombre}, Activo (DB value): {s.activo}, Type: {type(s.activo)}")
-
-        print("--- DEBUG: Querying ACTIVE Servicios ---")
-        servicios = Servicio.query.filter_by(activo=True).order_by(Servicio.orden.asc(), Servicio.nombre.asc()).all()
-        print(f"Servicios found with filter_by(activo=True): {len(servicios)}")
-        for s in servicios:
-            print(f"  Active Servicio ID: {s.id}, Nombre: {s.nombre}")
-        # --- END REFINED DEBUG ---
-        
-        # Generar fechas para el calendario
+        # Las partes que dependen solo del catálogo (sliders, selects de barbero y
+        # servicio, calendario, equipo) se renderizan una vez por versión de
+        # catálogo y se reutilizan para todos los visitantes. Lo personalizado
+        # queda fuera de los fragmentos.
+        catalogo = obtener_catalogo_publico()
+        featured_products = list(obtener_listado_productos().productos_destacados)
         hoy = datetime.now().date()
-        fechas_disponibles = [hoy + timedelta(days=i) for i in range(60)]
-        
+        fragmentos = {
+            'hero': fragmento_cacheado('home_hero', 'public/includes/home_hero.html',
+                                       lambda: {'sliders': catalogo.sliders}),
+            'opciones_barberos': fragmento_cacheado('home_opciones_barberos', 'public/includes/home_opciones_barberos.html',
+                                                    lambda: {'barberos': catalogo.barberos}),
+            'opciones_servicios': fragmento_cacheado('home_opciones_servicios', 'public/includes/home_opciones_servicios.html',
+                                                     lambda: {'servicios': catalogo.servicios}),
+            'equipo': fragmento_cacheado('home_equipo', 'public/includes/home_equipo.html',
+                                         lambda: {'barberos': catalogo.barberos}),
+            # El calendario cambia con el día, no con el catálogo
+            'fechas': fragmento_cacheado('home_fechas', 'public/includes/home_fechas.html',
+                                         lambda: {'fechas_disponibles': [hoy + timedelta(days=i) for i in range(60)]},
+                                         variante=hoy),
+        }
+
     except Exception as e:
-        print(f"Error in home(): {str(e)}")
-        import traceback
-        traceback.print_exc()
-    
-    # Final check before rendering
-    print(f"--- FINAL CHECK before render ---")
-    print(f"Barberos to template: {len(barberos)}")
-    print(f"Servicios to template: {len(servicios)}")
-    
-    # Eliminar los prints de depuración anteriores si aún existen
-    # print(f"Enviando a template: {len(barberos)} barberos, {len(servicios)} servicios")
-    # print("--- DEBUG HOME ---")
-    # ... (eliminar bucles for anteriores) ...
-    # print("--- FIN DEBUG HOME ---")
-    
-    # NUEVO: Personalizar contenido basado en cookies comerciales
-    # Reorganizar barberos si hay preferencias
-    if personalization_data.get('preferences', {}).get('barbero_favorito'):
-        fav_barbero_id = personalization_data['preferences']['barbero_favorito']
-        barbero_favorito = next((b for b in barberos if b.id == fav_barbero_id), None)
-        if barbero_favorito:
-            barberos = [barbero_favorito] + [b for b in barberos if b.id != fav_barbero_id]
-    
-    # Reorganizar servicios si hay preferencias
-    if personalization_data.get('preferences', {}).get('servicio_favorito'):
-        fav_servicio_id = personalization_data['preferences']['servicio_favorito']
-        servicio_favorito = next((s for s in servicios if s.id == fav_servicio_id), None)
-        if servicio_favorito:
-            servicios = [servicio_favorito] + [s for s in servicios if s.id != fav_servicio_id]
-    
+        current_app.logger.error(f"Error in home(): {e}", exc_info=True)
+
     # Productos recomendados basados en visualizaciones
     productos_recomendados = []
     if smart_recommendations.get('show_quick_booking'):
@@ -234,14 +210,14 @@ def home():
         'suggested_time_slots': smart_recommendations.get('suggested_time_slots', []),
         'total_reservas': personalization_data.get('preferences', {}).get('total_reservas', 0),
         'client_name': personalization_data.get('client', {}).get('nombre', ''),
+        # Huecos personalizados: booking.js pone primero el barbero/servicio favorito
+        'barbero_favorito': personalization_data.get('preferences', {}).get('barbero_favorito'),
+        'servicio_favorito': personalization_data.get('preferences', {}).get('servicio_favorito'),
     }
 
     return render_template('public/Home.html',
                           featured_products=featured_products,
-                          barberos=barberos,
-                          servicios=servicios,
-                          fechas_disponibles=fechas_disponibles,
-                          sliders=sliders,
+                          fragmentos=fragmentos,
                           productos_recomendados=productos_recomendados,
                           personalization=personalization_context)
 
@@ -250,7 +226,7 @@ def home():
 def ads_txt():
     """Sirve el archivo ads.txt desde la carpeta static para verificación de AdSense."""
     try:
-        return send_from_directory(current_app.static_folder, 'ads.txt', mimetype='text/plain')
+        return enviar_archivo(current_app.static_folder, 'ads.txt', mimetype='text/plain')
     except Exception as e:
         current_app.logger.error(f"ads.txt no encontrado o error al servirlo: {e}")
         return ('Not Found', 404)
@@ -313,160 +289,54 @@ Crawl-delay: 1"""
         current_app.logger.error(f"Error al generar robots.txt: {e}")
         return ('Error', 500)
 
+def _respuesta_sitemap(archivo):
+    respuesta = Response(archivo.cuerpo, mimetype='application/xml')
+    respuesta.set_etag(archivo.etag)
+    respuesta.headers['Cache-Control'] = 'public, max-age=3600'
+    return respuesta.make_conditional(request)
+
+
 @bp.route('/sitemap.xml')
 def sitemap_xml():
-    """Genera sitemap.xml dinámico para mejor indexación SEO."""
+    """Sitemap del sitio (o índice de sitemaps si hay demasiadas URLs para un archivo)."""
+    from app.utils.sitemap import obtener_sitemap
     try:
-        from flask import Response
-        from datetime import datetime
-        
-        # URLs estáticas principales - OPTIMIZADAS para canonicalización
-        static_urls = [
-            {
-                'loc': url_for('public.home', _external=True).rstrip('/'),
-                'changefreq': 'daily',
-                'priority': '1.0',
-                'lastmod': datetime.now().strftime('%Y-%m-%d')
-            },
-            {
-                'loc': url_for('public.servicios', _external=True).rstrip('/'),
-                'changefreq': 'weekly',
-                'priority': '0.9',
-                'lastmod': datetime.now().strftime('%Y-%m-%d')
-            },
-            {
-                'loc': url_for('public.productos', _external=True).rstrip('/'),
-                'changefreq': 'weekly',
-                'priority': '0.8',
-                'lastmod': datetime.now().strftime('%Y-%m-%d')
-            },
-            {
-                'loc': url_for('public.contact', _external=True).rstrip('/'),
-                'changefreq': 'monthly',
-                'priority': '0.7',
-                'lastmod': datetime.now().strftime('%Y-%m-%d')
-            }
-        ]
-
-        # URLs dinámicas de servicios (con manejo de errores)
-        try:
-            from app.models.servicio import Servicio
-            servicios = Servicio.query.filter_by(activo=True).all()
-            for servicio in servicios:
-                static_urls.append({
-                    'loc': url_for('public.servicios', _external=True) + f'#servicio-{servicio.id}',
-                    'changefreq': 'monthly',
-                    'priority': '0.6',
-                    'lastmod': servicio.fecha_actualizacion.strftime('%Y-%m-%d') if hasattr(servicio, 'fecha_actualizacion') and servicio.fecha_actualizacion else datetime.now().strftime('%Y-%m-%d')
-                })
-        except Exception as e:
-            current_app.logger.warning(f"No se pudieron cargar servicios para sitemap: {e}")
-
-        # URLs dinámicas de productos (con manejo de errores)
-        try:
-            from app.models.producto import Producto
-            productos = Producto.query.filter_by(activo=True).all()
-            for producto in productos:
-                static_urls.append({
-                    'loc': url_for('public.productos', _external=True) + f'#producto-{producto.id}',
-                    'changefreq': 'monthly',
-                    'priority': '0.5',
-                    'lastmod': producto.fecha_actualizacion.strftime('%Y-%m-%d') if hasattr(producto, 'fecha_actualizacion') and producto.fecha_actualizacion else datetime.now().strftime('%Y-%m-%d')
-                })
-        except Exception as e:
-            current_app.logger.warning(f"No se pudieron cargar productos para sitemap: {e}")
-
-        # URLs dinámicas de categorías (con manejo de errores)
-        try:
-            from app.models.categoria import Categoria
-            categorias = Categoria.query.filter_by(activo=True).all()
-            for categoria in categorias:
-                static_urls.append({
-                    'loc': url_for('public.productos', _external=True) + f'#categoria-{categoria.id}',
-                    'changefreq': 'monthly',
-                    'priority': '0.4',
-                    'lastmod': datetime.now().strftime('%Y-%m-%d')
-                })
-        except Exception as e:
-            current_app.logger.warning(f"No se pudieron cargar categorías para sitemap: {e}")
-
-        # Construir XML del sitemap
-        sitemap_xml = '<?xml version="1.0" encoding="UTF-8"?>\n'
-        sitemap_xml += '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
-        
-        for url_info in static_urls:
-            sitemap_xml += '  <url>\n'
-            sitemap_xml += f'    <loc>{url_info["loc"]}</loc>\n'
-            sitemap_xml += f'    <changefreq>{url_info["changefreq"]}</changefreq>\n'
-            sitemap_xml += f'    <priority>{url_info["priority"]}</priority>\n'
-            sitemap_xml += f'    <lastmod>{url_info["lastmod"]}</lastmod>\n'
-            sitemap_xml += '  </url>\n'
-        
-        sitemap_xml += '</urlset>'
-
-        return Response(sitemap_xml, mimetype='application/xml')
-        
+        return _respuesta_sitemap(obtener_sitemap().principal)
     except Exception as e:
         current_app.logger.error(f"Error al generar sitemap.xml: {e}")
-        # Fallback: sitemap básico solo con URLs estáticas
-        try:
-            basic_sitemap = '''<?xml version="1.0" encoding="UTF-8"?>
-                                    <urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
-                                    <url>
-                                        <loc>''' + url_for('public.home', _external=True).rstrip('/') + '''</loc>
-                                        <changefreq>daily</changefreq>
-                                        <priority>1.0</priority>
-                                        <lastmod>''' + datetime.now().strftime('%Y-%m-%d') + '''</lastmod>
-                                    </url>
-                                    <url>
-                                        <loc>''' + url_for('public.servicios', _external=True).rstrip('/') + '''</loc>
-                                        <changefreq>weekly</changefreq>
-                                        <priority>0.9</priority>
-                                        <lastmod>''' + datetime.now().strftime('%Y-%m-%d') + '''</lastmod>
-                                    </url>
-                                    <url>
-                                        <loc>''' + url_for('public.productos', _external=True).rstrip('/') + '''</loc>
-                                        <changefreq>weekly</changefreq>
-                                        <priority>0.8</priority>
-                                        <lastmod>''' + datetime.now().strftime('%Y-%m-%d') + '''</lastmod>
-                                    </url>
-                                    </urlset>'''
-            return Response(basic_sitemap, mimetype='application/xml')
-        except Exception as e2:
-            current_app.logger.error(f"Error en sitemap fallback: {e2}")
-            return Response("Error generating sitemap", status=500)
+        return Response("Error generating sitemap", status=500)
+
 
 @bp.route('/sitemap-index.xml')
 def sitemap_index():
-    """Genera un sitemap index para organizar múltiples sitemaps."""
+    """Índice de sitemaps (siempre disponible, aunque haya un solo archivo)."""
+    from app.utils.sitemap import obtener_sitemap
     try:
-        from flask import Response
-        from datetime import datetime
-        
-        sitemap_index_xml = '<?xml version="1.0" encoding="UTF-8"?>\n'
-        sitemap_index_xml += '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
-        sitemap_index_xml += '  <sitemap>\n'
-        sitemap_index_xml += f'    <loc>{url_for("public.sitemap_xml", _external=True)}</loc>\n'
-        sitemap_index_xml += f'    <lastmod>{datetime.now().strftime("%Y-%m-%d")}</lastmod>\n'
-        sitemap_index_xml += '  </sitemap>\n'
-        sitemap_index_xml += '</sitemapindex>'
-        
-        return Response(sitemap_index_xml, mimetype='application/xml')
-        
+        return _respuesta_sitemap(obtener_sitemap().indice)
     except Exception as e:
         current_app.logger.error(f"Error al generar sitemap index: {e}")
         return ('Error', 500)
 
+
+@bp.route('/sitemap-<int:numero>.xml')
+def sitemap_parte(numero):
+    """Parte `numero` (desde 1) de un sitemap repartido en varios archivos."""
+    from app.utils.sitemap import obtener_sitemap
+    partes = obtener_sitemap().partes
+    if not 1 <= numero <= len(partes):
+        abort(404)
+    return _respuesta_sitemap(partes[numero - 1])
+
 @bp.route('/favicon.ico')
 def favicon():
     """Sirve el archivo favicon.ico desde la carpeta static."""
     try:
-        return send_from_directory(current_app.static_folder, 'favicon.svg', mimetype='image/svg+xml')
+        return enviar_archivo(current_app.static_folder, 'favicon.svg', mimetype='image/svg+xml')
     except Exception as e:
         current_app.logger.error(f"Error al servir favicon: {e}")
         # Fallback: intentar con favicon.ico si existe
         try:
-            return send_from_directory(current_app.static_folder, 'favicon.ico', mimetype='image/x-icon')
+            return enviar_archivo(current_app.static_folder, 'favicon.ico', mimetype='image/x-icon')
         except:
             return ('Favicon not found', 404)
 
@@ -485,20 +355,18 @@ def about():
     return render_template("about.html")
 
 @bp.route('/contacto', methods=['GET', 'POST'])
+@rate_limit('contacto', methods=('POST',))
 def contact():
     if request.method == 'POST':
         # Guardar mensaje en la base de datos
-        nuevo_cliente = Cliente(
-            nombre=request.form.get('nombre'),
-            email=request.form.get('email'),
-            telefono=request.form.get('telefono')
+        cliente_id = Cliente.upsert(
+            request.form.get('nombre'),
+            request.form.get('email'),
+            request.form.get('telefono')
         )
         
-        db.session.add(nuevo_cliente)
-        db.session.flush()  # Para obtener el ID antes del commit final
-        
         nuevo_mensaje = Mensaje(
-            cliente_id=nuevo_cliente.id,
+            cliente_id=cliente_id,
             asunto=request.form.get('asunto'),
             mensaje=request.form.get('mensaje')
         )
@@ -529,24 +397,8 @@ def productos():
     categorias_con_productos = [] # Nueva estructura para pasar a la plantilla
 
     try:
-        # Obtener todas las categorías ordenadas por nombre
-        todas_categorias = Categoria.query.order_by(Categoria.nombre).all()
-        
-        for categoria in todas_categorias:
-            # Obtener productos activos para esta categoría
-            # Asumiendo que Producto tiene una relación llamada 'categoria_rel' y un campo 'activo'
-            productos_activos = Producto.query.filter_by(
-                categoria_id=categoria.id, 
-                activo=True
-            ).order_by(Producto.nombre).all()
-            
-            # Si la categoría tiene productos activos, añadirla a la lista
-            if productos_activos:
-                categorias_con_productos.append({
-                    'categoria': categoria, # Pasamos el objeto categoría completo
-                    'productos': productos_activos
-                })
-                
+        # Categorías (por nombre) con sus productos activos: una consulta, cacheada
+        categorias_con_productos = obtener_listado_productos().categorias_con_productos
     except Exception as e:
         flash(f"Error al cargar productos: {str(e)}", "danger")
         # Log the error for debugging
@@ -557,6 +409,15 @@ def productos():
         categorias_con_productos=categorias_con_productos # Pasamos la nueva estructura
     )
 
+@bp.route('/api/productos')
+def api_productos():
+    """API endpoint con los productos activos agrupados por categoría (mismo orden que /productos)."""
+    try:
+        return jsonify(obtener_listado_productos().como_dict())
+    except Exception as e:
+        current_app.logger.error(f"Error al obtener el listado de productos: {e}")
+        return jsonify({'error': 'Error interno del servidor'}), 500
+
 @bp.route('/checkout', methods=['GET', 'POST'])
 def checkout():
     from app.public.forms import CheckoutForm
@@ -674,31 +535,19 @@ def servicios():
         return redirect(url_for('public.servicios'), code=301)
     
     try:
-        # Inicializar servicios con una lista vacía por si acaso falla
-        servicios_activos = []
-        
-        # Intentar verificar la conexión a la base de datos primero
-        from sqlalchemy.sql import text
-        from app import db
-        db.session.execute(text("SELECT 1"))
-        print("Conexión a la base de datos verificada correctamente")
-        
-        # Obtener solo los servicios marcados como activos
-        print("Consultando servicios activos...")
-        servicios_activos = Servicio.query.filter_by(activo=True).order_by(Servicio.nombre).all()
-        print(f"Servicios encontrados: {len(servicios_activos)}")
-        
+        # Servicios activos (por nombre) con su galería, desde la instantánea de catálogo
+        servicios_activos = obtener_catalogo_publico().servicios_por_nombre
+
         return render_template("public/servicios.html", 
                             servicios=servicios_activos)
     except Exception as e:
-        print(f"Error al consultar servicios: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        current_app.logger.error(f"Error al consultar servicios: {e}", exc_info=True)
         # Devolver una lista vacía en caso de error para no romper la página
         return render_template("public/servicios.html", 
                             servicios=[], error_msg=f"No se pudieron cargar los servicios: {str(e)}")
 
 @bp.route('/api/servicio/<int:servicio_id>')
+@rate_limit('servicio')
 def get_servicio_data(servicio_id):
     """API endpoint para obtener datos de un servicio específico.
     
@@ -706,7 +555,8 @@ def get_servicio_data(servicio_id):
         barbero_id (int, optional): ID del barbero para obtener precio personalizado
     """
     try:
-        servicio = Servicio.query.filter_by(id=servicio_id, activo=True).first()
+        # Instantánea de catálogo: galería ya cargada, sin consultas por petición
+        servicio = obtener_catalogo_publico().servicio(servicio_id)
         if not servicio:
             return jsonify({'error': 'Servicio no encontrado'}), 404
         
@@ -737,10 +587,12 @@ def get_servicio_data(servicio_id):
         # Obtener todas las imágenes del servicio
         imagenes_galeria = servicio.get_imagenes_activas()
         imagenes_urls = [img.ruta_imagen for img in imagenes_galeria] if imagenes_galeria else []
+        placeholders = [img.placeholder for img in imagenes_galeria] if imagenes_galeria else []
         
         # Si no hay imágenes en la galería, usar imagen_url como fallback
         if not imagenes_urls and servicio.imagen_url:
             imagenes_urls = [servicio.imagen_url]
+            placeholders = [servicio.placeholder]
         
         servicio_data = {
             'id': servicio.id,
@@ -754,8 +606,9 @@ def get_servicio_data(servicio_id):
             'duracion_minutos': servicio.get_duracion_minutos(),
             'imagen_url': servicio.get_imagen_principal(),  # Imagen principal para compatibilidad
             'imagenes': imagenes_urls,  # Array de todas las imágenes
+            'placeholders': placeholders,  # LQIP de cada imagen (data URI o null), mismo orden
             'total_imagenes': len(imagenes_urls),
-            'activo': servicio.activo
+            'activo': True  # La instantánea solo contiene servicios activos
         }
         
         return jsonify(servicio_data)
@@ -764,6 +617,87 @@ def get_servicio_data(servicio_id):
         current_app.logger.error(f"Error al obtener datos del servicio {servicio_id}: {e}")
         return jsonify({'error': 'Error interno del servidor'}), 500
 
+CatalogoReservas = namedtuple('CatalogoReservas', 'cuerpo etag')
+
+
+def _construir_catalogo_reservas(version):
+    """
+    Documento JSON con todo lo que necesita el widget de reservas: barberos y
+    servicios activos, precio de cada servicio por barbero, duración e imagen.
+
+    Se serializa una sola vez por versión de catálogo; las peticiones reutilizan
+    los bytes y el ETag.
+    """
+    from app.models.servicio_imagen import ServicioImagen
+    from app.utils.pricing import obtener_matriz_precios
+
+    barberos = Barbero.query.filter_by(activo=True).order_by(Barbero.nombre).all()
+    servicios = Servicio.query.filter_by(activo=True).order_by(Servicio.orden, Servicio.nombre).all()
+
+    # Imagen principal de cada servicio con una sola consulta (la primera activa por orden)
+    imagen_principal = {}
+    for servicio_id, ruta in db.session.query(ServicioImagen.servicio_id, ServicioImagen.ruta_imagen) \
+            .filter(ServicioImagen.activa.is_(True)) \
+            .order_by(ServicioImagen.servicio_id, ServicioImagen.orden, ServicioImagen.creado):
+        imagen_principal.setdefault(servicio_id, ruta)
+
+    matriz = obtener_matriz_precios()
+    precios = {}
+    for barbero in barberos:
+        ofertas = {}
+        for servicio in servicios:
+            precio, config = matriz.precio(barbero.id, servicio.id) \
+                if servicio.id in matriz.servicios else (servicio.precio, None)
+            if config is not None and not config.activo:
+                continue  # El barbero no ofrece este servicio
+            # [precio, 1 si es precio personalizado]
+            ofertas[str(servicio.id)] = [float(precio), int(config is not None and config.precio_personalizado is not None)]
+        precios[str(barbero.id)] = ofertas
+
+    documento = {
+        'version': version,
+        'barberos': [{
+            'id': b.id,
+            'nombre': b.nombre,
+            'especialidad': b.especialidad,
+            'imagen_url': b.imagen_url,
+        } for b in barberos],
+        'servicios': [{
+            'id': s.id,
+            'nombre': s.nombre,
+            'precio': float(s.precio),
+            'duracion_estimada': s.duracion_estimada,
+            'duracion_minutos': s.get_duracion_minutos(),
+            'imagen_url': imagen_principal.get(s.id, s.imagen_url),
+        } for s in servicios],
+        'precios': precios,
+    }
+    cuerpo = json.dumps(documento, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    return CatalogoReservas(cuerpo, hashlib.sha1(cuerpo).hexdigest()[:20])
+
+
+@bp.route('/api/catalogo-reservas')
+def catalogo_reservas():
+    """API endpoint con el catálogo completo de reservas en un solo documento.
+
+    El widget de reservas lo pide una vez por carga de página en lugar de llamar
+    a `/api/barbero/<id>/servicios` y `/api/servicio/<id>` en cada selección.
+    Responde 304 si el cliente ya tiene la versión vigente (`If-None-Match`).
+    """
+    from app.utils.catalog_cache import obtener_en_cache
+
+    try:
+        catalogo = obtener_en_cache('catalogo_reservas', _construir_catalogo_reservas)
+    except Exception as e:
+        current_app.logger.error(f"Error al construir el catálogo de reservas: {e}")
+        return jsonify({'error': 'Error interno del servidor'}), 500
+
+    respuesta = Response(catalogo.cuerpo, mimetype='application/json')
+    respuesta.set_etag(catalogo.etag)
+    respuesta.headers['Cache-Control'] = 'public, max-age=60'
+    return respuesta.make_conditional(request)
+
+
 @bp.route('/api/barbero/<int:barbero_id>/servicios')
 def get_servicios_barbero(barbero_id):
     """API endpoint para obtener todos los servicios con precios para un barbero específico.
@@ -851,6 +785,7 @@ def get_servicios_barbero(barbero_id):
 #                            disponibilidades=disponibilidades)
 
 @bp.route('/api/disponibilidad/<int:barbero_id>/<string:fecha>')
+@rate_limit('disponibilidad')
 def disponibilidad_barbero(barbero_id, fecha):
     """
     Obtiene los horarios disponibles para un barbero en una fecha específica,
@@ -862,6 +797,8 @@ def disponibilidad_barbero(barbero_id, fecha):
 
     Query Params:
         servicio_id (int): ID del servicio seleccionado.
+        gestion (str, optional): Token del enlace de gestión de una cita de este
+            barbero; esa cita no ocupa horario (se está reprogramando).
     """
     try:
         fecha_dt = datetime.strptime(fecha, '%Y-%m-%d').date()
@@ -871,6 +808,14 @@ def disponibilidad_barbero(barbero_id, fecha):
         validate_slot = request.args.get('validate_slot')  # Para validación en tiempo real
         duracion_servicio = 30 
 
+        # Al reprogramar, la propia cita no bloquea los horarios que se solapan con ella
+        # (Cita.reprogramar la excluye igual); el id sale del token firmado, no del cliente
+        excluir_cita_id = None
+        if request.args.get('gestion'):
+            cita_gestionada = Cita.get_cita_from_manage_token(request.args['gestion'])
+            if cita_gestionada and cita_gestionada.barbero_id == barbero.id:
+                excluir_cita_id = cita_gestionada.id
+
         if servicio_id:
             servicio = Servicio.query.get(servicio_id)
             if servicio:
@@ -881,19 +826,11 @@ def disponibilidad_barbero(barbero_id, fecha):
         else:
             current_app.logger.warning("No se proporcionó servicio_id. Usando duración por defecto.")
 
-        # Limpiar citas expiradas antes de obtener horarios para tener datos actualizados
-        try:
-            citas_limpiadas = Cita.limpiar_citas_expiradas()
-            if citas_limpiadas > 0:
-                current_app.logger.info(f"Limpieza automática: {citas_limpiadas} citas expiradas")
-        except Exception as e:
-            current_app.logger.warning(f"Error en limpieza automática de citas: {e}")
-
         # Debug detallado
         current_app.logger.info(f"Solicitando horarios disponibles para barbero {barbero.id}, fecha {fecha_dt}, duración {duracion_servicio}min")
         
         try:
-            horarios_obj_list = barbero.obtener_horarios_disponibles(fecha_dt, duracion_servicio)
+            horarios_obj_list = barbero.obtener_horarios_disponibles(fecha_dt, duracion_servicio, excluir_cita_id)
             current_app.logger.info(f"Horarios obtenidos: {len(horarios_obj_list)} slots")
             
             # Debug: Mostrar cada slot obtenido
@@ -945,6 +882,7 @@ def disponibilidad_barbero(barbero_id, fecha):
         return jsonify({'error': 'Error interno al obtener disponibilidad.'}), 500
 
 @bp.route('/api/agendar-cita', methods=['POST'])
+@rate_limit('agendar_cita')
 def agendar_cita():
     try:
         data = request.json
@@ -967,36 +905,16 @@ def agendar_cita():
         inicio_nueva_cita = fecha_hora
         fin_nueva_cita = inicio_nueva_cita + timedelta(minutes=duracion_servicio)
         
-        # Obtener todas las citas del barbero para el día seleccionado
-        fecha_inicio_dia = datetime.combine(fecha_hora.date(), datetime.min.time())
-        fecha_fin_dia = fecha_inicio_dia + timedelta(days=1)
-        
-        citas_del_dia = Cita.query.filter(
-            Cita.barbero_id == int(data['barbero_id']),
-            Cita.estado.in_(['confirmada', 'pendiente_confirmacion']),
-            Cita.fecha >= fecha_inicio_dia,
-            Cita.fecha < fecha_fin_dia
-        ).all()
-
-        # Verificar solapamientos en Python
-        hay_solapamiento = False
-        for cita_existente in citas_del_dia:
-            inicio_existente = cita_existente.fecha
-            fin_existente = inicio_existente + timedelta(minutes=cita_existente.duracion or 30)
-            
-            # Verificar si hay solapamiento: la nueva cita no debe empezar antes de que termine una existente
-            # ni terminar después de que empiece otra existente
-            if not (fin_nueva_cita <= inicio_existente or inicio_nueva_cita >= fin_existente):
-                hay_solapamiento = True
-                current_app.logger.warning(f"Solapamiento detectado con cita ID {cita_existente.id}: "
-                                         f"Existente: {inicio_existente} - {fin_existente}, "
-                                         f"Nueva: {inicio_nueva_cita} - {fin_nueva_cita}")
-                break
-
-        if hay_solapamiento:
+        # Bloquear la agenda del barbero hasta el commit para que dos reservas
+        # simultáneas no pasen ambas la verificación de solapamiento
+        Barbero.bloquear_agenda(int(data['barbero_id']))
+        cita_existente = Cita.buscar_solapamiento(int(data['barbero_id']), inicio_nueva_cita, duracion_servicio)
+        if cita_existente:
             current_app.logger.warning(f"CONFLICTO DE HORARIO - Barbero {data['barbero_id']}, "
                                       f"Cliente: {data['email']}, Horario solicitado: {fecha_hora} - {fin_nueva_cita}, "
-                                      f"Servicio: {data['servicio_id']} ({duracion_servicio}min)")
+                                      f"Servicio: {data['servicio_id']} ({duracion_servicio}min), "
+                                      f"se solapa con cita ID {cita_existente.id}")
+            db.session.rollback()  # Libera el bloqueo de la agenda
             return jsonify({
                 'error': 'Este horario se solapa con otra cita. Por favor, selecciona otro horario.',
                 'conflict_details': {
@@ -1006,19 +924,9 @@ def agendar_cita():
                 }
             }), 409 # 409 Conflict
 
-        cliente = Cliente.query.filter_by(email=data['email']).first()
-        if not cliente:
-            cliente = Cliente(
-                nombre=data['nombre'],
-                email=data['email'],
-                telefono=data['telefono']
-            )
-            db.session.add(cliente)
-            db.session.flush() # Para obtener el ID del cliente si es nuevo
-        else: # Actualizar datos si el cliente existe
-            cliente.nombre = data['nombre']
-            cliente.telefono = data['telefono']
-            # No es necesario db.session.add(cliente) si ya existe y solo se modifica
+        # Alta o actualización del cliente en una sola sentencia (clave: email normalizado)
+        cliente_email = Cliente.normalizar_email(data['email'])
+        cliente_id = Cliente.upsert(data['nombre'], cliente_email, data['telefono'])
 
         # Obtener la duración del servicio
         servicio = Servicio.query.get(int(data['servicio_id']))
@@ -1037,7 +945,7 @@ def agendar_cita():
             es_precio_personalizado = False
         
         nueva_cita = Cita(
-            cliente_id=cliente.id,
+            cliente_id=cliente_id,
             barbero_id=int(data['barbero_id']),
             servicio_id=int(data['servicio_id']),
             fecha=fecha_hora,
@@ -1052,7 +960,7 @@ def agendar_cita():
 
         token = nueva_cita.generate_confirmation_token()
         current_app.logger.info(f"CITA CREADA EXITOSAMENTE - ID: {nueva_cita.id}, "
-                               f"Cliente: {cliente.email}, Barbero: {data['barbero_id']}, "
+                               f"Cliente: {cliente_email}, Barbero: {data['barbero_id']}, "
                                f"Fecha: {fecha_hora}, Servicio: {data['servicio_id']}, "
                                f"Duración: {duracion_servicio}min. Token generado, enviando correo.")
 
@@ -1063,8 +971,8 @@ def agendar_cita():
         # Aquí, el modelo Cita ya tiene las relaciones, así que deberían funcionar.
 
         send_appointment_confirmation_email(
-            cliente_email=cliente.email,
-            cliente_nombre=cliente.nombre,
+            cliente_email=cliente_email,
+            cliente_nombre=data['nombre'],
             cita=nueva_cita, # Pasamos el objeto cita completo
             token=token
         )
@@ -1130,14 +1038,15 @@ def confirmar_cita_route(token):
                                message='¡Tu cita ya estaba confirmada!',
                                cita=cita_token)
 
-    # Si está cancelada o expirada, informar claramente
-    if cita_token.estado in ['cancelada', 'expirada', 'cancelada_conflicto']:
+    # Si está cancelada, informar claramente
+    if cita_token.estado in ['cancelada', 'cancelada_conflicto']:
         return render_template('public/confirmation_status.html',
                                success=False,
                                message='Esta cita ya no puede ser confirmada (estado actual: {}).'.format(cita_token.estado))
 
-    # En este punto, esperamos que esté pendiente de confirmación
-    if cita_token.estado != 'pendiente_confirmacion':
+    # En este punto, esperamos que esté pendiente de confirmación. Una cita 'expirada'
+    # mantuvo su horario cerrado, así que el enlace todavía vigente puede confirmarla.
+    if cita_token.estado not in Cita.ESTADOS_CONFIRMABLES:
         return render_template('public/confirmation_status.html',
                                success=False,
                                message='Esta cita no está en estado pendiente de confirmación.')
@@ -1167,4 +1076,68 @@ def confirmar_cita_route(token):
     return render_template('public/confirmation_status.html',
                            success=True,
                            message='¡Tu cita ha sido confirmada exitosamente!',
-                           cita=cita_token)
\ No newline at end of file
+                           cita=cita_token)
+
+
+def _cita_desde_enlace_gestion(token):
+    cita = Cita.get_cita_from_manage_token(token)
+    if not cita:
+        return None, render_template('public/confirmation_status.html',
+                                     success=False,
+                                     message='El enlace para gestionar tu cita no es válido o ha expirado.')
+    return cita, None
+
+
+@bp.route('/cita/gestionar/<token>', methods=['GET'])
+def gestionar_cita(token):
+    """Página del enlace firmado del correo: ver, reprogramar o cancelar la cita."""
+    cita, error = _cita_desde_enlace_gestion(token)
+    if error:
+        return error
+    return render_template('public/gestionar_cita.html',
+                           cita=cita,
+                           token=token,
+                           puede_gestionarse=cita.puede_gestionarse(),
+                           hoy=datetime.now().strftime('%Y-%m-%d'))
+
+
+@bp.route('/cita/gestionar/<token>/reprogramar', methods=['POST'])
+@rate_limit('agendar_cita')
+def reprogramar_cita(token):
+    cita, error = _cita_desde_enlace_gestion(token)
+    if error:
+        return error
+    if not cita.puede_gestionarse():
+        flash('Esta cita ya no se puede reprogramar.', 'warning')
+        return redirect(url_for('public.gestionar_cita', token=token))
+
+    try:
+        nueva_fecha = datetime.strptime(f"{request.form.get('fecha')} {request.form.get('hora')}", '%Y-%m-%d %H:%M')
+    except ValueError:
+        flash('Selecciona una fecha y una hora válidas.', 'danger')
+        return redirect(url_for('public.gestionar_cita', token=token))
+
+    fecha_anterior = cita.fecha
+    ok, motivo = cita.reprogramar(nueva_fecha)
+    if ok:
+        current_app.logger.info(f"Cita {cita.id} reprogramada por el cliente: {fecha_anterior} -> {nueva_fecha}")
+        flash('¡Tu cita fue reprogramada!', 'success')
+    elif motivo == 'solapamiento':
+        flash('Ese horario acaba de ser reservado por otra persona. Elige otro, por favor.', 'danger')
+    else:
+        flash('El barbero no atiende en ese horario. Elige otro, por favor.', 'danger')
+    return redirect(url_for('public.gestionar_cita', token=token))
+
+
+@bp.route('/cita/gestionar/<token>/cancelar', methods=['POST'])
+def cancelar_cita(token):
+    cita, error = _cita_desde_enlace_gestion(token)
+    if error:
+        return error
+    if cita.puede_gestionarse():
+        cita.cancelar()
+        current_app.logger.info(f"Cita {cita.id} cancelada por el cliente")
+        flash('Tu cita fue cancelada. ¡Esperamos verte pronto!', 'success')
+    else:
+        flash('Esta cita ya no se puede cancelar en línea.', 'warning')
+    return redirect(url_for('public.gestionar_cita', token=token))
@@ -94,6 +94,11 @@
  * API ENDPOINTS UTILIZADOS
  * ========================================================================
  * 
+ * GET /api/catalogo-reservas
+ * - Barberos, servicios, precios por barbero y duraciones en un solo JSON
+ * - Se pide una vez al cargar la página (ETag); los cambios de barbero no
+ *   vuelven a consultar al servidor
+ * 
  * GET /api/disponibilidad/{barbero_id}/{fecha}?servicio_id={id}
  * - Obtiene horarios disponibles para barbero/servicio/fecha específicos
  * - Incluye validación opcional de slot específico
@@ -220,7 +225,8 @@ document.addEventListener('DOMContentLoaded', function () {
         lastRequestTime: 0,
         cache: new Map(),
         retryCount: 0,
-        bookingCompleted: false  // Flag para indicar si el booking se completó exitosamente
+        bookingCompleted: false,  // Flag para indicar si el booking se completó exitosamente
+        catalogoPromise: null  // Catálogo de reservas (barberos, servicios y precios) cargado una vez
     };
 
     // ==================== UTILIDADES ====================
@@ -377,6 +383,61 @@ document.addEventListener('DOMContentLoaded', function () {
         }
     }
 
+    // ==================== PREFERENCIAS DEL VISITANTE ====================
+    function aplicarPreferencias() {
+        // Las opciones llegan en el HTML cacheado (igual para todos); aquí se
+        // sube el barbero/servicio favorito del visitante al primer lugar.
+        const contenedor = document.querySelector('.booking-form');
+        if (!contenedor) return;
+        [
+            [elements.barberoSelect, contenedor.dataset.barberoFavorito],
+            [elements.servicioSelect, contenedor.dataset.servicioFavorito]
+        ].forEach(([select, favoritoId]) => {
+            if (!select || !favoritoId) return;
+            const opcion = Array.from(select.options).find(o => o.value === favoritoId);
+            if (opcion && select.options.length > 1) {
+                select.insertBefore(opcion, select.options[1]);
+            }
+        });
+    }
+
+    // ==================== CATÁLOGO DE RESERVAS ====================
+    function cargarCatalogo() {
+        // Una sola petición por carga de página; si falla se usa la API por barbero
+        appState.catalogoPromise = utils.fetchWithRetry('/api/catalogo-reservas')
+            .then(response => response.ok ? response.json() : null)
+            .catch(error => {
+                console.warn('No se pudo cargar el catálogo de reservas:', error);
+                return null;
+            });
+    }
+
+    async function obtenerServiciosBarbero(barberoId) {
+        const catalogo = await appState.catalogoPromise;
+        const ofertas = catalogo && catalogo.precios[String(barberoId)];
+
+        if (ofertas) {
+            return {
+                servicios: catalogo.servicios
+                    .filter(s => ofertas[String(s.id)])
+                    .map(s => ({
+                        id: s.id,
+                        nombre: s.nombre,
+                        precio_valor: ofertas[String(s.id)][0],
+                        es_precio_personalizado: ofertas[String(s.id)][1] === 1,
+                        duracion_estimada: s.duracion_estimada,
+                        duracion_minutos: s.duracion_minutos
+                    }))
+            };
+        }
+
+        const response = await utils.fetchWithRetry(`/api/barbero/${barberoId}/servicios`);
+        if (!response.ok) {
+            throw new Error('Error al obtener servicios del barbero');
+        }
+        return response.json();
+    }
+
     // ==================== ACTUALIZACIÓN DE PRECIOS POR BARBERO ====================
     async function actualizarServiciosConPreciosBarbero(barberoId) {
         console.log(`Actualizando precios de servicios para barbero ${barberoId}`);
@@ -384,14 +445,7 @@ document.addEventListener('DOMContentLoaded', function () {
         if (!elements.servicioSelect || !barberoId) return;
 
         try {
-            const url = `/api/barbero/${barberoId}/servicios`;
-            const response = await utils.fetchWithRetry(url);
-
-            if (!response.ok) {
-                throw new Error('Error al obtener servicios del barbero');
-            }
-
-            const data = await response.json();
+            const data = await obtenerServiciosBarbero(barberoId);
             console.log('Servicios con precios del barbero:', data);
 
             // Crear un Set de IDs de servicios disponibles para búsqueda rápida
@@ -1052,6 +1106,9 @@ document.addEventListener('DOMContentLoaded', function () {
             case 400:
                 utils.showError(`Error en los datos proporcionados: ${data.error || 'Por favor, verifica tu información e inténtalo de nuevo.'}`);
                 break;
+            case 429:
+                utils.showError(`Has hecho demasiadas solicitudes seguidas. Inténtalo de nuevo en ${data.retry_after || 60} segundos.`);
+                break;
             default:
                 utils.showError(`Error al solicitar la cita: ${data.error || `Error ${status}` || 'Inténtalo de nuevo.'}`);
         }
@@ -1059,6 +1116,8 @@ document.addEventListener('DOMContentLoaded', function () {
 
     // ==================== INICIALIZACIÓN PRINCIPAL ====================
     init();
+    aplicarPreferencias();
+    cargarCatalogo();
     setupEventListeners();
 
     // ==================== FUNCIONES GLOBALES ====================
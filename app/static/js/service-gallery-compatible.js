@@ -122,6 +122,7 @@
         if (!this.modal) return;
 
         this.images = service.imagenes || [];
+        this.placeholders = service.placeholders || [];
         if (this.images.length === 0 && service.imagen_url) {
             this.images = [service.imagen_url];
         }
@@ -141,20 +142,27 @@
         }
 
         if (this.images.length === 1) {
-            return '<div class="single-image"><img src="' + this.images[0] + '" alt="Imagen del servicio" style="width: 100%; height: 300px; object-fit: cover; border-radius: 8px;"></div>';
+            return '<div class="single-image"><img src="' + this.images[0] + '" alt="Imagen del servicio" style="width: 100%; height: 300px; object-fit: cover; border-radius: 8px;' + this.placeholderStyle(0) + '"></div>';
         }
 
         var slides = '';
         var indicators = '';
         
         for (var i = 0; i < this.images.length; i++) {
-            slides += '<div class="carousel-slide" style="min-width: 100%; height: 100%;"><img src="' + this.images[i] + '" alt="Imagen ' + (i + 1) + '" style="width: 100%; height: 100%; object-fit: cover;"></div>';
+            // Solo la primera se pide ya; el resto carga al acercarse (loading="lazy") sobre su placeholder
+            slides += '<div class="carousel-slide" style="min-width: 100%; height: 100%;"><img src="' + this.images[i] + '" alt="Imagen ' + (i + 1) + '"' + (i > 0 ? ' loading="lazy"' : '') + ' style="width: 100%; height: 100%; object-fit: cover;' + this.placeholderStyle(i) + '"></div>';
             indicators += '<button class="carousel-indicator ' + (i === 0 ? 'active' : '') + '" data-index="' + i + '" style="width: 12px; height: 12px; border-radius: 50%; border: none; background: ' + (i === 0 ? '#b39656' : 'rgba(255,255,255,0.7)') + '; cursor: pointer; transition: background 0.3s ease;"></button>';
         }
 
         return '<div class="image-carousel"><div class="carousel-container" style="position: relative; height: 300px; overflow: hidden; border-radius: 8px;"><div class="carousel-track" style="display: flex; transition: transform 0.3s ease; height: 100%;">' + slides + '</div><button class="carousel-btn prev-btn" style="position: absolute; left: 10px; top: 50%; transform: translateY(-50%); background: rgba(0,0,0,0.7); color: white; border: none; width: 40px; height: 40px; border-radius: 50%; font-size: 18px; cursor: pointer; z-index: 10;">‹</button><button class="carousel-btn next-btn" style="position: absolute; right: 10px; top: 50%; transform: translateY(-50%); background: rgba(0,0,0,0.7); color: white; border: none; width: 40px; height: 40px; border-radius: 50%; font-size: 18px; cursor: pointer; z-index: 10;">›</button><div class="carousel-indicators" style="position: absolute; bottom: 15px; left: 50%; transform: translateX(-50%); display: flex; gap: 8px; z-index: 10;">' + indicators + '</div></div><div class="image-counter" style="text-align: center; margin-top: 10px; color: #666; font-size: 14px;"><span id="current-image-number">1</span> de ' + this.images.length + '</div></div>';
     };
 
+    // Fondo borroso (LQIP) que se ve mientras descarga la imagen real
+    ServiceGallery.prototype.placeholderStyle = function(index) {
+        var placeholder = this.placeholders && this.placeholders[index];
+        return placeholder ? ' background: url(' + placeholder + ') center / cover no-repeat;' : '';
+    };
+
     ServiceGallery.prototype.setupCarouselEvents = function() {
         var self = this;
         var prevBtn = this.modal && this.modal.querySelector('.prev-btn');
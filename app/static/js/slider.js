@@ -77,21 +77,21 @@
             if (!imageUrl) return;
             
             // Configurar background-image
+            // El placeholder (style inline del servidor) se mantiene hasta que la imagen real está descargada
+            const mostrarImagen = () => {
+                slideBg.style.backgroundImage = `url('${imageUrl}')`;
+                slideBg.classList.add('image-loaded');
+            };
+
             if (index < 2) {
                 // Para los primeros dos slides, carga inmediata
-                slideBg.style.backgroundImage = `url('${imageUrl}')`;
-                preloadImage(imageUrl, () => {
-                    slideBg.classList.add('image-loaded');
-                });
+                preloadImage(imageUrl, mostrarImagen);
             } else {
                 // Para el resto, usar lazy loading
                 const observer = new IntersectionObserver((entries) => {
                     entries.forEach(entry => {
                         if (entry.isIntersecting) {
-                            slideBg.style.backgroundImage = `url('${imageUrl}')`;
-                            preloadImage(imageUrl, () => {
-                                slideBg.classList.add('image-loaded');
-                            });
+                            preloadImage(imageUrl, mostrarImagen);
                             observer.disconnect();
                         }
                     });
@@ -6,4 +6,4 @@ Paquete de utilidades para Barber Brothers
 # Importar funciones y clases de uso común
 from app.utils.formatters import format_cop
 
-# No importar el SitemapGenerator aquí para evitar dependencias circulares
\ No newline at end of file
+# No importar app.utils.sitemap aquí para evitar dependencias circulares
\ No newline at end of file
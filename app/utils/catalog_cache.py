@@ -0,0 +1,186 @@
+# filepath: app/utils/catalog_cache.py
+"""
+Caché en memoria de datos de catálogo (servicios, barberos, precios, imágenes,
+productos y sliders).
+
+El catálogo cambia muy de vez en cuando desde el panel de administración, pero
+se lee en cada visita y en cada interacción de reserva. Cada commit que inserta,
+modifica o borra filas de un modelo de catálogo incrementa la *versión de
+catálogo*; los valores cacheados guardan la versión con la que se construyeron
+y se reconstruyen en la siguiente lectura si ya no coincide.
+
+Los listeners solo ven los commits del propio proceso, así que el commit
+también incrementa el contador de la tabla `catalogo_version`. Cada worker lo
+consulta como mucho cada `CATALOG_VERSION_POLL_SECONDS` segundos y, si cambió,
+invalida su caché. Como red de seguridad (por ejemplo si la tabla aún no existe)
+cada entrada caduca a los `CATALOG_CACHE_SECONDS` segundos.
+
+Uso:
+
+    matriz = obtener_en_cache('matriz_precios', MatrizPrecios.construir)
+
+`construir` recibe la versión vigente y debe devolver un valor inmutable: la
+misma instancia se comparte entre peticiones y hilos.
+
+`fragmento_cacheado` aplica lo mismo a trozos de HTML: la plantilla se
+renderiza una vez por versión de catálogo y las peticiones reutilizan el
+resultado.
+"""
+import logging
+import threading
+import time
+
+from flask import current_app, render_template
+from markupsafe import Markup
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app import db
+
+logger = logging.getLogger('app.catalog_cache')
+
+# Modelos cuyo cambio invalida el catálogo
+MODELOS_CATALOGO = frozenset({
+    'Servicio', 'BarberoServicio', 'Barbero', 'ServicioImagen', 'Producto', 'Categoria', 'Slider',
+})
+
+_version = 0
+_version_lock = threading.Lock()
+_version_bd = None          # Último valor leído de catalogo_version
+_ultima_consulta_bd = 0.0   # time.monotonic() de la última lectura
+
+
+def version_catalogo():
+    """Versión de catálogo vigente en este proceso."""
+    return _version
+
+
+def invalidar_catalogo():
+    """Fuerza la reconstrucción de todas las entradas en la siguiente lectura."""
+    global _version
+    with _version_lock:
+        _version += 1
+
+
+def _sincronizar_con_bd():
+    """Lee `catalogo_version` (como mucho cada N segundos) e invalida si otro worker la cambió."""
+    global _version_bd, _ultima_consulta_bd
+    intervalo = current_app.config.get('CATALOG_VERSION_POLL_SECONDS', 5)
+    ahora = time.monotonic()
+    if not intervalo or ahora - _ultima_consulta_bd < intervalo:
+        return
+    _ultima_consulta_bd = ahora
+
+    from app.models.catalogo import CatalogoVersion
+    tabla = CatalogoVersion.__table__
+    try:
+        # Conexión propia: no interferir con la transacción de la petición
+        with db.engine.connect() as conexion:
+            version_bd = conexion.execute(db.select(tabla.c.version).where(tabla.c.id == 1)).scalar()
+    except Exception as e:
+        logger.warning(f"No se pudo leer la versión de catálogo: {e}")
+        return
+    if version_bd != _version_bd:
+        if _version_bd is not None:
+            invalidar_catalogo()
+        _version_bd = version_bd
+
+
+def obtener_en_cache(clave, construir, variante=None, ttl=None):
+    """
+    Devuelve el valor cacheado para `clave`, reconstruyéndolo si cambió el catálogo.
+
+    Las entradas se guardan por aplicación (`app.extensions`), de modo que cada
+    app (por ejemplo en los tests) tiene las suyas.
+
+    Args:
+        clave (str): Nombre de la entrada
+        construir (callable): Recibe la versión y devuelve el valor a cachear
+        variante (hashable, optional): Dato ajeno al catálogo del que depende el
+            valor (p. ej. la fecha de hoy); si cambia, la entrada se reconstruye
+        ttl (int, optional): Caducidad propia de la entrada (por defecto `CATALOG_CACHE_SECONDS`)
+    """
+    _sincronizar_con_bd()
+    version = _version
+    entradas = current_app.extensions.setdefault('catalogo_cache', {})
+    entrada = entradas.get(clave)
+    if ttl is None:
+        ttl = current_app.config.get('CATALOG_CACHE_SECONDS', 300)
+    if (entrada is None or entrada[0] != version or entrada[3] != variante
+            or time.monotonic() - entrada[1] > ttl):
+        entrada = (version, time.monotonic(), construir(version), variante)
+        entradas[clave] = entrada
+    return entrada[2]
+
+
+def fragmento_cacheado(nombre, plantilla, contexto, variante=None):
+    """
+    Renderiza un fragmento de plantilla una vez por versión de catálogo.
+
+    El fragmento no debe depender del visitante (cookies, usuario, CSRF): la
+    personalización se aplica fuera, en la página que lo incluye.
+
+    Args:
+        nombre (str): Identificador del fragmento
+        plantilla (str): Ruta de la plantilla Jinja
+        contexto (callable): Devuelve el dict de variables; solo se llama al reconstruir
+        variante (hashable, optional): Ver `obtener_en_cache`
+
+    Returns:
+        Markup: HTML listo para insertar con `{{ ... }}`
+    """
+    return obtener_en_cache(
+        f'fragmento:{nombre}',
+        lambda version: Markup(render_template(plantilla, **contexto())),
+        variante=variante,
+    )
+
+
+def _publicar_cambio(engine):
+    """Incrementa `catalogo_version` para que los demás workers invaliden su caché."""
+    from app.models.catalogo import CatalogoVersion
+    tabla = CatalogoVersion.__table__
+    try:
+        with engine.begin() as conexion:
+            actualizadas = conexion.execute(
+                tabla.update().where(tabla.c.id == 1).values(version=tabla.c.version + 1)
+            ).rowcount
+            if not actualizadas:
+                conexion.execute(tabla.insert().values(id=1, version=1))
+    except Exception as e:
+        logger.warning(f"No se pudo publicar el cambio de catálogo: {e}")
+
+
+def _es_modelo_catalogo(clase):
+    return clase is not None and clase.__name__ in MODELOS_CATALOGO
+
+
+def _marcar_modificado(mapper, connection, target):
+    if _es_modelo_catalogo(mapper.class_):
+        Session.object_session(target).info['catalogo_modificado'] = True
+
+
+def _marcar_modificado_masivo(orm_execute_state):
+    # UPDATE/DELETE masivos (Query.update/delete) no disparan los eventos de mapper
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and _es_modelo_catalogo(mapper.class_):
+        orm_execute_state.session.info['catalogo_modificado'] = True
+
+
+def _despues_de_commit(session):
+    if session.info.pop('catalogo_modificado', False):
+        invalidar_catalogo()
+        _publicar_cambio(session.get_bind())
+
+
+def _despues_de_rollback(session):
+    session.info.pop('catalogo_modificado', None)
+
+
+for _evento in ('after_insert', 'after_update', 'after_delete'):
+    event.listen(db.Model, _evento, _marcar_modificado, propagate=True)
+event.listen(Session, 'do_orm_execute', _marcar_modificado_masivo)
+event.listen(Session, 'after_commit', _despues_de_commit)
+event.listen(Session, 'after_rollback', _despues_de_rollback)
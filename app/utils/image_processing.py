@@ -0,0 +1,381 @@
+# filepath: app/utils/image_processing.py
+"""
+Procesamiento de imágenes subidas fuera del request.
+
+Verificar una imagen de hasta `MAX_CONTENT_LENGTH` y generar sus derivados
+(`app/utils/images.py`) tarda segundos; hacerlo dentro del request de
+administración deja un worker de gunicorn bloqueado. `save_image` solo guarda
+el archivo y llama a `image_processor.encolar(url)`:
+
+1. Se añade a la sesión una fila `ProcesamientoImagen` en estado `pendiente`.
+2. Cuando la sesión hace commit (la fila y el modelo que usa la imagen ya son
+   visibles), la ruta se envía a un `ProcessPoolExecutor` de
+   `IMAGE_WORKERS` procesos. Mientras tanto las páginas sirven el original.
+3. Al terminar, el callback (un hilo del proceso padre) marca la fila como
+   `listo` o `error` con una conexión propia.
+
+Como mucho hay `IMAGE_QUEUE_MAX` imágenes en vuelo por proceso; las que no
+caben, y las que quedaron a medias si el worker murió, las recoge la tarea
+programada `procesar_imagenes_pendientes`. Si un proceso hijo muere (p. ej.
+el OOM killer con una imagen enorme) el pool queda roto: se descarta, se crea
+otro en el siguiente envío y las imágenes afectadas vuelven a `pendiente`.
+Ningún error del pool sale del commit que lo disparó. Con `IMAGE_WORKERS = 0`
+(tests) todo se procesa en línea al hacer commit.
+
+El estado se muestra en las pantallas de administración con `estado_imagen(url)`.
+
+La biblioteca ya subida se reoptimiza por lotes con `reoptimizar_biblioteca`
+(`flask mantenimiento reoptimizar-imagenes`), que se puede interrumpir y
+relanzar: lo ya procesado queda anotado en un manifiesto. La misma pasada
+rellena los placeholders (LQIP) de las imágenes subidas antes de tenerlos.
+"""
+import json
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from functools import partial
+
+from flask import current_app, g
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger('app.image_processing')
+
+
+class ImageProcessor:
+    """Pool de procesos acotado para verificar imágenes y generar derivados."""
+
+    def __init__(self):
+        self.app = None
+        self._pool = None
+        self._pid = None
+        self._en_vuelo = 0
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['image_processor'] = self
+        app.jinja_env.globals['estado_imagen'] = estado_imagen
+        # _marcar invalida la caché desde un listener de commit: sus propios listeners
+        # de sesión tienen que estar registrados antes (no durante la iteración)
+        from app.utils import catalog_cache  # noqa: F401
+
+    def _obtener_pool(self):
+        # Un pool por proceso: tras el fork de gunicorn el del master no sirve
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._pool = None
+                self._en_vuelo = 0
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.app.config.get('IMAGE_WORKERS', 2),
+                    mp_context=multiprocessing.get_context('spawn'),
+                )
+            return self._pool
+
+    def _descartar_pool(self, pool):
+        """Retira un pool roto; el siguiente envío crea uno nuevo."""
+        with self._lock:
+            if self._pool is not pool:
+                return  # Otro hilo ya lo sustituyó
+            self._pool = None
+        logger.error("Pool de procesamiento de imágenes roto (¿proceso hijo terminado?); se recreará")
+        try:
+            pool.shutdown(wait=False, cancel_futures=True)
+        except Exception:
+            pass
+
+    def encolar(self, url):
+        """
+        Registra `url` para procesarla cuando la sesión actual haga commit.
+
+        Returns:
+            ProcesamientoImagen: Fila en estado `pendiente`
+        """
+        from app import db
+        from app.models.imagen import ProcesamientoImagen
+
+        with db.session.no_autoflush:
+            fila = ProcesamientoImagen.query.filter_by(ruta=url).first()
+        if fila is None:
+            fila = ProcesamientoImagen(ruta=url)
+            db.session.add(fila)
+        fila.estado, fila.error, fila.derivados = ProcesamientoImagen.PENDIENTE, None, 0
+        db.session.info.setdefault('imagenes_por_procesar', []).append(url)
+        return fila
+
+    def enviar(self, urls, engine):
+        """Lanza el procesamiento de `urls` (ya confirmadas en la base de datos)."""
+        from app.models.imagen import ProcesamientoImagen
+        from app.utils.images import procesar_imagen, ruta_en_disco
+
+        for url in urls:
+            ruta = ruta_en_disco(url)
+            if ruta is None:
+                continue
+            if not self.app.config.get('IMAGE_WORKERS', 2):
+                _marcar(engine, url, _ejecutar_en_linea(procesar_imagen, ruta))
+                continue
+            with self._lock:
+                if self._en_vuelo >= self.app.config.get('IMAGE_QUEUE_MAX', 20):
+                    logger.info(f"Cola de imágenes llena; {url} queda pendiente para la tarea programada")
+                    continue
+                self._en_vuelo += 1
+            _marcar(engine, url, (ProcesamientoImagen.PROCESANDO, None))
+            pool = self._obtener_pool()
+            try:
+                futuro = pool.submit(procesar_imagen, ruta)
+            except (BrokenProcessPool, RuntimeError) as e:
+                with self._lock:
+                    self._en_vuelo -= 1
+                logger.warning(f"No se pudo enviar {url} al pool ({e}); queda pendiente para la tarea programada")
+                self._descartar_pool(pool)
+                _marcar(engine, url, (ProcesamientoImagen.PENDIENTE, None))
+                continue
+            futuro.add_done_callback(lambda f, url=url, pool=pool: self._terminado(f, url, engine, pool))
+
+    def _terminado(self, futuro, url, engine, pool=None):
+        from app.models.imagen import ProcesamientoImagen
+
+        with self._lock:
+            self._en_vuelo -= 1
+        try:
+            resultado = ('listo', futuro.result())
+        except BrokenProcessPool:
+            # No es culpa (necesariamente) de esta imagen: se reintenta con un pool nuevo
+            if pool is not None:
+                self._descartar_pool(pool)
+            resultado = (ProcesamientoImagen.PENDIENTE, None)
+        except Exception as e:
+            logger.warning(f"No se pudo procesar la imagen {url}: {e}")
+            resultado = ('error', str(e))
+        _marcar(engine, url, resultado)
+
+
+def _ejecutar_en_linea(procesar, ruta):
+    try:
+        return 'listo', procesar(ruta)
+    except Exception as e:
+        logger.warning(f"No se pudo procesar la imagen {ruta}: {e}")
+        return 'error', str(e)
+
+
+def _marcar(engine, url, resultado):
+    """Actualiza la fila de `url` con una conexión propia (fuera de la sesión del request)."""
+    from app.models.imagen import ProcesamientoImagen
+
+    estado, dato = resultado
+    valores = {'estado': estado, 'actualizado': datetime.utcnow()}
+    if estado == ProcesamientoImagen.LISTO:
+        valores.update(dato)  # derivados y placeholder
+    elif estado == ProcesamientoImagen.ERROR:
+        valores['error'] = dato
+    tabla = ProcesamientoImagen.__table__
+    try:
+        with engine.begin() as conexion:
+            conexion.execute(tabla.update().where(tabla.c.ruta == url).values(**valores))
+    except Exception as e:
+        logger.error(f"No se pudo guardar el estado de la imagen {url}: {e}")
+    if estado == ProcesamientoImagen.LISTO:
+        # Los fragmentos cacheados se renderizaron sin srcset: reconstruirlos
+        from app.utils.catalog_cache import _publicar_cambio, invalidar_catalogo
+        invalidar_catalogo()
+        _publicar_cambio(engine)
+
+
+def estado_imagen(url):
+    """
+    Estado de procesamiento de `url` para las plantillas de administración.
+
+    Una sola consulta por request: solo se cargan las filas no terminadas
+    (`pendiente`, `procesando`, `error`), que son pocas.
+
+    Returns:
+        ProcesamientoImagen | None: None si la imagen ya está lista o no se procesa
+    """
+    from app.models.imagen import ProcesamientoImagen
+
+    if not url:
+        return None
+    if '_estados_imagen' not in g:
+        g._estados_imagen = {
+            fila.ruta: fila for fila in
+            ProcesamientoImagen.query.filter(ProcesamientoImagen.estado != ProcesamientoImagen.LISTO)
+        }
+    return g._estados_imagen.get(url)
+
+
+def reprocesar_pendientes(antiguedad=timedelta(minutes=15), limite=50):
+    """
+    Reenvía las imágenes que no llegaron a procesarse (cola llena o worker caído).
+
+    Returns:
+        dict: {'reenviadas': n}
+    """
+    from app import db
+    from app.models.imagen import ProcesamientoImagen
+
+    limite_fecha = datetime.utcnow() - antiguedad
+    filas = ProcesamientoImagen.query.filter(
+        ProcesamientoImagen.estado.in_([ProcesamientoImagen.PENDIENTE, ProcesamientoImagen.PROCESANDO]),
+        ProcesamientoImagen.actualizado < limite_fecha,
+    ).order_by(ProcesamientoImagen.id).limit(limite).all()
+    urls = [fila.ruta for fila in filas]
+    db.session.commit()
+    current_app.extensions['image_processor'].enviar(urls, db.engine)
+    return {'reenviadas': len(urls)}
+
+
+MANIFIESTO_REOPTIMIZACION = '.reoptimizacion.json'
+
+
+def _leer_manifiesto(ruta):
+    try:
+        with open(ruta, encoding='utf-8') as archivo:
+            return json.load(archivo)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _guardar_manifiesto(ruta, manifiesto):
+    temporal = ruta + '.tmp'
+    with open(temporal, 'w', encoding='utf-8') as archivo:
+        json.dump(manifiesto, archivo)
+    os.replace(temporal, ruta)
+
+
+def _huella_archivo(ruta):
+    estado = os.stat(ruta)
+    return [estado.st_size, int(estado.st_mtime)]
+
+
+def _guardar_placeholder(conexion, url, placeholder):
+    """Guarda el placeholder de `url`, creando su fila (ya `listo`) si no existía."""
+    from app.models.imagen import ProcesamientoImagen
+
+    tabla = ProcesamientoImagen.__table__
+    ahora = datetime.utcnow()
+    actualizadas = conexion.execute(
+        tabla.update().where(tabla.c.ruta == url).values(placeholder=placeholder, actualizado=ahora)).rowcount
+    if not actualizadas:
+        conexion.execute(tabla.insert().values(ruta=url, estado=ProcesamientoImagen.LISTO, derivados=0,
+                                               placeholder=placeholder, creado=ahora, actualizado=ahora))
+
+
+def reoptimizar_biblioteca(procesos=None, ancho_maximo=2560, reiniciar=False):
+    """
+    Recodifica todos los originales de `UPLOAD_FOLDER` en un pool de procesos.
+
+    Cada original pasa por `reoptimizar_original` (JPEG progresivo, WebP y PNG
+    optimizados, sin metadatos, lado máximo `ancho_maximo`) y se le generan los
+    derivados que falten. Si un original con hash de contenido cambia de bytes,
+    se renombra al hash nuevo y se actualizan sus referencias en la base de
+    datos. Los archivos anteriores no se borran aquí: otros workers siguen
+    sirviendo fragmentos cacheados hasta su siguiente consulta de versión, y el
+    HTML ya enviado a navegadores y proxies apunta a ellos. Se les renueva la
+    fecha y los borra el recolector de huérfanos pasado `UPLOAD_GC_GRACIA_HORAS`.
+
+    Solo se procesan los originales que alguna columna de imagen referencia. El
+    manifiesto `.reoptimizacion.json` guarda el tamaño y la fecha de cada
+    archivo ya procesado; los que no han cambiado se saltan al relanzar, salvo
+    que aún no tengan placeholder.
+
+    Args:
+        procesos (int | None): Procesos del pool (None = `IMAGE_WORKERS`; 0 = en línea)
+        ancho_maximo (int): Lado máximo en píxeles
+        reiniciar (bool): Ignora el manifiesto y procesa todo de nuevo
+
+    Returns:
+        dict: {'archivos', 'recodificados', 'renombrados', 'derivados', 'errores', 'antes', 'despues'}
+    """
+    from app import db
+    from app.models.imagen import ProcesamientoImagen
+    from app.utils.catalog_cache import _publicar_cambio, invalidar_catalogo
+    from app.utils.images import PREFIJO_SUBIDAS, reoptimizar_original
+    from app.utils.uploads import (PATRON_DERIVADO, _recorrer_subidas, aplazar_recoleccion, reemplazar_referencias,
+                                   urls_referenciadas)
+
+    carpeta = current_app.config['UPLOAD_FOLDER']
+    ruta_manifiesto = os.path.join(carpeta, MANIFIESTO_REOPTIMIZACION)
+    manifiesto = {} if reiniciar else _leer_manifiesto(ruta_manifiesto)
+
+    con_placeholder = {ruta for (ruta,) in db.session.query(ProcesamientoImagen.ruta)
+                       .filter(ProcesamientoImagen.placeholder.is_not(None))}
+    db.session.commit()
+    with db.engine.connect() as conexion:
+        referenciadas = urls_referenciadas(conexion)
+
+    def relativa(ruta):
+        return os.path.relpath(ruta, carpeta).replace(os.sep, '/')
+
+    # Los archivos sin referencias (p. ej. originales ya renombrados) son del recolector de huérfanos
+    pendientes = [entrada.path for entrada in _recorrer_subidas(carpeta)
+                  if not entrada.name.startswith('.') and not PATRON_DERIVADO.match(entrada.name)
+                  and PREFIJO_SUBIDAS + relativa(entrada.path) in referenciadas
+                  and (manifiesto.get(relativa(entrada.path)) != _huella_archivo(entrada.path)
+                       or PREFIJO_SUBIDAS + relativa(entrada.path) not in con_placeholder)]
+    resumen = {'archivos': len(pendientes), 'recodificados': 0, 'renombrados': 0, 'derivados': 0,
+               'errores': 0, 'antes': 0, 'despues': 0}
+    if not pendientes:
+        return resumen
+
+    if procesos is None:
+        procesos = current_app.config.get('IMAGE_WORKERS', 2)
+    tarea = partial(reoptimizar_original, ancho_maximo=ancho_maximo)
+    pool = multiprocessing.get_context('spawn').Pool(procesos) if procesos else None
+    try:
+        resultados = pool.imap_unordered(tarea, pendientes) if pool else map(tarea, pendientes)
+        for resultado in resultados:
+            if resultado['error']:
+                logger.warning(f"No se pudo reoptimizar {resultado['ruta']}: {resultado['error']}")
+                resumen['errores'] += 1
+                continue
+            resumen['antes'] += resultado['antes']
+            resumen['despues'] += resultado['despues']
+            resumen['derivados'] += resultado['derivados']
+            if resultado['despues'] != resultado['antes']:
+                resumen['recodificados'] += 1
+            final = resultado['nueva_ruta'] or resultado['ruta']
+            with db.engine.begin() as conexion:
+                if resultado['nueva_ruta']:
+                    reemplazar_referencias(conexion, PREFIJO_SUBIDAS + relativa(resultado['ruta']),
+                                           PREFIJO_SUBIDAS + relativa(final))
+                _guardar_placeholder(conexion, PREFIJO_SUBIDAS + relativa(final), resultado['placeholder'])
+            if resultado['nueva_ruta']:
+                aplazar_recoleccion(resultado['ruta'])
+                manifiesto.pop(relativa(resultado['ruta']), None)
+                resumen['renombrados'] += 1
+            manifiesto[relativa(final)] = _huella_archivo(final)
+            _guardar_manifiesto(ruta_manifiesto, manifiesto)
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+        if resumen['archivos'] > resumen['errores']:
+            # Los fragmentos cacheados tienen las URLs, srcset y placeholders anteriores
+            invalidar_catalogo()
+            _publicar_cambio(db.engine)
+    return resumen
+
+
+def _despues_de_commit(session):
+    urls = session.info.pop('imagenes_por_procesar', None)
+    if urls and 'image_processor' in current_app.extensions:
+        try:
+            current_app.extensions['image_processor'].enviar(urls, session.get_bind())
+        except Exception as e:
+            # Los datos ya están confirmados: las filas siguen pendientes para la tarea programada
+            logger.error(f"No se pudo lanzar el procesamiento de imágenes: {e}", exc_info=True)
+
+
+def _despues_de_rollback(session):
+    session.info.pop('imagenes_por_procesar', None)
+
+
+event.listen(Session, 'after_commit', _despues_de_commit)
+event.listen(Session, 'after_rollback', _despues_de_rollback)
@@ -0,0 +1,283 @@
+# filepath: app/utils/images.py
+"""
+Derivados responsivos de las imágenes subidas.
+
+Tras subir una imagen (`app/admin/utils.save_image`) se generan en segundo
+plano, junto al original, copias redimensionadas a los anchos de
+`ANCHOS_DERIVADOS` en WebP y JPEG, sin metadatos EXIF (la orientación se
+aplica antes de descartarlos):
+
+    /static/uploads/barberos/ab12.jpg
+    /static/uploads/barberos/ab12-320w.webp   /static/uploads/barberos/ab12-320w.jpg
+    /static/uploads/barberos/ab12-640w.webp   ...
+
+Solo se generan anchos menores que el original (nunca se amplía), más una
+copia al ancho del original (`ab12-1000w.webp` para uno de 1000 px): con
+descriptores `w` el navegador no considera el `src`, así que el candidato
+mayor del `srcset` tiene que ser la imagen completa. Las plantillas construyen
+`srcset` con `srcset(url, formato)`, que solo incluye los derivados que existen
+en disco; para imágenes antiguas o URLs externas devuelve '' y se usa el `src`
+original.
+
+Cada imagen procesada tiene además un marcador de posición (LQIP): una
+miniatura WebP de `LADO_PLACEHOLDER` px como data URI de unos cientos de bytes
+que las plantillas ponen de fondo mientras carga la imagen real
+(`generar_placeholder`; se guarda en `ProcesamientoImagen.placeholder`).
+
+`reoptimizar_original` recodifica un original ya subido (JPEG progresivo,
+WebP, PNG optimizado, sin metadatos y con un lado máximo); lo usa
+`flask mantenimiento reoptimizar-imagenes` (ver `app/utils/image_processing.py`).
+"""
+import base64
+import hashlib
+import io
+import logging
+import os
+import tempfile
+from functools import lru_cache
+
+from flask import current_app
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger('app.images')
+
+ANCHOS_DERIVADOS = (320, 640, 1280)
+# extensión -> (formato PIL, opciones de guardado)
+FORMATOS_DERIVADOS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 6}),
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+# extensión del original -> (formato PIL, opciones) al recodificarlo; los GIF no se tocan
+FORMATOS_ORIGINALES = {
+    '.jpg': ('JPEG', {'quality': 85, 'optimize': True, 'progressive': True}),
+    '.jpeg': ('JPEG', {'quality': 85, 'optimize': True, 'progressive': True}),
+    '.webp': ('WEBP', {'quality': 82, 'method': 6}),
+    '.png': ('PNG', {'optimize': True}),
+}
+PREFIJO_SUBIDAS = '/static/uploads/'
+LADO_PLACEHOLDER = 16
+
+
+def ruta_derivado(ruta, ancho, extension):
+    """'.../ab12.jpg' -> '.../ab12-640w.webp' (sirve tanto para URLs como para rutas de disco)."""
+    return f'{os.path.splitext(ruta)[0]}-{ancho}w.{extension}'
+
+
+def anchos_para(ancho_original, anchos=ANCHOS_DERIVADOS):
+    """Anchos de derivado para un original: los menores que él y el suyo propio."""
+    return [ancho for ancho in anchos if ancho < ancho_original] + [ancho_original]
+
+
+@lru_cache(maxsize=4096)
+def _ancho_en_cabecera(ruta, mtime):
+    with Image.open(ruta) as imagen:  # Solo lee la cabecera
+        ancho, alto = imagen.size
+        if imagen.getexif().get(0x0112) in (5, 6, 7, 8):  # Orientación EXIF girada 90°
+            ancho = alto
+    return ancho
+
+
+def ancho_original(ruta):
+    """Ancho (ya orientado) del original en disco, o None si no se puede leer."""
+    try:
+        return _ancho_en_cabecera(ruta, os.path.getmtime(ruta))
+    except (OSError, UnidentifiedImageError):
+        return None
+
+
+def rutas_derivadas(ruta):
+    """Todas las rutas de derivado posibles de `ruta` (existan o no), incluida la de ancho completo."""
+    anchos = set(ANCHOS_DERIVADOS)
+    ancho = ancho_original(ruta)
+    if ancho is not None:
+        anchos.add(ancho)
+    return [ruta_derivado(ruta, ancho, extension) for ancho in sorted(anchos) for extension in FORMATOS_DERIVADOS]
+
+
+def ruta_en_disco(url):
+    """Ruta en disco de una URL de subida ('/static/uploads/...'), o None si no lo es."""
+    if not url or not url.startswith(PREFIJO_SUBIDAS):
+        return None
+    relativa = url[len(PREFIJO_SUBIDAS):]
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], *relativa.split('/'))
+
+
+def generar_derivados(ruta_original, anchos=ANCHOS_DERIVADOS):
+    """
+    Genera los derivados de `ruta_original` junto a él.
+
+    Returns:
+        list[str]: Rutas de los archivos generados
+    """
+    generados = []
+    with Image.open(ruta_original) as abierta:
+        imagen = ImageOps.exif_transpose(abierta)  # Aplica la orientación EXIF antes de descartarla
+        if imagen.mode not in ('RGB', 'RGBA'):
+            imagen = imagen.convert('RGBA' if 'transparency' in imagen.info or imagen.mode in ('LA', 'PA')
+                                    else 'RGB')
+        for ancho in anchos_para(imagen.width, anchos):
+            if ancho == imagen.width:
+                reducida = imagen  # Copia a tamaño completo en cada formato
+            else:
+                alto = max(1, round(imagen.height * ancho / imagen.width))
+                reducida = imagen.resize((ancho, alto), Image.LANCZOS)
+            for extension, (formato, opciones) in FORMATOS_DERIVADOS.items():
+                destino = ruta_derivado(ruta_original, ancho, extension)
+                copia = reducida.convert('RGB') if formato == 'JPEG' and reducida.mode != 'RGB' else reducida
+                # Sin exif=...: el archivo nuevo no arrastra metadatos del original
+                copia.save(destino, formato, **opciones)
+                generados.append(destino)
+    return generados
+
+
+def generar_placeholder(ruta_original, lado=LADO_PLACEHOLDER):
+    """
+    Miniatura borrosa de la imagen como data URI WebP (unos cientos de bytes).
+
+    Devuelve None para imágenes con transparencia: el fondo se vería a través
+    de la imagen real una vez cargada.
+    """
+    with Image.open(ruta_original) as abierta:
+        if 'A' in abierta.mode or 'transparency' in abierta.info:
+            return None
+        abierta.draft('RGB', (lado * 8, lado * 8))  # JPEG: decodifica ya reducido
+        miniatura = ImageOps.exif_transpose(abierta).convert('RGB')
+        miniatura.thumbnail((lado, lado), Image.LANCZOS)
+    buffer = io.BytesIO()
+    miniatura.save(buffer, 'WEBP', quality=30, method=6)
+    return 'data:image/webp;base64,' + base64.b64encode(buffer.getvalue()).decode('ascii')
+
+
+def procesar_imagen(ruta_original):
+    """
+    Verifica que el archivo sea una imagen y genera sus derivados y su placeholder.
+
+    Se ejecuta en un proceso aparte (ver `app/utils/image_processing.py`), así
+    que solo trabaja con rutas de disco: nada de app, contexto ni base de datos.
+
+    Returns:
+        dict: {'derivados': número generado, 'placeholder': data URI o None}
+
+    Raises:
+        ValueError: Si el contenido no es una imagen válida (el archivo se borra)
+    """
+    try:
+        with Image.open(ruta_original) as imagen:
+            imagen.verify()
+    except (UnidentifiedImageError, OSError) as e:
+        os.remove(ruta_original)
+        raise ValueError(f'El contenido no es una imagen válida: {e}') from e
+    return {'derivados': len(generar_derivados(ruta_original)),
+            'placeholder': generar_placeholder(ruta_original)}
+
+
+def _derivados_completos(ruta_original, ancho):
+    return all(os.path.exists(ruta_derivado(ruta_original, a, extension))
+               for a in anchos_para(ancho) for extension in FORMATOS_DERIVADOS)
+
+
+def reoptimizar_original(ruta_original, ancho_maximo=2560):
+    """
+    Recodifica un original subido y genera los derivados que le falten.
+
+    Como `procesar_imagen`, solo trabaja con rutas de disco (se ejecuta en un
+    pool de procesos). El resultado se escribe junto al original y solo se
+    conserva si ocupa menos o si hubo que reducir la imagen:
+
+    - Nombres con hash de contenido (`app/utils/uploads.py`): los bytes nuevos
+      llevan otro nombre, así que se escriben como `<hash nuevo>.<ext>` y el
+      original se deja en su sitio; quien llama actualiza las referencias y
+      después lo borra.
+    - Nombres antiguos (uuid): se sustituye el archivo en el mismo sitio.
+
+    Returns:
+        dict: {'ruta', 'nueva_ruta' (o None), 'antes', 'despues', 'derivados', 'placeholder', 'error'}
+    """
+    from app.utils.uploads import PREFIJO_TEMPORAL, es_nombre_de_contenido
+
+    extension = os.path.splitext(ruta_original)[1].lower()
+    antes = os.path.getsize(ruta_original)
+    resultado = {'ruta': ruta_original, 'nueva_ruta': None, 'antes': antes, 'despues': antes,
+                 'derivados': 0, 'placeholder': None, 'error': None}
+    if extension not in FORMATOS_ORIGINALES:  # GIF: solo el placeholder
+        try:
+            resultado['placeholder'] = generar_placeholder(ruta_original)
+        except (UnidentifiedImageError, OSError) as e:
+            resultado['error'] = str(e)
+        return resultado
+    formato, opciones = FORMATOS_ORIGINALES[extension]
+    carpeta = os.path.dirname(ruta_original)
+    try:
+        with Image.open(ruta_original) as abierta:
+            imagen = ImageOps.exif_transpose(abierta)
+            reducir = max(imagen.size) > ancho_maximo
+            if reducir:
+                imagen.thumbnail((ancho_maximo, ancho_maximo), Image.LANCZOS)
+            if formato == 'JPEG' and imagen.mode != 'RGB':
+                imagen = imagen.convert('RGB')
+            elif imagen.mode not in ('RGB', 'RGBA', 'L', 'LA', 'P'):
+                imagen = imagen.convert('RGBA')
+            descriptor, temporal = tempfile.mkstemp(dir=carpeta, prefix=PREFIJO_TEMPORAL)
+            with os.fdopen(descriptor, 'wb') as destino:
+                imagen.save(destino, formato, **opciones)  # Sin exif=...: se descartan los metadatos
+            ancho_final = imagen.width
+    except (UnidentifiedImageError, OSError) as e:
+        resultado['error'] = str(e)
+        return resultado
+
+    despues = os.path.getsize(temporal)
+    final = ruta_original
+    if despues < antes or reducir:
+        resultado['despues'] = despues
+        if es_nombre_de_contenido(os.path.basename(ruta_original)):
+            with open(temporal, 'rb') as archivo:
+                nombre = hashlib.sha256(archivo.read()).hexdigest() + extension
+            final = os.path.join(carpeta, nombre)
+            if os.path.exists(final):
+                os.remove(temporal)
+            else:
+                os.replace(temporal, final)
+            resultado['nueva_ruta'] = final
+        else:
+            # Los derivados salieron de los píxeles anteriores (y quizá de otro ancho): se regeneran
+            for derivado in rutas_derivadas(ruta_original):
+                if os.path.exists(derivado):
+                    os.remove(derivado)
+            os.replace(temporal, ruta_original)
+    else:
+        os.remove(temporal)
+
+    if not _derivados_completos(final, ancho_final):
+        resultado['derivados'] = len(generar_derivados(final))
+    resultado['placeholder'] = generar_placeholder(final)
+    return resultado
+
+
+def derivados_disponibles(url, extension):
+    """Lista de (ancho, url) de los derivados de `url` que existen en disco, incluido el de ancho completo."""
+    ruta = ruta_en_disco(url)
+    if ruta is None:
+        return []
+    ancho = ancho_original(ruta)
+    anchos = anchos_para(ancho) if ancho is not None else ANCHOS_DERIVADOS
+    return [(a, ruta_derivado(url, a, extension)) for a in anchos
+            if os.path.exists(ruta_derivado(ruta, a, extension))]
+
+
+def srcset(url, formato='webp'):
+    """Valor del atributo `srcset` para `url` ('' si no hay derivados)."""
+    return ', '.join(f'{url_derivado} {ancho}w' for ancho, url_derivado in derivados_disponibles(url, formato))
+
+
+class ImagenResponsiveMixin:
+    """
+    Añade `srcset()` a los modelos con imagen subida.
+
+    `campo_imagen` indica el atributo con la URL ('imagen_url' por defecto).
+    Las copias del catálogo público llevan además `placeholder` (data URI o None).
+    """
+    __slots__ = ()
+    campo_imagen = 'imagen_url'
+
+    def srcset(self, formato='webp'):
+        return srcset(getattr(self, self.campo_imagen), formato)
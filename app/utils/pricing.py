@@ -4,8 +4,76 @@ Utilidades de precios para Barber Brothers.
 
 Este módulo contiene funciones para calcular y obtener precios de servicios,
 considerando precios personalizados por barbero.
+
+Los precios cambian muy de vez en cuando pero se consultan en cada interacción
+de reserva, así que la matriz barbero × servicio completa se carga con un único
+LEFT JOIN en un diccionario inmutable (`MatrizPrecios`) que se reutiliza entre
+peticiones y se reconstruye cuando cambia la versión de catálogo (ver
+`app/utils/catalog_cache.py`).
 """
+from collections import namedtuple
 from decimal import Decimal
+from types import MappingProxyType
+
+from app import db
+from app.utils.catalog_cache import obtener_en_cache
+
+# Datos de un servicio dentro de la matriz
+PrecioServicio = namedtuple('PrecioServicio', 'servicio_id precio_base activo orden')
+# Configuración de un barbero para un servicio (fila de barbero_servicio)
+PrecioBarbero = namedtuple('PrecioBarbero', 'precio_personalizado activo')
+
+
+class MatrizPrecios:
+    """
+    Instantánea inmutable de precios.
+
+    Attributes:
+        version (int): Versión de precios con la que se construyó
+        servicios (Mapping): {servicio_id: PrecioServicio}
+        configuraciones (Mapping): {(barbero_id, servicio_id): PrecioBarbero}
+    """
+    __slots__ = ('version', 'servicios', 'configuraciones')
+
+    def __init__(self, version, servicios, configuraciones):
+        object.__setattr__(self, 'version', version)
+        object.__setattr__(self, 'servicios', MappingProxyType(servicios))
+        object.__setattr__(self, 'configuraciones', MappingProxyType(configuraciones))
+
+    def __setattr__(self, nombre, valor):
+        raise AttributeError('MatrizPrecios es inmutable')
+
+    def precio(self, barbero_id, servicio_id):
+        """Precio final y configuración (o None) de un barbero para un servicio."""
+        servicio = self.servicios[servicio_id]
+        config = self.configuraciones.get((barbero_id, servicio_id))
+        if config is not None and config.precio_personalizado is not None:
+            return config.precio_personalizado, config
+        return servicio.precio_base, config
+
+    @classmethod
+    def construir(cls, version):
+        """Carga servicios y configuraciones con una sola consulta (servicio LEFT JOIN barbero_servicio)."""
+        from app.models.barbero_servicio import BarberoServicio
+        from app.models.servicio import Servicio
+
+        filas = db.session.query(
+            Servicio.id, Servicio.precio, Servicio.activo, Servicio.orden,
+            BarberoServicio.barbero_id, BarberoServicio.precio_personalizado, BarberoServicio.activo,
+        ).outerjoin(BarberoServicio, BarberoServicio.servicio_id == Servicio.id).all()
+
+        servicios, configuraciones = {}, {}
+        for servicio_id, precio, activo, orden, barbero_id, precio_personalizado, config_activa in filas:
+            servicios.setdefault(servicio_id, PrecioServicio(servicio_id, precio, bool(activo), orden or 0))
+            if barbero_id is not None:
+                configuraciones[(barbero_id, servicio_id)] = PrecioBarbero(
+                    precio_personalizado, config_activa is not False)
+        return cls(version, servicios, configuraciones)
+
+
+def obtener_matriz_precios() -> MatrizPrecios:
+    """Devuelve la matriz de precios vigente, reconstruyéndola si cambió el catálogo."""
+    return obtener_en_cache('matriz_precios', MatrizPrecios.construir)
 
 
 def obtener_precio_servicio(barbero_id: int, servicio_id: int) -> dict:
@@ -28,34 +96,20 @@ def obtener_precio_servicio(barbero_id: int, servicio_id: int) -> dict:
         }
         None si el servicio no existe
     """
-    from app.models.barbero_servicio import BarberoServicio
-    from app.models.servicio import Servicio
-    
-    servicio = Servicio.query.get(servicio_id)
-    if not servicio:
+    matriz = obtener_matriz_precios()
+    if servicio_id not in matriz.servicios:
         return None
-    
-    # Buscar configuración específica barbero-servicio
-    config = BarberoServicio.query.filter_by(
-        barbero_id=barbero_id,
-        servicio_id=servicio_id,
-        activo=True
-    ).first()
-    
-    if config:
-        return {
-            'precio': config.get_precio_final(),
-            'precio_base': servicio.precio,
-            'es_personalizado': config.tiene_precio_personalizado(),
-            'servicio_activo_para_barbero': True
-        }
-    
-    # Si no hay configuración específica, el barbero ofrece el servicio al precio base
+
+    precio, config = matriz.precio(barbero_id, servicio_id)
+    precio_base = matriz.servicios[servicio_id].precio_base
+
+    # Sin configuración activa el barbero ofrece el servicio al precio base
     # (comportamiento por defecto para compatibilidad hacia atrás)
+    es_personalizado = config is not None and config.activo and config.precio_personalizado is not None
     return {
-        'precio': servicio.precio,
-        'precio_base': servicio.precio,
-        'es_personalizado': False,
+        'precio': precio if es_personalizado else precio_base,
+        'precio_base': precio_base,
+        'es_personalizado': es_personalizado,
         'servicio_activo_para_barbero': True
     }
 
@@ -69,37 +123,26 @@ def obtener_servicios_barbero(barbero_id: int) -> list:
         
     Returns:
         list: Lista de diccionarios con información de cada servicio:
-            - servicio: objeto Servicio
+            - servicio: `ServicioPublico` del catálogo en caché
             - activo: bool
             - precio_personalizado: Decimal o None
             - precio_final: Decimal
     """
-    from app.models.barbero_servicio import BarberoServicio
-    from app.models.servicio import Servicio
-    
-    servicios = Servicio.query.filter_by(activo=True).order_by(Servicio.orden).all()
+    from app.models.catalogo import obtener_catalogo_publico
+
+    # Servicios activos (por `orden`) y precios salen de las instantáneas en caché, sin consultas
+    matriz = obtener_matriz_precios()
     resultado = []
-    
-    for servicio in servicios:
-        config = BarberoServicio.query.filter_by(
-            barbero_id=barbero_id,
-            servicio_id=servicio.id
-        ).first()
-        
-        if config:
-            resultado.append({
-                'servicio': servicio,
-                'activo': config.activo,
-                'precio_personalizado': config.precio_personalizado,
-                'precio_final': config.get_precio_final()
-            })
-        else:
-            # Sin configuración = activo con precio base (comportamiento por defecto)
-            resultado.append({
-                'servicio': servicio,
-                'activo': True,
-                'precio_personalizado': None,
-                'precio_final': servicio.precio
-            })
-    
+
+    for servicio in obtener_catalogo_publico().servicios:
+        precio_final, config = matriz.precio(barbero_id, servicio.id) \
+            if servicio.id in matriz.servicios else (servicio.precio, None)
+        # Sin configuración = activo con precio base (comportamiento por defecto)
+        resultado.append({
+            'servicio': servicio,
+            'activo': config.activo if config is not None else True,
+            'precio_personalizado': config.precio_personalizado if config is not None else None,
+            'precio_final': precio_final
+        })
+
     return resultado
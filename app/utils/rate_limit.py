@@ -0,0 +1,258 @@
+# filepath: app/utils/rate_limit.py
+"""
+Limitador de peticiones por IP y endpoint (token bucket).
+
+Las APIs públicas de reservas no requieren autenticación y consultan la base de
+datos en cada llamada; un bot o una pestaña que hace polling sin control puede
+agotar el pool de conexiones. Cada par (endpoint, IP) tiene un cubo con
+`capacidad` fichas que se recarga a `capacidad / periodo` fichas por segundo;
+cada petición consume una y, si no quedan, se responde 429 con `Retry-After`.
+
+Por defecto los cubos viven en memoria de cada proceso. Si se define
+`RATELIMIT_STORAGE_URL` (redis://...) y el paquete `redis` está instalado, los
+cubos se comparten entre workers mediante un script Lua atómico.
+
+Uso:
+
+    @bp.route('/api/agendar-cita', methods=['POST'])
+    @rate_limit('agendar_cita')
+    def agendar_cita(): ...
+
+Los límites se configuran en `RATELIMIT_LIMITS` (ver `app/config`).
+"""
+import logging
+import math
+import re
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, jsonify, render_template, request, make_response
+
+try:
+    import redis
+except ImportError:  # El backend compartido es opcional
+    redis = None
+
+logger = logging.getLogger('app.rate_limit')
+
+_PERIODOS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+_FORMATO_LIMITE = re.compile(r'^\s*(\d+)\s*/\s*(\d*)\s*(second|minute|hour|day)s?\s*$')
+
+
+def parse_limite(valor):
+    """
+    Convierte un límite del estilo '30/minute' o '5/10second' en (capacidad, periodo_segundos).
+
+    Raises:
+        ValueError: Si el formato no es válido
+    """
+    coincidencia = _FORMATO_LIMITE.match(valor or '')
+    if not coincidencia:
+        raise ValueError(f"Límite de peticiones inválido: {valor!r}")
+    cantidad, multiplicador, unidad = coincidencia.groups()
+    return int(cantidad), int(multiplicador or 1) * _PERIODOS[unidad]
+
+
+class MemoryBackend:
+    """
+    Cubos en memoria del proceso. Suficiente con un solo worker o como respaldo.
+
+    Como mucho guarda `max_claves` cubos: al crear uno nuevo con el diccionario
+    lleno se descartan los que ya se habrían rellenado (cada cubo guarda su
+    propia tasa y capacidad para comprobarlo) y, si no basta, los menos
+    recientemente usados.
+    """
+
+    def __init__(self, max_claves=10000):
+        self._cubos = OrderedDict()  # clave -> (fichas, ultimo, tasa, capacidad), en orden de uso
+        self._lock = threading.Lock()
+        self.max_claves = max_claves
+
+    def consumir(self, clave, capacidad, periodo):
+        """
+        Intenta consumir una ficha.
+
+        Returns:
+            tuple: (permitido, fichas_restantes, segundos_hasta_proxima_ficha)
+        """
+        tasa = capacidad / periodo
+        ahora = time.monotonic()
+        with self._lock:
+            if clave in self._cubos:
+                fichas, ultimo, _, _ = self._cubos[clave]
+                self._cubos.move_to_end(clave)
+            else:
+                if len(self._cubos) >= self.max_claves:
+                    self._purgar(ahora)
+                fichas, ultimo = capacidad, ahora
+            fichas = min(capacidad, fichas + (ahora - ultimo) * tasa)
+            permitido = fichas >= 1
+            if permitido:
+                fichas -= 1
+            self._cubos[clave] = (fichas, ahora, tasa, capacidad)
+        if permitido:
+            return True, int(fichas), 0
+        return False, 0, (1 - fichas) / tasa
+
+    def _purgar(self, ahora):
+        # Un cubo ya rellenado con su propia tasa equivale a no tener entrada
+        for clave, (fichas, ultimo, tasa, capacidad) in list(self._cubos.items()):
+            if fichas + (ahora - ultimo) * tasa >= capacidad:
+                del self._cubos[clave]
+        while len(self._cubos) >= self.max_claves:
+            self._cubos.popitem(last=False)  # Menos recientemente usado
+
+    def reset(self):
+        with self._lock:
+            self._cubos.clear()
+
+
+class RedisBackend:
+    """Cubos compartidos entre workers en Redis (operación atómica con Lua)."""
+
+    _SCRIPT = """
+    local capacidad = tonumber(ARGV[1])
+    local tasa = tonumber(ARGV[2])
+    local t = redis.call('TIME')
+    local ahora = tonumber(t[1]) + tonumber(t[2]) / 1000000
+    local datos = redis.call('HMGET', KEYS[1], 'f', 't')
+    local fichas = tonumber(datos[1]) or capacidad
+    local ultimo = tonumber(datos[2]) or ahora
+    fichas = math.min(capacidad, fichas + (ahora - ultimo) * tasa)
+    local permitido = 0
+    if fichas >= 1 then
+        fichas = fichas - 1
+        permitido = 1
+    end
+    redis.call('HSET', KEYS[1], 'f', fichas, 't', ahora)
+    redis.call('EXPIRE', KEYS[1], math.ceil(capacidad / tasa) + 1)
+    return {permitido, tostring(fichas)}
+    """
+
+    def __init__(self, url, prefijo='rl:'):
+        self._cliente = redis.Redis.from_url(url)
+        self._script = self._cliente.register_script(self._SCRIPT)
+        self.prefijo = prefijo
+
+    def consumir(self, clave, capacidad, periodo):
+        tasa = capacidad / periodo
+        permitido, fichas = self._script(keys=[self.prefijo + clave], args=[capacidad, tasa])
+        fichas = float(fichas)
+        if permitido:
+            return True, int(fichas), 0
+        return False, 0, (1 - fichas) / tasa
+
+    def reset(self):
+        for clave in self._cliente.scan_iter(self.prefijo + '*'):
+            self._cliente.delete(clave)
+
+
+class RateLimiter:
+    """Extensión Flask que mantiene el backend y los límites por endpoint."""
+
+    def __init__(self):
+        self.backend = None
+        self._limites = {}
+
+    def init_app(self, app):
+        app.extensions['rate_limiter'] = self
+        self._limites = {
+            nombre: parse_limite(valor)
+            for nombre, valor in app.config.get('RATELIMIT_LIMITS', {}).items()
+        }
+
+        url = app.config.get('RATELIMIT_STORAGE_URL')
+        if url and redis is not None:
+            try:
+                self.backend = RedisBackend(url)
+                app.logger.info("Rate limiting con backend compartido en Redis")
+                return
+            except Exception as e:
+                app.logger.error(f"No se pudo conectar al backend de rate limiting ({e}); se usa memoria")
+        elif url:
+            app.logger.warning("RATELIMIT_STORAGE_URL definido pero el paquete 'redis' no está instalado; se usa memoria")
+        self.backend = MemoryBackend()
+
+    def limite_de(self, nombre):
+        return self._limites.get(nombre)
+
+    def ip_cliente(self):
+        """IP del cliente, confiando solo en los `RATELIMIT_PROXY_COUNT` proxies propios."""
+        proxies = current_app.config.get('RATELIMIT_PROXY_COUNT', 0)
+        ruta = request.access_route
+        if proxies and len(ruta) >= proxies:
+            return ruta[-proxies]
+        return request.remote_addr or 'desconocida'
+
+    def consumir(self, nombre):
+        """
+        Consume una ficha del cubo (nombre, IP) si el límite está configurado.
+
+        Returns:
+            tuple | None: (permitido, restantes, retry_after, capacidad) o None si no aplica
+        """
+        limite = self.limite_de(nombre)
+        if limite is None:
+            return None
+        capacidad, periodo = limite
+        clave = f'{nombre}:{self.ip_cliente()}'
+        try:
+            permitido, restantes, espera = self.backend.consumir(clave, capacidad, periodo)
+        except Exception as e:
+            # Ante un fallo del backend compartido se deja pasar la petición
+            logger.error(f"Error en el backend de rate limiting: {e}")
+            return None
+        return permitido, restantes, espera, capacidad
+
+
+def _espera_json():
+    """True para las APIs y clientes que piden JSON; False para páginas y formularios HTML."""
+    return (request.path.startswith('/api/') or request.is_json
+            or request.accept_mimetypes.best == 'application/json')
+
+
+def rate_limit(nombre, methods=None):
+    """
+    Decorador que aplica el límite `RATELIMIT_LIMITS[nombre]` por IP.
+
+    Args:
+        nombre (str): Clave del límite en la configuración
+        methods (tuple, optional): Métodos HTTP a limitar (por defecto todos)
+    """
+    def decorador(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            limiter = current_app.extensions.get('rate_limiter')
+            if (limiter is None or not current_app.config.get('RATELIMIT_ENABLED')
+                    or (methods and request.method not in methods)):
+                return f(*args, **kwargs)
+
+            estado = limiter.consumir(nombre)
+            if estado is None:
+                return f(*args, **kwargs)
+
+            permitido, restantes, espera, capacidad = estado
+            if not permitido:
+                retry_after = max(1, math.ceil(espera))
+                logger.warning(f"Límite '{nombre}' excedido por {limiter.ip_cliente()}")
+                if _espera_json():
+                    respuesta = make_response(jsonify({
+                        'success': False,
+                        'message': 'Demasiadas solicitudes. Intenta de nuevo en unos segundos.',
+                        'retry_after': retry_after,
+                    }), 429)
+                else:  # Formularios HTML (p. ej. /contacto)
+                    respuesta = make_response(render_template('errors/429.html', retry_after=retry_after), 429)
+                respuesta.headers['Retry-After'] = str(retry_after)
+                respuesta.headers['X-RateLimit-Limit'] = str(capacidad)
+                respuesta.headers['X-RateLimit-Remaining'] = '0'
+                return respuesta
+
+            respuesta = make_response(f(*args, **kwargs))
+            respuesta.headers['X-RateLimit-Limit'] = str(capacidad)
+            respuesta.headers['X-RateLimit-Remaining'] = str(restantes)
+            return respuesta
+        return wrapper
+    return decorador
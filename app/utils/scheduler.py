@@ -0,0 +1,186 @@
+# filepath: app/utils/scheduler.py
+"""
+Planificador de tareas periódicas de mantenimiento.
+
+Cada proceso de la aplicación (cada worker de gunicorn) arranca un hilo daemon
+que revisa las tareas registradas, pero solo uno de ellos ejecuta cada tarea:
+antes de correrla, el worker toma un *lease* sobre la fila de la tarea en la
+tabla `tarea_programada` con un UPDATE condicional. El UPDATE solo afecta la
+fila si la tarea ya toca y nadie más tiene el lease vigente, así que la base de
+datos actúa como árbitro y no hace falta coordinación entre procesos.
+
+Si un worker muere a mitad de una tarea, el lease vence (`lease_segundos`) y
+otro worker la retoma en la siguiente vuelta.
+
+Las tareas se registran con el decorador `scheduler.tarea(...)` (ver
+`app/models/tareas.py`) y su última ejecución queda visible en
+`/admin/mantenimiento`.
+"""
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+logger = logging.getLogger('app.scheduler')
+
+
+class TareaRegistrada:
+    """Definición en memoria de una tarea periódica."""
+
+    def __init__(self, nombre, funcion, cada, descripcion='', lease_segundos=600):
+        self.nombre = nombre
+        self.funcion = funcion
+        self.cada = cada
+        self.descripcion = descripcion
+        self.lease_segundos = lease_segundos
+
+    def __repr__(self):
+        return f'<TareaRegistrada {self.nombre} cada {self.cada}>'
+
+
+class TaskScheduler:
+    """Registro de tareas y bucle de ejecución con elección de líder por fila."""
+
+    def __init__(self):
+        self.tareas = {}
+        self.app = None
+        self._hilo = None
+        self._pid = None
+        self._detener = threading.Event()
+        self._lock = threading.Lock()
+        self.owner_id = None
+
+    def tarea(self, nombre, cada, descripcion='', lease_segundos=600):
+        """
+        Decorador que registra una función como tarea periódica.
+
+        Args:
+            nombre (str): Identificador único (clave de la fila en `tarea_programada`)
+            cada (timedelta): Intervalo entre ejecuciones
+            descripcion (str): Texto mostrado en el panel de administración
+            lease_segundos (int): Tiempo máximo que se reserva la tarea para un worker
+        """
+        def decorador(funcion):
+            self.tareas[nombre] = TareaRegistrada(nombre, funcion, cada, descripcion, lease_segundos)
+            return funcion
+        return decorador
+
+    def init_app(self, app):
+        """Asocia el planificador a la app y, si está habilitado, lo arranca con el primer request."""
+        self.app = app
+        app.extensions['scheduler'] = self
+
+        # Importar el módulo registra las tareas en este planificador
+        from app.models import tareas  # noqa: F401
+
+        if app.config.get('SCHEDULER_ENABLED'):
+            # Se arranca en el primer request (y no aquí) para que el hilo viva en el
+            # proceso del worker y no en el master de gunicorn ni en comandos CLI.
+            app.before_request(self._asegurar_iniciado)
+
+    def _asegurar_iniciado(self):
+        if self._pid == os.getpid() and self._hilo is not None and self._hilo.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._hilo is not None and self._hilo.is_alive():
+                return
+            self.iniciar()
+
+    def iniciar(self):
+        """Arranca el hilo del planificador en el proceso actual."""
+        self._pid = os.getpid()
+        self.owner_id = f'{socket.gethostname()}:{self._pid}:{uuid.uuid4().hex[:6]}'
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._bucle, name='barber-scheduler', daemon=True)
+        self._hilo.start()
+        logger.info(f"Planificador de tareas iniciado ({self.owner_id}) con {len(self.tareas)} tareas")
+
+    def detener(self):
+        self._detener.set()
+
+    def _bucle(self):
+        intervalo = self.app.config.get('SCHEDULER_TICK_SECONDS', 30)
+        while not self._detener.is_set():
+            with self.app.app_context():
+                for tarea in list(self.tareas.values()):
+                    try:
+                        self.ejecutar_si_corresponde(tarea)
+                    except Exception as e:
+                        from app import db
+                        db.session.rollback()
+                        logger.error(f"Error en el planificador con la tarea {tarea.nombre}: {e}", exc_info=True)
+            self._detener.wait(intervalo)
+
+    def _owner(self):
+        if self.owner_id is None:
+            self.owner_id = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}'
+        return self.owner_id
+
+    def ejecutar_si_corresponde(self, tarea, forzar=False):
+        """
+        Ejecuta la tarea si ya le toca y este proceso consigue el lease.
+
+        Args:
+            tarea (TareaRegistrada): Tarea a ejecutar
+            forzar (bool): Ignora `proxima_ejecucion` (el lease se sigue respetando)
+
+        Returns:
+            bool: True si la tarea se ejecutó en este proceso
+        """
+        from app import db
+        from app.models.tareas import TareaProgramada
+
+        TareaProgramada.asegurar_registro(tarea.nombre)
+
+        ahora = datetime.utcnow()
+        owner = self._owner()
+        tabla = TareaProgramada.__table__
+        condiciones = [
+            tabla.c.nombre == tarea.nombre,
+            db.or_(tabla.c.lease_expira.is_(None), tabla.c.lease_expira < ahora),
+        ]
+        if not forzar:
+            condiciones.append(db.or_(tabla.c.proxima_ejecucion.is_(None), tabla.c.proxima_ejecucion <= ahora))
+        adquirido = db.session.execute(
+            tabla.update()
+            .where(*condiciones)
+            .values(lease_owner=owner, lease_expira=ahora + timedelta(seconds=tarea.lease_segundos))
+        ).rowcount == 1
+        db.session.commit()
+
+        if not adquirido:
+            return False
+
+        inicio = time.perf_counter()
+        resultado, error = None, None
+        try:
+            resultado = tarea.funcion()
+        except Exception as e:
+            db.session.rollback()
+            error = str(e)
+            logger.error(f"La tarea {tarea.nombre} falló: {e}", exc_info=True)
+        duracion_ms = int((time.perf_counter() - inicio) * 1000)
+
+        fin = datetime.utcnow()
+        db.session.execute(
+            tabla.update()
+            .where(tabla.c.nombre == tarea.nombre, tabla.c.lease_owner == owner)
+            .values(
+                ultima_ejecucion=fin,
+                ultima_duracion_ms=duracion_ms,
+                ultimo_resultado=json.dumps(resultado, default=str) if resultado is not None else None,
+                ultimo_error=error,
+                ejecuciones=tabla.c.ejecuciones + 1,
+                proxima_ejecucion=fin + tarea.cada,
+                lease_owner=None,
+                lease_expira=None,
+            )
+        )
+        db.session.commit()
+        logger.info(f"Tarea {tarea.nombre} ejecutada en {duracion_ms} ms"
+                    + (f" con error: {error}" if error else f" -> {resultado}"))
+        return True
@@ -0,0 +1,147 @@
+# filepath: app/utils/sitemap.py
+"""
+Sitemap del sitio público (`/sitemap.xml`, `/sitemap-index.xml`, `/sitemap-<n>.xml`).
+
+Las URLs salen de la instantánea de catálogo y del listado de productos
+(`app/models/catalogo.py`), así que generar el sitemap no consulta la base de
+datos. `lastmod` se toma de las columnas reales (`actualizado` de servicios,
+productos y categorías, `fecha_actualizacion` de sliders); las páginas sin datos
+detrás (contacto, legales) no lo llevan, para que los buscadores no las
+vuelvan a pedir sin motivo.
+
+El XML se escribe por trozos con un generador y se guarda ya codificado por
+versión de catálogo (`obtener_en_cache`), junto con su ETag. Cuando hay más de
+`SITEMAP_URLS_POR_ARCHIVO` URLs se reparte en varios archivos y `/sitemap.xml`
+pasa a ser un índice que los enumera.
+"""
+import hashlib
+from collections import namedtuple
+from xml.sax.saxutils import escape
+
+from flask import current_app, request, url_for
+
+from app.models.catalogo import obtener_catalogo_publico, obtener_listado_productos
+from app.utils.catalog_cache import obtener_en_cache
+
+NAMESPACE = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+
+UrlSitemap = namedtuple('UrlSitemap', 'loc lastmod changefreq priority')
+
+# Archivo ya renderizado: cuerpo (bytes), ETag y fecha de la URL más reciente
+ArchivoSitemap = namedtuple('ArchivoSitemap', 'cuerpo etag lastmod')
+
+
+def _fecha_mas_reciente(*fechas):
+    fechas = [f for f in fechas if f is not None]
+    return max(fechas) if fechas else None
+
+
+def recopilar_urls():
+    """
+    Lista de URLs públicas con su `lastmod` (datetime o None).
+
+    Returns:
+        list[UrlSitemap]: Páginas principales, servicios, categorías, productos y legales
+    """
+    catalogo = obtener_catalogo_publico()
+    listado = obtener_listado_productos()
+
+    def url(endpoint, fragmento=''):
+        return url_for(endpoint, _external=True).rstrip('/') + fragmento
+
+    ultimo_servicio = _fecha_mas_reciente(*(s.actualizado for s in catalogo.servicios))
+    ultimo_producto = _fecha_mas_reciente(*(p.actualizado for p in listado.productos),
+                                          *(g.categoria.actualizado for g in listado.categorias_con_productos))
+    ultimo_slider = _fecha_mas_reciente(*(s.fecha_actualizacion for s in catalogo.sliders))
+
+    urls = [
+        UrlSitemap(url('public.home'), _fecha_mas_reciente(ultimo_servicio, ultimo_producto, ultimo_slider),
+                   'daily', '1.0'),
+        UrlSitemap(url('public.servicios'), ultimo_servicio, 'weekly', '0.9'),
+        UrlSitemap(url('public.productos'), ultimo_producto, 'weekly', '0.8'),
+        UrlSitemap(url('public.contact'), None, 'monthly', '0.7'),
+    ]
+    urls.extend(
+        UrlSitemap(url('public.servicios', f'#servicio-{s.id}'), s.actualizado, 'monthly', '0.6')
+        for s in catalogo.servicios
+    )
+    for grupo in listado.categorias_con_productos:
+        urls.append(UrlSitemap(
+            url('public.productos', f'#categoria-{grupo.categoria.id}'),
+            _fecha_mas_reciente(grupo.categoria.actualizado, *(p.actualizado for p in grupo.productos)),
+            'monthly', '0.4',
+        ))
+    urls.extend(
+        UrlSitemap(url('public.productos', f'#producto-{p.id}'), p.actualizado, 'monthly', '0.5')
+        for p in listado.productos
+    )
+    urls.extend(
+        UrlSitemap(url(endpoint), None, 'yearly', '0.3')
+        for endpoint in ('public.privacidad', 'public.terminos', 'public.cookies')
+    )
+    return urls
+
+
+def generar_urlset(urls):
+    """Genera el `<urlset>` por trozos (str), sin concatenar todo el documento."""
+    yield f'<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="{NAMESPACE}">\n'
+    for u in urls:
+        lastmod = f'    <lastmod>{u.lastmod:%Y-%m-%d}</lastmod>\n' if u.lastmod else ''
+        yield (f'  <url>\n    <loc>{escape(u.loc)}</loc>\n{lastmod}'
+               f'    <changefreq>{u.changefreq}</changefreq>\n    <priority>{u.priority}</priority>\n  </url>\n')
+    yield '</urlset>\n'
+
+
+def generar_indice(archivos):
+    """Genera el `<sitemapindex>` a partir de pares (loc, lastmod)."""
+    yield f'<?xml version="1.0" encoding="UTF-8"?>\n<sitemapindex xmlns="{NAMESPACE}">\n'
+    for loc, lastmod in archivos:
+        lastmod = f'    <lastmod>{lastmod:%Y-%m-%d}</lastmod>\n' if lastmod else ''
+        yield f'  <sitemap>\n    <loc>{escape(loc)}</loc>\n{lastmod}  </sitemap>\n'
+    yield '</sitemapindex>\n'
+
+
+def _renderizar(trozos, lastmod=None):
+    cuerpo = ''.join(trozos).encode('utf-8')
+    return ArchivoSitemap(cuerpo, hashlib.sha1(cuerpo).hexdigest(), lastmod)
+
+
+class Sitemap:
+    """
+    Sitemap renderizado para una versión de catálogo y un dominio.
+
+    Attributes:
+        partes (tuple[ArchivoSitemap]): Un `<urlset>` por cada tramo de URLs
+        indice (ArchivoSitemap): `<sitemapindex>` con las partes
+    """
+    __slots__ = ('partes', 'indice')
+
+    def __init__(self, partes, indice):
+        self.partes = partes
+        self.indice = indice
+
+    @property
+    def principal(self):
+        """Lo que se sirve en `/sitemap.xml`: el urlset si cabe en uno, si no el índice."""
+        return self.partes[0] if len(self.partes) == 1 else self.indice
+
+    @classmethod
+    def construir(cls, version):
+        urls = recopilar_urls()
+        por_archivo = max(1, current_app.config.get('SITEMAP_URLS_POR_ARCHIVO', 50000))
+        tramos = [urls[i:i + por_archivo] for i in range(0, len(urls), por_archivo)] or [[]]
+        partes = tuple(
+            _renderizar(generar_urlset(tramo), _fecha_mas_reciente(*(u.lastmod for u in tramo)))
+            for tramo in tramos
+        )
+        if len(partes) == 1:
+            locs = [url_for('public.sitemap_xml', _external=True)]
+        else:
+            locs = [url_for('public.sitemap_parte', numero=n, _external=True) for n in range(1, len(partes) + 1)]
+        indice = _renderizar(generar_indice(zip(locs, (p.lastmod for p in partes))))
+        return cls(partes, indice)
+
+
+def obtener_sitemap():
+    """Sitemap vigente para el dominio de la petición (se reconstruye si cambia el catálogo)."""
+    return obtener_en_cache('sitemap', Sitemap.construir, variante=request.url_root)
@@ -0,0 +1,265 @@
+# filepath: app/utils/static_assets.py
+"""
+URLs de archivos estáticos con huella de contenido (fingerprinting).
+
+Al arrancar se calcula un hash del contenido de cada archivo de `app/static`
+(salvo `uploads/`) y `url_for('static', filename='css/public_styles.css')`
+pasa a devolver `/static/css/public_styles.3f2a9c1b7d4e.css`. Como la URL cambia
+en cuanto cambia el archivo, esas respuestas se sirven con
+`Cache-Control: public, max-age=31536000, immutable` y el navegador no vuelve
+a pedirlas hasta el siguiente despliegue que las modifique.
+
+Las URLs sin huella (`/static/logo.png` escrito a mano en el CSS) se siguen
+sirviendo como siempre. Las subidas nuevas ya llevan el hash de su contenido en
+el nombre (`app/utils/uploads.py`), así que también se sirven como inmutables.
+
+Se activa con `STATIC_FINGERPRINT` (desactivado en desarrollo, donde los
+archivos cambian sin reiniciar el servidor).
+
+Variantes precomprimidas: `flask mantenimiento comprimir-estaticos` escribe
+junto a cada CSS/JS/SVG... un `.gz` y, si está instalado el paquete `brotli`,
+un `.br`. Al servir un estático se elige la variante según `Accept-Encoding`
+(br > gzip > sin comprimir) y se añade `Vary: Accept-Encoding`; nunca se
+comprime durante la petición. Las variantes se detectan al arrancar, así que
+hay que generarlas antes de (re)iniciar la aplicación.
+
+Descarga delegada (`FILE_OFFLOAD`): con `x-accel` las respuestas de archivo
+(estáticos, subidas, ads.txt, favicon) no llevan el contenido, sino una
+cabecera `X-Accel-Redirect: /_archivos/<ruta>` para que nginx lo envíe desde
+su `location` interna (ver `deployment/nginx_seo_config.conf`; allí
+`gzip_static` elige la variante comprimida). Con `x-sendfile` (Apache
+mod_xsendfile, lighttpd) se activa `USE_X_SENDFILE` de Flask. Sin valor, Flask
+sirve los archivos como siempre. En todos los casos el worker queda libre en
+cuanto devuelve las cabeceras.
+"""
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+from urllib.parse import quote
+
+from flask import current_app, request, send_from_directory
+from werkzeug.exceptions import NotFound
+from werkzeug.security import safe_join
+
+from app.utils.uploads import es_nombre_de_contenido
+
+try:
+    import brotli
+except ImportError:  # Sin brotli solo se generan variantes .gz
+    brotli = None
+
+logger = logging.getLogger('app.static_assets')
+
+CACHE_INMUTABLE = 'public, max-age=31536000, immutable'
+LONGITUD_HUELLA = 12
+
+# Extensiones que merece la pena comprimir (las imágenes y woff2 ya lo están)
+EXTENSIONES_COMPRIMIBLES = frozenset({'.css', '.js', '.svg', '.txt', '.xml', '.json', '.html', '.map'})
+# Content-Encoding -> sufijo del archivo, por orden de preferencia
+CODIFICACIONES = (('br', '.br'), ('gzip', '.gz'))
+
+
+def huella_archivo(ruta):
+    """Primeros `LONGITUD_HUELLA` caracteres del SHA-256 del contenido."""
+    sha = hashlib.sha256()
+    with open(ruta, 'rb') as archivo:
+        for bloque in iter(lambda: archivo.read(64 * 1024), b''):
+            sha.update(bloque)
+    return sha.hexdigest()[:LONGITUD_HUELLA]
+
+
+def nombre_con_huella(nombre, huella):
+    """'css/app.css' -> 'css/app.<huella>.css'"""
+    base, extension = os.path.splitext(nombre)
+    return f'{base}.{huella}{extension}'
+
+
+def _es_variante(nombre):
+    return any(nombre.endswith(sufijo) for _, sufijo in CODIFICACIONES)
+
+
+def enviar_archivo(carpeta, nombre, mimetype=None):
+    """
+    `send_from_directory` que delega la transferencia en nginx si `FILE_OFFLOAD = 'x-accel'`.
+
+    Solo se delegan archivos de la carpeta estática (la que mapea la `location`
+    interna); el resto se sirve directamente.
+
+    Raises:
+        NotFound: Si el archivo no existe (igual que `send_from_directory`)
+    """
+    static_folder = current_app.static_folder
+    if current_app.config.get('FILE_OFFLOAD') != 'x-accel' or not static_folder:
+        return send_from_directory(carpeta, nombre, mimetype=mimetype)
+    ruta = safe_join(carpeta, nombre)
+    if ruta is None or not os.path.isfile(ruta):
+        raise NotFound()
+    relativa = os.path.relpath(ruta, static_folder)
+    if relativa.startswith(os.pardir):
+        return send_from_directory(carpeta, nombre, mimetype=mimetype)
+    respuesta = current_app.response_class(
+        mimetype=mimetype or mimetypes.guess_type(nombre)[0] or 'application/octet-stream')
+    prefijo = current_app.config.get('FILE_OFFLOAD_PREFIX', '/_archivos/')
+    respuesta.headers['X-Accel-Redirect'] = prefijo + quote(relativa.replace(os.sep, '/'))
+    return respuesta
+
+
+def _es_subida_inmutable(nombre):
+    return nombre.startswith('uploads/') and es_nombre_de_contenido(nombre.rsplit('/', 1)[-1])
+
+
+def _recorrer(carpeta, excluir):
+    """Genera (ruta relativa con '/', ruta absoluta) de los archivos originales de `carpeta`."""
+    for raiz, directorios, archivos in os.walk(carpeta):
+        relativa = os.path.relpath(raiz, carpeta)
+        if relativa == '.':
+            directorios[:] = [d for d in directorios if d not in excluir]
+        for nombre in archivos:
+            if not _es_variante(nombre):
+                clave = os.path.normpath(os.path.join(relativa, nombre)).replace(os.sep, '/')
+                yield clave, os.path.join(raiz, nombre)
+
+
+def comprimir_carpeta(carpeta, excluir=('uploads',), forzar=False):
+    """
+    Escribe las variantes `.gz` (y `.br` si hay brotli) de los archivos comprimibles.
+
+    Solo se regenera una variante si el original es más reciente, y se descarta
+    si no resulta más pequeña que el original.
+
+    Returns:
+        dict: {'archivos', 'generados', 'bytes_originales', 'bytes_comprimidos'}
+    """
+    compresores = {'.gz': lambda datos: gzip.compress(datos, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        compresores['.br'] = lambda datos: brotli.compress(datos, quality=11)
+
+    resumen = {'archivos': 0, 'generados': 0, 'bytes_originales': 0, 'bytes_comprimidos': 0}
+    for _, ruta in _recorrer(carpeta, excluir):
+        if os.path.splitext(ruta)[1].lower() not in EXTENSIONES_COMPRIMIBLES:
+            continue
+        resumen['archivos'] += 1
+        with open(ruta, 'rb') as archivo:
+            datos = archivo.read()
+        for sufijo, comprimir in compresores.items():
+            destino = ruta + sufijo
+            if not forzar and os.path.exists(destino) and os.path.getmtime(destino) >= os.path.getmtime(ruta):
+                continue
+            comprimido = comprimir(datos)
+            if len(comprimido) >= len(datos):
+                if os.path.exists(destino):
+                    os.remove(destino)
+                continue
+            with open(destino, 'wb') as archivo:
+                archivo.write(comprimido)
+            resumen['generados'] += 1
+            resumen['bytes_originales'] += len(datos)
+            resumen['bytes_comprimidos'] += len(comprimido)
+    return resumen
+
+
+class StaticAssets:
+    """
+    Manifiesto `nombre original -> nombre con huella` de la carpeta estática y
+    variantes comprimidas disponibles de cada archivo.
+
+    Uso (ver `create_app`):
+
+        static_assets = StaticAssets()
+        static_assets.init_app(app)
+    """
+
+    def __init__(self, app=None, excluir=('uploads',)):
+        self.excluir = tuple(excluir)
+        self.manifiesto = {}
+        self.originales = {}
+        self.variantes = {}
+        if app is not None:
+            self.init_app(app)
+
+    def construir(self, carpeta, huellas=True):
+        """
+        Recorre `carpeta`: huella de cada archivo y variantes comprimidas disponibles.
+
+        Una variante más antigua que su original (el original cambió en un
+        despliegue sin volver a ejecutar `comprimir-estaticos`) no se registra:
+        se serviría con la URL del contenido nuevo y caché inmutable.
+        """
+        manifiesto, variantes = {}, {}
+        for clave, ruta in _recorrer(carpeta, self.excluir):
+            if huellas:
+                manifiesto[clave] = nombre_con_huella(clave, huella_archivo(ruta))
+            disponibles = []
+            for codificacion, sufijo in CODIFICACIONES:
+                if not os.path.exists(ruta + sufijo):
+                    continue
+                if os.path.getmtime(ruta + sufijo) < os.path.getmtime(ruta):
+                    logger.warning(f"Variante {clave}{sufijo} desactualizada; se ignora "
+                                   f"(ejecuta 'flask mantenimiento comprimir-estaticos')")
+                    continue
+                disponibles.append(codificacion)
+            if disponibles:
+                variantes[clave] = tuple(disponibles)
+        self.manifiesto = manifiesto
+        self.originales = {con_huella: original for original, con_huella in manifiesto.items()}
+        self.variantes = variantes
+        return manifiesto
+
+    def init_app(self, app):
+        app.extensions['static_assets'] = self
+        if app.config.get('FILE_OFFLOAD') == 'x-sendfile':
+            app.config['USE_X_SENDFILE'] = True  # Lo aplica el propio send_file de Flask
+        if not app.static_folder:
+            return
+        huellas = app.config.get('STATIC_FINGERPRINT', True)
+        try:
+            self.construir(app.static_folder, huellas=huellas)
+        except OSError as e:
+            logger.warning(f"No se pudo construir el manifiesto de estáticos: {e}")
+            return
+        logger.info(f"Manifiesto de estáticos: {len(self.manifiesto)} archivos con huella, "
+                    f"{len(self.variantes)} con variantes comprimidas")
+
+        if huellas:
+            app.url_defaults(self._reescribir_url)
+        vista_original = app.view_functions['static']
+
+        def static(filename):
+            original = self.originales.get(filename)
+            nombre = original or filename
+            if app.config.get('FILE_OFFLOAD') == 'x-accel':
+                # nginx elige la variante comprimida (gzip_static) en su location interna
+                respuesta = enviar_archivo(app.static_folder, nombre)
+                if original is not None or _es_subida_inmutable(filename):
+                    respuesta.headers['Cache-Control'] = CACHE_INMUTABLE
+                return respuesta
+            codificacion = self._elegir_codificacion(nombre)
+            if codificacion is not None:
+                sufijo = dict(CODIFICACIONES)[codificacion]
+                respuesta = send_from_directory(app.static_folder, nombre + sufijo,
+                                                mimetype=mimetypes.guess_type(nombre)[0])
+                respuesta.headers['Content-Encoding'] = codificacion
+            elif original is not None:
+                respuesta = send_from_directory(app.static_folder, original)
+            else:
+                respuesta = vista_original(filename=filename)
+            if nombre in self.variantes:
+                respuesta.vary.add('Accept-Encoding')
+            if original is not None or _es_subida_inmutable(filename):
+                respuesta.headers['Cache-Control'] = CACHE_INMUTABLE
+            return respuesta
+
+        app.view_functions['static'] = static
+
+    def _elegir_codificacion(self, nombre):
+        """Mejor variante comprimida aceptada por el cliente, o None."""
+        for codificacion in self.variantes.get(nombre, ()):
+            if request.accept_encodings[codificacion]:
+                return codificacion
+        return None
+
+    def _reescribir_url(self, endpoint, values):
+        if endpoint == 'static' and 'filename' in values:
+            values['filename'] = self.manifiesto.get(values['filename'].lstrip('/'), values['filename'])
@@ -0,0 +1,308 @@
+# filepath: app/utils/uploads.py
+"""
+Almacenamiento de subidas direccionado por contenido.
+
+Cada archivo subido se guarda como `uploads/<carpeta>/<sha256>.<ext>`, con el
+hash calculado mientras se escribe a disco. Dos subidas con los mismos bytes
+(la misma foto para tres barberos) comparten un único archivo, y como el nombre
+cambia si cambia el contenido, esas URLs se pueden cachear para siempre.
+
+Compartir archivos obliga a no borrarlos a ciegas: las referencias se cuentan
+sobre las columnas de imagen (`COLUMNAS_IMAGEN`). Cuando un commit cambia o
+elimina una de esas referencias, el archivo anterior (y sus derivados) se borra
+solo si ya nadie lo usa. Los archivos modificados hace menos de
+`UPLOAD_REUSO_SEGUNDOS` se conservan, por si otra subida en curso acaba de
+reutilizarlos; el recolector de huérfanos los recoge más tarde.
+
+Recolector de huérfanos (`recolectar_huerfanas`): recorre la carpeta de subidas
+y borra (o mueve a una carpeta de cuarentena) los archivos que ninguna columna
+de imagen referencia y que llevan más de un periodo de gracia sin tocarse:
+restos de antes de este módulo, subidas de formularios que fallaron y
+temporales de subidas interrumpidas. Se ejecuta a diario como tarea programada
+y con `flask mantenimiento recolectar-subidas`.
+"""
+import hashlib
+import logging
+import os
+import re
+import shutil
+import tempfile
+import time
+
+from flask import current_app
+from sqlalchemy import event, func, inspect, select, union_all
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger('app.uploads')
+
+PREFIJO_TEMPORAL = '.subida-'
+# Nombre direccionado por contenido: 64 hex (los antiguos uuid4 tienen 32)
+PATRON_CONTENIDO = re.compile(r'^[0-9a-f]{64}(-\d+w)?\.\w+$')
+# Derivado de app/utils/images.py: '<base>-640w.webp' -> '<base>'
+PATRON_DERIVADO = re.compile(r'^(?P<base>.+)-\d+w\.(webp|jpg)$')
+
+# (modelo, atributo) de cada columna que guarda una URL de subida
+COLUMNAS_IMAGEN = (
+    ('Barbero', 'imagen_url'),
+    ('Producto', 'imagen_url'),
+    ('Servicio', 'imagen_url'),
+    ('ServicioImagen', 'ruta_imagen'),
+    ('Slider', 'imagen_url'),
+)
+_ATRIBUTOS = dict(COLUMNAS_IMAGEN)
+
+
+def es_nombre_de_contenido(nombre):
+    """True si `nombre` (o un derivado suyo) es un nombre direccionado por contenido."""
+    return bool(PATRON_CONTENIDO.match(nombre))
+
+
+def guardar_por_contenido(archivo, carpeta, extension):
+    """
+    Escribe `archivo` (FileStorage) en `carpeta` con su hash como nombre.
+
+    Args:
+        archivo: Subida de Werkzeug; se lee por bloques desde `archivo.stream`
+        carpeta (str): Carpeta de destino (se crea si no existe)
+        extension (str): Extensión con punto ('.jpg')
+
+    Returns:
+        tuple[str, bool]: (nombre del archivo, True si no existía ya)
+    """
+    os.makedirs(carpeta, exist_ok=True)
+    sha = hashlib.sha256()
+    descriptor, temporal = tempfile.mkstemp(dir=carpeta, prefix=PREFIJO_TEMPORAL)
+    try:
+        with os.fdopen(descriptor, 'wb') as destino:
+            for bloque in iter(lambda: archivo.stream.read(64 * 1024), b''):
+                sha.update(bloque)
+                destino.write(bloque)
+        nombre = f'{sha.hexdigest()}{extension.lower()}'
+        ruta = os.path.join(carpeta, nombre)
+        if os.path.exists(ruta):
+            os.remove(temporal)
+            os.utime(ruta)  # Marca de reutilización reciente (ver UPLOAD_REUSO_SEGUNDOS)
+            return nombre, False
+        os.replace(temporal, ruta)
+        return nombre, True
+    except BaseException:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+
+
+def _columnas():
+    """Columnas de `COLUMNAS_IMAGEN` con su condición extra (solo imágenes de galería activas)."""
+    from app import db
+
+    modelos = {m.class_.__name__: m.class_ for m in db.Model.registry.mappers}
+    columnas = []
+    for nombre_modelo, atributo in COLUMNAS_IMAGEN:
+        modelo = modelos.get(nombre_modelo)
+        if modelo is None:  # Slider es opcional
+            continue
+        tabla = modelo.__table__
+        extra = (tabla.c.activa.is_(True),) if nombre_modelo == 'ServicioImagen' else ()
+        columnas.append((tabla, tabla.c[atributo], extra))
+    return columnas
+
+
+def contar_referencias(conexion, url):
+    """Número de filas (en todas las columnas de imagen) que usan `url`."""
+    consultas = [select(func.count()).select_from(tabla).where(columna == url, *extra)
+                 for tabla, columna, extra in _columnas()]
+    subconsulta = union_all(*consultas).subquery()
+    return conexion.execute(select(func.coalesce(func.sum(subconsulta.c[0]), 0))).scalar()
+
+
+def urls_referenciadas(conexion):
+    """Conjunto de URLs usadas por alguna columna de imagen (un SELECT DISTINCT por columna)."""
+    urls = set()
+    for tabla, columna, extra in _columnas():
+        urls.update(conexion.execute(select(columna).distinct().where(columna.is_not(None), *extra)).scalars())
+    return urls
+
+
+def reemplazar_referencias(conexion, url_anterior, url_nueva):
+    """Apunta a `url_nueva` todas las filas que usaban `url_anterior` (incluidas las inactivas)."""
+    from app.models.imagen import ProcesamientoImagen
+
+    for tabla, columna, _ in _columnas():
+        conexion.execute(tabla.update().where(columna == url_anterior).values({columna.name: url_nueva}))
+    tabla = ProcesamientoImagen.__table__
+    conexion.execute(tabla.delete().where(tabla.c.ruta == url_anterior))
+
+
+def borrar_archivo_y_derivados(ruta):
+    """Borra una subida y sus derivados. Devuelve los bytes liberados."""
+    from app.utils.images import rutas_derivadas
+
+    liberados = 0
+    for candidata in [ruta] + rutas_derivadas(ruta):
+        try:
+            liberados += os.path.getsize(candidata)
+            os.remove(candidata)
+        except FileNotFoundError:
+            pass
+    return liberados
+
+
+def aplazar_recoleccion(ruta):
+    """
+    Renueva la fecha de una subida ya sin referencias y de sus derivados, para
+    que el recolector de huérfanos respete su periodo de gracia desde ahora.
+    """
+    from app.utils.images import rutas_derivadas
+
+    for candidata in [ruta] + rutas_derivadas(ruta):
+        try:
+            os.utime(candidata)
+        except FileNotFoundError:
+            pass
+
+
+def liberar_si_huerfana(engine, url):
+    """
+    Borra el archivo de `url` si ninguna columna de imagen lo referencia ya.
+
+    Returns:
+        bool: True si se borró
+    """
+    from app.models.imagen import ProcesamientoImagen
+    from app.utils.images import ruta_en_disco
+
+    ruta = ruta_en_disco(url)
+    if ruta is None or not os.path.exists(ruta):
+        return False
+    reuso = current_app.config.get('UPLOAD_REUSO_SEGUNDOS', 300)
+    if time.time() - os.path.getmtime(ruta) < reuso:
+        return False
+    with engine.begin() as conexion:
+        if contar_referencias(conexion, url):
+            return False
+        tabla = ProcesamientoImagen.__table__
+        conexion.execute(tabla.delete().where(tabla.c.ruta == url))
+    logger.info(f"Subida sin referencias eliminada: {url} ({borrar_archivo_y_derivados(ruta)} bytes)")
+    return True
+
+
+def _recorrer_subidas(carpeta):
+    """Genera las entradas (`os.DirEntry`) de archivo bajo `carpeta`, recursivamente."""
+    with os.scandir(carpeta) as entradas:
+        for entrada in entradas:
+            if entrada.is_dir(follow_symlinks=False):
+                yield from _recorrer_subidas(entrada.path)
+            elif entrada.is_file(follow_symlinks=False):
+                yield entrada
+
+
+def _esta_referenciada(url, referenciadas, bases):
+    if url in referenciadas:
+        return True
+    derivado = PATRON_DERIVADO.match(url)
+    return derivado is not None and derivado.group('base') in bases
+
+
+def recolectar_huerfanas(gracia_segundos=86400, cuarentena=None, simular=False):
+    """
+    Elimina las subidas sin referencias con más de `gracia_segundos` de antigüedad.
+
+    Las URLs referenciadas se obtienen con un SELECT DISTINCT por columna de
+    imagen; un derivado se conserva mientras lo esté su original.
+
+    Args:
+        gracia_segundos (int): Antigüedad mínima (mtime) para tocar un archivo
+        cuarentena (str | None): Carpeta a la que mover los huérfanos en lugar de borrarlos
+        simular (bool): Solo informa, no modifica nada
+
+    Returns:
+        dict: {'revisados', 'huerfanos', 'en_gracia', 'bytes'}
+    """
+    from app import db
+    from app.models.imagen import ProcesamientoImagen
+    from app.utils.images import PREFIJO_SUBIDAS
+
+    carpeta = current_app.config['UPLOAD_FOLDER']
+    with db.engine.connect() as conexion:
+        referenciadas = urls_referenciadas(conexion)
+    bases = {os.path.splitext(url)[0] for url in referenciadas}
+    limite = time.time() - gracia_segundos
+
+    resumen = {'revisados': 0, 'huerfanos': 0, 'en_gracia': 0, 'bytes': 0}
+    borradas = []
+    for entrada in _recorrer_subidas(carpeta):
+        if entrada.name.startswith('.') and not entrada.name.startswith(PREFIJO_TEMPORAL):
+            continue  # .gitkeep y similares
+        resumen['revisados'] += 1
+        relativa = os.path.relpath(entrada.path, carpeta).replace(os.sep, '/')
+        url = PREFIJO_SUBIDAS + relativa
+        if _esta_referenciada(url, referenciadas, bases):
+            continue
+        estado = entrada.stat(follow_symlinks=False)
+        if estado.st_mtime > limite:
+            resumen['en_gracia'] += 1
+            continue
+        resumen['huerfanos'] += 1
+        resumen['bytes'] += estado.st_size
+        if simular:
+            continue
+        if cuarentena:
+            destino = os.path.join(cuarentena, *relativa.split('/'))
+            os.makedirs(os.path.dirname(destino), exist_ok=True)
+            shutil.move(entrada.path, destino)
+        else:
+            os.remove(entrada.path)
+        borradas.append(url)
+
+    if borradas:
+        tabla = ProcesamientoImagen.__table__
+        with db.engine.begin() as conexion:
+            conexion.execute(tabla.delete().where(tabla.c.ruta.in_(borradas)))
+    accion = 'movidos a cuarentena' if cuarentena else 'eliminados'
+    logger.info(f"Recolector de subidas: {resumen['huerfanos']} huérfanos "
+                f"{'encontrados' if simular else accion} ({resumen['bytes']} bytes) "
+                f"de {resumen['revisados']} archivos")
+    return resumen
+
+
+def _referencias_soltadas(objeto, borrado):
+    """URLs de imagen que `objeto` dejó de referenciar en este flush."""
+    atributo = _ATRIBUTOS.get(type(objeto).__name__)
+    if atributo is None:
+        return []
+    if borrado:
+        return [getattr(objeto, atributo)]
+    estado = inspect(objeto)
+    soltadas = list(estado.attrs[atributo].history.deleted)
+    if type(objeto).__name__ == 'ServicioImagen' and False in estado.attrs.activa.history.added:
+        soltadas.append(objeto.ruta_imagen)
+    return soltadas
+
+
+def _despues_de_flush(session, contexto):
+    candidatas = session.info.setdefault('subidas_soltadas', set())
+    for objeto in session.dirty:
+        candidatas.update(u for u in _referencias_soltadas(objeto, False) if u)
+    for objeto in session.deleted:
+        candidatas.update(u for u in _referencias_soltadas(objeto, True) if u)
+
+
+def _despues_de_commit(session):
+    candidatas = session.info.pop('subidas_soltadas', None)
+    if not candidatas:
+        return
+    engine = session.get_bind()
+    for url in candidatas:
+        try:
+            liberar_si_huerfana(engine, url)
+        except Exception as e:
+            logger.warning(f"No se pudo liberar la subida {url}: {e}")
+
+
+def _despues_de_rollback(session):
+    session.info.pop('subidas_soltadas', None)
+
+
+event.listen(Session, 'after_flush', _despues_de_flush)
+event.listen(Session, 'after_commit', _despues_de_commit)
+event.listen(Session, 'after_rollback', _despues_de_rollback)
@@ -0,0 +1,330 @@
+"""
+Benchmark de reservas concurrentes.
+
+Siembra una base de datos (SQLite temporal o la indicada con --database-url) con
+barberos, servicios y horarios realistas y lanza varios hilos que hacen el mismo
+recorrido que un cliente en la web: consultan `/api/disponibilidad`, eligen un
+horario libre y lo reservan con `/api/agendar-cita`. Como los hilos compiten por
+los mismos horarios, parte de las reservas termina en 409.
+
+Reporta throughput, latencias p50/p95/p99 por endpoint, tasa de 409, errores y
+consultas SQL por petición, y guarda el resultado en JSON para comparar
+versiones:
+
+    python benchmarks/booking_benchmark.py --hilos 16 --iteraciones 50
+    python benchmarks/booking_benchmark.py --wsgi --comparar benchmarks/results/anterior.json
+
+Con --wsgi las peticiones pasan por un servidor HTTP local (Werkzeug con hilos)
+en lugar del cliente de pruebas de Flask.
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+# `ProductionConfig` exige estas variables al importar app.config; el benchmark usa su propia URL
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+os.environ.setdefault('SECRET_KEY', 'benchmark')
+
+from sqlalchemy import event  # noqa: E402
+
+from app import create_app, db  # noqa: E402
+from app.config import Config, config_dict  # noqa: E402
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+
+def crear_config(database_url):
+    """Config de benchmark: como producción pero sin CSRF, planificador ni rate limiting."""
+    class BenchmarkConfig(Config):
+        TESTING = True
+        WTF_CSRF_ENABLED = False
+        SCHEDULER_ENABLED = False
+        RATELIMIT_ENABLED = False
+        SQLALCHEMY_DATABASE_URI = database_url
+        if database_url.startswith('sqlite'):
+            SQLALCHEMY_ENGINE_OPTIONS = {'connect_args': {'check_same_thread': False, 'timeout': 30}}
+    return BenchmarkConfig
+
+
+def sembrar_datos(num_barberos, num_servicios):
+    """Crea barberos con la disponibilidad predeterminada (L-S, mañana y tarde) y servicios."""
+    from app.models.barbero import Barbero, crear_disponibilidad_predeterminada
+    from app.models.servicio import Servicio
+
+    barberos = []
+    for i in range(num_barberos):
+        barbero = Barbero(nombre=f'Barbero {i + 1}', especialidad='Corte', activo=True)
+        db.session.add(barbero)
+        barberos.append(barbero)
+    duraciones = ['30 min', '45 min', '1 hora']
+    servicios = []
+    for i in range(num_servicios):
+        servicio = Servicio(nombre=f'Servicio {i + 1}', precio=20000 + 5000 * i,
+                            duracion_estimada=duraciones[i % len(duraciones)], activo=True)
+        db.session.add(servicio)
+        servicios.append(servicio)
+    db.session.commit()
+    for barbero in barberos:
+        crear_disponibilidad_predeterminada(barbero.id)
+    return [b.id for b in barberos], [s.id for s in servicios]
+
+
+def proximos_dias_habiles(cantidad):
+    """Fechas futuras de lunes a sábado (los días con disponibilidad sembrada)."""
+    dias, actual = [], date.today() + timedelta(days=1)
+    while len(dias) < cantidad:
+        if actual.weekday() < 6:
+            dias.append(actual.isoformat())
+        actual += timedelta(days=1)
+    return dias
+
+
+class ContadorConsultas:
+    """Cuenta las sentencias SQL ejecutadas por el engine de la app."""
+
+    def __init__(self, engine):
+        self.total = 0
+        self._lock = threading.Lock()
+        event.listen(engine, 'before_cursor_execute', self._contar)
+
+    def _contar(self, *args, **kwargs):
+        with self._lock:
+            self.total += 1
+
+
+class ClienteHTTP:
+    """Interfaz común para el cliente de pruebas de Flask y un servidor WSGI local."""
+
+    def __init__(self, app, wsgi):
+        self.app = app
+        self.servidor = None
+        self._locales = threading.local()
+        if wsgi:
+            import requests
+            from werkzeug.serving import make_server
+            self.servidor = make_server('127.0.0.1', 0, app, threaded=True)
+            threading.Thread(target=self.servidor.serve_forever, daemon=True).start()
+            self.base = f'http://127.0.0.1:{self.servidor.server_port}'
+            self._requests = requests
+
+    def _sesion(self):
+        # Un cliente por hilo: ni el test client ni requests.Session son thread-safe
+        if not hasattr(self._locales, 'sesion'):
+            self._locales.sesion = (self.app.test_client() if self.servidor is None
+                                    else self._requests.Session())
+        return self._locales.sesion
+
+    def get(self, ruta, params):
+        if self.servidor is None:
+            resp = self._sesion().get(ruta, query_string=params)
+            return resp.status_code, resp.get_json(silent=True)
+        resp = self._sesion().get(self.base + ruta, params=params)
+        return resp.status_code, resp.json() if resp.content else None
+
+    def post_json(self, ruta, datos):
+        if self.servidor is None:
+            resp = self._sesion().post(ruta, json=datos)
+            return resp.status_code, resp.get_json(silent=True)
+        resp = self._sesion().post(self.base + ruta, json=datos)
+        return resp.status_code, resp.json() if resp.content else None
+
+    def cerrar(self):
+        if self.servidor is not None:
+            self.servidor.shutdown()
+
+
+def percentil(valores, p):
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    indice = min(len(ordenados) - 1, max(0, int(round(p / 100 * len(ordenados) + 0.5)) - 1))
+    return round(ordenados[indice], 2)
+
+
+def trabajador(cliente, barberos, servicios, fechas, iteraciones, semilla, resultados, lock):
+    """Recorrido de un cliente: consultar disponibilidad y reservar un horario al azar."""
+    rnd = random.Random(semilla)
+    locales = defaultdict(list)
+    estados = defaultdict(lambda: defaultdict(int))
+    for i in range(iteraciones):
+        barbero_id, servicio_id, fecha = rnd.choice(barberos), rnd.choice(servicios), rnd.choice(fechas)
+
+        inicio = time.perf_counter()
+        status, datos = cliente.get(f'/api/disponibilidad/{barbero_id}/{fecha}', {'servicio_id': servicio_id})
+        locales['disponibilidad'].append((time.perf_counter() - inicio) * 1000)
+        estados['disponibilidad'][status] += 1
+        horarios = (datos or {}).get('horarios') or []
+        if status != 200 or not horarios:
+            continue
+
+        # Los primeros horarios del día concentran la demanda, como en producción
+        hora = rnd.choice(horarios[:max(1, len(horarios) // 3)])
+        inicio = time.perf_counter()
+        status, _ = cliente.post_json('/api/agendar-cita', {
+            'barbero_id': barbero_id, 'servicio_id': servicio_id, 'fecha': fecha, 'hora': hora,
+            'nombre': f'Cliente {semilla}-{i}', 'email': f'cliente{semilla}-{i}@benchmark.test',
+            'telefono': f'300{semilla:03d}{i:04d}',
+        })
+        locales['agendar_cita'].append((time.perf_counter() - inicio) * 1000)
+        estados['agendar_cita'][status] += 1
+
+    with lock:
+        for endpoint, latencias in locales.items():
+            resultados['latencias'][endpoint].extend(latencias)
+        for endpoint, por_estado in estados.items():
+            for status, cantidad in por_estado.items():
+                resultados['estados'][endpoint][status] += cantidad
+
+
+def version_actual():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
+
+
+def ejecutar(args):
+    tmpdir = None
+    database_url = args.database_url
+    if not database_url:
+        tmpdir = tempfile.mkdtemp(prefix='bb-benchmark-')
+        database_url = 'sqlite:///' + os.path.join(tmpdir, 'benchmark.db')
+
+    config_dict['benchmark'] = crear_config(database_url)
+    app = create_app('benchmark')
+    logging.getLogger().setLevel(logging.WARNING)
+    app.logger.setLevel(logging.WARNING)
+
+    with app.app_context():
+        if args.database_url and not args.reusar_datos:
+            db.drop_all()
+        db.create_all()
+        barberos, servicios = sembrar_datos(args.barberos, args.servicios)
+        contador = ContadorConsultas(db.engine)
+        fechas = proximos_dias_habiles(args.dias)
+
+    cliente = ClienteHTTP(app, args.wsgi)
+    resultados = {'latencias': defaultdict(list), 'estados': defaultdict(lambda: defaultdict(int))}
+    lock = threading.Lock()
+    hilos = [
+        threading.Thread(target=trabajador,
+                         args=(cliente, barberos, servicios, fechas, args.iteraciones, n, resultados, lock))
+        for n in range(args.hilos)
+    ]
+    consultas_inicio = contador.total
+    inicio = time.perf_counter()
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    duracion = time.perf_counter() - inicio
+    consultas = contador.total - consultas_inicio
+    cliente.cerrar()
+    if tmpdir:
+        with app.app_context():
+            db.engine.dispose()
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+    endpoints = {}
+    total_peticiones = 0
+    for endpoint, latencias in resultados['latencias'].items():
+        estados = {str(k): v for k, v in sorted(resultados['estados'][endpoint].items())}
+        total = len(latencias)
+        total_peticiones += total
+        endpoints[endpoint] = {
+            'peticiones': total,
+            'throughput_rps': round(total / duracion, 2),
+            'p50_ms': percentil(latencias, 50),
+            'p95_ms': percentil(latencias, 95),
+            'p99_ms': percentil(latencias, 99),
+            'estados': estados,
+            'tasa_409': round(resultados['estados'][endpoint].get(409, 0) / total, 4) if total else 0,
+            'tasa_error': round(sum(v for k, v in resultados['estados'][endpoint].items() if k >= 500) / total, 4)
+            if total else 0,
+        }
+
+    reservas = resultados['estados']['agendar_cita'].get(200, 0)
+    informe = {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'version': version_actual(),
+        'parametros': {
+            'hilos': args.hilos, 'iteraciones': args.iteraciones, 'barberos': args.barberos,
+            'servicios': args.servicios, 'dias': args.dias,
+            'modo': 'wsgi' if args.wsgi else 'test_client',
+            'base_de_datos': database_url.split('://')[0],
+        },
+        'duracion_s': round(duracion, 3),
+        'peticiones': total_peticiones,
+        'throughput_rps': round(total_peticiones / duracion, 2),
+        'reservas_por_segundo': round(reservas / duracion, 2),
+        'consultas_por_peticion': round(consultas / total_peticiones, 2) if total_peticiones else None,
+        'endpoints': endpoints,
+    }
+    return informe
+
+
+def imprimir(informe, anterior=None):
+    print(f"\nVersión {informe['version']} - {informe['parametros']}")
+    print(f"Duración {informe['duracion_s']} s, {informe['peticiones']} peticiones, "
+          f"{informe['throughput_rps']} req/s, {informe['reservas_por_segundo']} reservas/s, "
+          f"{informe['consultas_por_peticion']} consultas/petición")
+    for endpoint, datos in informe['endpoints'].items():
+        linea = (f"  {endpoint:<15} {datos['peticiones']:>6} req  p50 {datos['p50_ms']} ms  "
+                 f"p95 {datos['p95_ms']} ms  p99 {datos['p99_ms']} ms  409 {datos['tasa_409']:.1%}  "
+                 f"errores {datos['tasa_error']:.1%}")
+        previo = (anterior or {}).get('endpoints', {}).get(endpoint)
+        if previo and previo.get('p95_ms') and datos['p95_ms']:
+            linea += f"  (p95 {(datos['p95_ms'] / previo['p95_ms'] - 1):+.0%} vs {anterior.get('version')})"
+        print(linea)
+    if anterior and anterior.get('consultas_por_peticion') and informe['consultas_por_peticion']:
+        print(f"  consultas/petición antes: {anterior['consultas_por_peticion']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de reservas concurrentes')
+    parser.add_argument('--hilos', type=int, default=8)
+    parser.add_argument('--iteraciones', type=int, default=25, help='Recorridos por hilo')
+    parser.add_argument('--barberos', type=int, default=4)
+    parser.add_argument('--servicios', type=int, default=3)
+    parser.add_argument('--dias', type=int, default=3, help='Días hábiles sobre los que se reparte la demanda')
+    parser.add_argument('--database-url', help='Postgres local u otra URL (por defecto, SQLite temporal). '
+                                               '¡Se borran las tablas!')
+    parser.add_argument('--reusar-datos', action='store_true', help='No borrar las tablas de --database-url')
+    parser.add_argument('--wsgi', action='store_true', help='Usar un servidor HTTP local en vez del test client')
+    parser.add_argument('--salida', help='Ruta del JSON (por defecto benchmarks/results/<fecha>-<version>.json)')
+    parser.add_argument('--comparar', help='JSON de una ejecución anterior para comparar')
+    args = parser.parse_args()
+
+    informe = ejecutar(args)
+
+    anterior = None
+    if args.comparar:
+        with open(args.comparar) as f:
+            anterior = json.load(f)
+    imprimir(informe, anterior)
+
+    salida = args.salida
+    if not salida:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        nombre = datetime.now().strftime('%Y%m%d-%H%M%S') + f"-{informe['version'] or 'local'}.json"
+        salida = os.path.join(RESULTS_DIR, nombre)
+    with open(salida, 'w') as f:
+        json.dump(informe, f, indent=2)
+    print(f"\nResultados guardados en {salida}")
+
+
+if __name__ == '__main__':
+    main()
@@ -79,6 +79,8 @@ Group=ubuntu
 WorkingDirectory=/opt/barber-brothers
 Environment=PATH=/opt/barber-brothers/venv/bin
 Environment=FLASK_ENV=production
+# nginx delante de gunicorn: la IP real es la última de X-Forwarded-For (rate limiting)
+Environment=RATELIMIT_PROXY_COUNT=1
 ExecStart=/opt/barber-brothers/venv/bin/gunicorn --config gunicorn.conf.py wsgi:app
 ExecReload=/bin/kill -s HUP \$MAINPID
 Restart=always
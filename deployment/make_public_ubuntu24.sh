@@ -158,6 +158,8 @@ Group=ubuntu
 WorkingDirectory=/opt/barber-brothers
 Environment=PATH=/opt/barber-brothers/venv/bin
 Environment=FLASK_ENV=production
+# nginx delante de gunicorn: la IP real es la última de X-Forwarded-For (rate limiting)
+Environment=RATELIMIT_PROXY_COUNT=1
 Environment=PYTHONPATH=/opt/barber-brothers
 ExecStart=/opt/barber-brothers/venv/bin/gunicorn --config gunicorn.conf.py wsgi:app
 ExecReload=/bin/kill -s HUP \$MAINPID
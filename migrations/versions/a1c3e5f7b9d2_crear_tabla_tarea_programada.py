@@ -0,0 +1,35 @@
+"""Crear tabla tarea_programada
+
+Revision ID: a1c3e5f7b9d2
+Revises: dc20d04d2287
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a1c3e5f7b9d2'
+down_revision = 'dc20d04d2287'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('tarea_programada',
+    sa.Column('nombre', sa.String(length=80), nullable=False),
+    sa.Column('lease_owner', sa.String(length=120), nullable=True),
+    sa.Column('lease_expira', sa.DateTime(), nullable=True),
+    sa.Column('proxima_ejecucion', sa.DateTime(), nullable=True),
+    sa.Column('ultima_ejecucion', sa.DateTime(), nullable=True),
+    sa.Column('ultima_duracion_ms', sa.Integer(), nullable=True),
+    sa.Column('ultimo_resultado', sa.Text(), nullable=True),
+    sa.Column('ultimo_error', sa.Text(), nullable=True),
+    sa.Column('ejecuciones', sa.Integer(), nullable=False, server_default='0'),
+    sa.PrimaryKeyConstraint('nombre')
+    )
+
+
+def downgrade():
+    op.drop_table('tarea_programada')
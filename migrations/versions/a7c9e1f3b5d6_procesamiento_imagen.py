@@ -0,0 +1,39 @@
+"""Tabla procesamiento_imagen (estado del procesamiento de imágenes subidas)
+
+Revision ID: a7c9e1f3b5d6
+Revises: f6b8d0e2a4c5
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7c9e1f3b5d6'
+down_revision = 'f6b8d0e2a4c5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('procesamiento_imagen',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('ruta', sa.String(length=255), nullable=False),
+        sa.Column('estado', sa.String(length=20), nullable=False),
+        sa.Column('derivados', sa.Integer(), nullable=False),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('creado', sa.DateTime(), nullable=True),
+        sa.Column('actualizado', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('procesamiento_imagen', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_procesamiento_imagen_ruta'), ['ruta'], unique=True)
+        batch_op.create_index(batch_op.f('ix_procesamiento_imagen_estado'), ['estado'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('procesamiento_imagen', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_procesamiento_imagen_estado'))
+        batch_op.drop_index(batch_op.f('ix_procesamiento_imagen_ruta'))
+    op.drop_table('procesamiento_imagen')
@@ -0,0 +1,30 @@
+"""Recordatorios de cita
+
+Revision ID: b2d4f6a8c0e1
+Revises: a1c3e5f7b9d2
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b2d4f6a8c0e1'
+down_revision = 'a1c3e5f7b9d2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('cita', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('recordatorio_24h_enviado', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('recordatorio_2h_enviado', sa.DateTime(), nullable=True))
+        batch_op.create_index('ix_cita_estado_fecha', ['estado', 'fecha'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('cita', schema=None) as batch_op:
+        batch_op.drop_index('ix_cita_estado_fecha')
+        batch_op.drop_column('recordatorio_2h_enviado')
+        batch_op.drop_column('recordatorio_24h_enviado')
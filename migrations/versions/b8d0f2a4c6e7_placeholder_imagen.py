@@ -0,0 +1,26 @@
+"""Columna procesamiento_imagen.placeholder (LQIP de cada imagen subida)
+
+Revision ID: b8d0f2a4c6e7
+Revises: a7c9e1f3b5d6
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8d0f2a4c6e7'
+down_revision = 'a7c9e1f3b5d6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('procesamiento_imagen', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('placeholder', sa.Text(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('procesamiento_imagen', schema=None) as batch_op:
+        batch_op.drop_column('placeholder')
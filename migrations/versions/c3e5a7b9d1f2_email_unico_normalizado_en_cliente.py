@@ -0,0 +1,48 @@
+"""Email único y normalizado en cliente
+
+Revision ID: c3e5a7b9d1f2
+Revises: b2d4f6a8c0e1
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3e5a7b9d1f2'
+down_revision = 'b2d4f6a8c0e1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    conexion = op.get_bind()
+
+    # 1. Los duplicados no se fusionan aquí: hacerlo dentro de la transacción de la
+    #    migración bloquearía cliente, cita y mensaje durante toda la operación. Se
+    #    fusionan antes, en línea y por lotes, con `flask mantenimiento fusionar-clientes`.
+    duplicados = conexion.execute(sa.text(
+        "SELECT count(*) FROM (SELECT lower(trim(email)) FROM cliente "
+        "GROUP BY lower(trim(email)) HAVING count(*) > 1) AS repetidos"
+    )).scalar()
+    if duplicados:
+        raise RuntimeError(
+            f"Hay {duplicados} emails con varios clientes. Ejecuta 'flask mantenimiento fusionar-clientes' "
+            f"(primero con --simular) y vuelve a aplicar la migración."
+        )
+
+    # 2. Normalizar los emails existentes (misma regla que Cliente.normalizar_email); sin duplicados
+    #    solo se reescriben las filas que cambian
+    op.execute("UPDATE cliente SET email = lower(trim(email)) WHERE email <> lower(trim(email))")
+
+    # 3. Índice único sobre el email normalizado
+    with op.batch_alter_table('cliente', schema=None) as batch_op:
+        batch_op.drop_index('ix_cliente_email')
+        batch_op.create_index('ix_cliente_email', ['email'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('cliente', schema=None) as batch_op:
+        batch_op.drop_index('ix_cliente_email')
+        batch_op.create_index('ix_cliente_email', ['email'], unique=False)
@@ -0,0 +1,51 @@
+"""Duración en minutos como columna entera en servicio
+
+Revision ID: d4f6b8c0e2a3
+Revises: c3e5a7b9d1f2
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4f6b8c0e2a3'
+down_revision = 'c3e5a7b9d1f2'
+branch_labels = None
+depends_on = None
+
+
+def _parsear_duracion(texto):
+    # Copia de app.models.servicio.parsear_duracion (las migraciones no importan la app)
+    if not texto:
+        return None
+    texto = str(texto).lower()
+    numeros = re.findall(r'\d+', texto)
+    if not numeros:
+        return None
+    numero = int(numeros[0])
+    if 'hora' in texto or 'hour' in texto or 'hr' in texto:
+        return numero * 60
+    return numero
+
+
+def upgrade():
+    with op.batch_alter_table('servicio', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('duracion_minutos', sa.Integer(), nullable=False, server_default='30'))
+
+    # Rellenar a partir del texto libre existente
+    conexion = op.get_bind()
+    servicio = sa.table('servicio', sa.column('id', sa.Integer), sa.column('duracion_estimada', sa.String),
+                        sa.column('duracion_minutos', sa.Integer))
+    for servicio_id, texto in conexion.execute(sa.select(servicio.c.id, servicio.c.duracion_estimada)).fetchall():
+        minutos = _parsear_duracion(texto)
+        if minutos and minutos != 30:
+            conexion.execute(servicio.update().where(servicio.c.id == servicio_id).values(duracion_minutos=minutos))
+
+
+def downgrade():
+    with op.batch_alter_table('servicio', schema=None) as batch_op:
+        batch_op.drop_column('duracion_minutos')
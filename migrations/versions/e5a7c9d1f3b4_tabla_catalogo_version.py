@@ -0,0 +1,30 @@
+"""Tabla catalogo_version para invalidar la caché de catálogo entre workers
+
+Revision ID: e5a7c9d1f3b4
+Revises: d4f6b8c0e2a3
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5a7c9d1f3b4'
+down_revision = 'd4f6b8c0e2a3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    tabla = op.create_table('catalogo_version',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.Column('actualizado', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.bulk_insert(tabla, [{'id': 1, 'version': 0}])
+
+
+def downgrade():
+    op.drop_table('catalogo_version')
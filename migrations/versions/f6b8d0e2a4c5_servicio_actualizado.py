@@ -0,0 +1,30 @@
+"""Columna actualizado en servicio (lastmod del sitemap)
+
+Revision ID: f6b8d0e2a4c5
+Revises: e5a7c9d1f3b4
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f6b8d0e2a4c5'
+down_revision = 'e5a7c9d1f3b4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('servicio', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('actualizado', sa.DateTime(), nullable=True))
+
+    # Sin historial de cambios: se parte de la fecha de creación
+    servicio = sa.table('servicio', sa.column('creado', sa.DateTime), sa.column('actualizado', sa.DateTime))
+    op.execute(servicio.update().values(actualizado=servicio.c.creado))
+
+
+def downgrade():
+    with op.batch_alter_table('servicio', schema=None) as batch_op:
+        batch_op.drop_column('actualizado')
@@ -7,3 +7,21 @@ def test_eliminar_barbero(client, admin_user, barbero):
     resp = client.post(f'/admin/barberos/eliminar/{barbero.id}', follow_redirects=True)
     assert resp.status_code == 200
     assert Barbero.query.get(barbero.id) is None
+
+
+def test_cubre_horario_rechaza_bloqueo_dentro_del_intervalo(app, barbero):
+    from datetime import date, datetime, time
+    from app import db
+    from app.models.barbero import BloqueoHorario, DisponibilidadBarbero
+
+    lunes = date(2026, 9, 7)
+    db.session.add(DisponibilidadBarbero(barbero_id=barbero.id, dia_semana=0,
+                                         hora_inicio=time(9, 0), hora_fin=time(18, 0)))
+    db.session.add(BloqueoHorario(barbero_id=barbero.id, fecha=lunes,
+                                  hora_inicio=time(10, 30), hora_fin=time(11, 0)))
+    db.session.commit()
+
+    # El bloqueo empieza a mitad de la cita: no contiene el inicio pero se solapa
+    assert not barbero.cubre_horario(datetime.combine(lunes, time(10, 0)), 60)
+    assert barbero.cubre_horario(datetime.combine(lunes, time(9, 30)), 60)
+    assert barbero.cubre_horario(datetime.combine(lunes, time(11, 0)), 30)
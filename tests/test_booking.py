@@ -1,3 +1,4 @@
+from app import db
 from app.models.cliente import Cita
 
 
@@ -61,3 +62,182 @@ def test_confirmar_cita_con_token_valido(app, client, barbero, servicio):
 def test_confirmar_cita_con_token_invalido_no_falla(client):
     resp = client.get('/confirmar-cita/token-invalido-o-vencido')
     assert resp.status_code == 200
+
+
+def test_limpiar_citas_expiradas_marca_estado_y_mantiene_horario(app, client, barbero, servicio):
+    from datetime import datetime, timedelta
+    from app import db
+
+    resp = client.post('/api/agendar-cita', json=_payload(barbero, servicio, email='vencida@test.com'))
+    cita_id = resp.get_json()['cita_id']
+
+    cita = Cita.query.get(cita_id)
+    cita.creado = datetime.utcnow() - timedelta(hours=2)
+    db.session.commit()
+
+    assert Cita.limpiar_citas_expiradas() == 1
+    assert Cita.query.get(cita_id).estado == 'expirada'
+    # Segunda pasada: nada nuevo que expirar
+    assert Cita.limpiar_citas_expiradas() == 0
+
+    # El horario de una cita expirada sigue cerrado para nuevas reservas
+    otra = client.post('/api/agendar-cita', json=_payload(barbero, servicio, email='otra@test.com'))
+    assert otra.status_code == 409
+
+
+def test_confirmar_cita_expirada_con_token_vigente(app, client, barbero, servicio):
+    from app import db
+
+    resp = client.post('/api/agendar-cita', json=_payload(barbero, servicio))
+    cita = Cita.query.get(resp.get_json()['cita_id'])
+    cita.estado = 'expirada'
+    db.session.commit()
+    token = cita.generate_confirmation_token()
+
+    assert client.get(f'/confirmar-cita/{token}').status_code == 200
+    assert Cita.query.get(cita.id).estado == 'confirmada'
+
+
+def _proximo_dia_habil(dias=7):
+    from datetime import date, timedelta
+    dia = date.today() + timedelta(days=dias)
+    while dia.weekday() > 5:
+        dia += timedelta(days=1)
+    return dia.isoformat()
+
+
+def test_reprogramar_cita_con_enlace_firmado(app, client, barbero, servicio):
+    from app.models.barbero import crear_disponibilidad_predeterminada
+
+    crear_disponibilidad_predeterminada(barbero.id)
+    fecha = _proximo_dia_habil()
+    primera = client.post('/api/agendar-cita', json=_payload(barbero, servicio, fecha=fecha, hora='09:00'))
+    otra = client.post('/api/agendar-cita', json=_payload(barbero, servicio, fecha=fecha, hora='10:00',
+                                                          email='otra@test.com'))
+    cita = Cita.query.get(primera.get_json()['cita_id'])
+    token = cita.generate_manage_token()
+
+    assert client.get(f'/cita/gestionar/{token}').status_code == 200
+
+    # El horario de la otra cita está ocupado: no se mueve
+    client.post(f'/cita/gestionar/{token}/reprogramar', data={'fecha': fecha, 'hora': '10:00'})
+    assert Cita.query.get(cita.id).fecha.strftime('%H:%M') == '09:00'
+
+    client.post(f'/cita/gestionar/{token}/reprogramar', data={'fecha': fecha, 'hora': '11:00'})
+    assert Cita.query.get(cita.id).fecha.strftime('%H:%M') == '11:00'
+
+    # El horario anterior quedó libre
+    nueva = client.post('/api/agendar-cita', json=_payload(barbero, servicio, fecha=fecha, hora='09:00',
+                                                           email='nueva@test.com'))
+    assert nueva.status_code == 200
+    assert otra.status_code == 200
+
+
+def test_disponibilidad_al_reprogramar_excluye_la_propia_cita(app, client, barbero, servicio):
+    from app.models.barbero import crear_disponibilidad_predeterminada
+
+    crear_disponibilidad_predeterminada(barbero.id)
+    fecha = _proximo_dia_habil()
+    resp = client.post('/api/agendar-cita', json=_payload(barbero, servicio, fecha=fecha, hora='09:00'))
+    cita = Cita.query.get(resp.get_json()['cita_id'])
+    token = cita.generate_manage_token()
+    url = f'/api/disponibilidad/{barbero.id}/{fecha}?servicio_id={servicio.id}'
+
+    # 15 minutos más tarde se solapa con la propia cita: solo se ofrece desde su enlace de gestión
+    assert '09:15' not in client.get(url).get_json()['horarios']
+    assert '09:15' not in client.get(url + '&gestion=token-falso').get_json()['horarios']
+    assert '09:15' in client.get(f'{url}&gestion={token}').get_json()['horarios']
+    assert f'gestion={token}' in client.get(f'/cita/gestionar/{token}').get_data(as_text=True)
+
+    client.post(f'/cita/gestionar/{token}/reprogramar', data={'fecha': fecha, 'hora': '09:15'})
+    assert Cita.query.get(cita.id).fecha.strftime('%H:%M') == '09:15'
+
+
+def test_cancelar_cita_con_enlace_firmado(client, barbero, servicio):
+    resp = client.post('/api/agendar-cita', json=_payload(barbero, servicio, fecha=_proximo_dia_habil()))
+    cita = Cita.query.get(resp.get_json()['cita_id'])
+
+    assert client.post('/cita/gestionar/token-invalido/cancelar').status_code == 200
+    assert Cita.query.get(cita.id).estado == 'pendiente_confirmacion'
+
+    client.post(f'/cita/gestionar/{cita.generate_manage_token()}/cancelar')
+    assert Cita.query.get(cita.id).estado == 'cancelada'
+
+
+def test_reservas_con_el_mismo_email_reutilizan_el_cliente(client, barbero, servicio):
+    from app.models.cliente import Cliente
+
+    client.post('/api/agendar-cita', json=_payload(barbero, servicio, hora='10:00', email='Repetido@Test.com '))
+    client.post('/api/agendar-cita', json=dict(_payload(barbero, servicio, hora='11:00', email='repetido@test.com'),
+                                               nombre='Nombre Nuevo'))
+
+    clientes = Cliente.query.filter_by(email='repetido@test.com').all()
+    assert len(clientes) == 1
+    assert clientes[0].nombre == 'Nombre Nuevo'
+    assert clientes[0].telefono == '3000000000'
+    assert clientes[0].citas.count() == 2
+    assert Cliente.upsert('Otro', ' REPETIDO@test.com', '') == clientes[0].id
+
+
+def test_duracion_del_servicio_en_minutos(app, client, admin_user, servicio):
+    from app.models.servicio import Servicio
+    from tests.conftest import login_as
+
+    assert servicio.duracion_minutos == 30
+    assert Servicio(nombre='Barba', precio=1, duracion_estimada='1 hora').get_duracion_minutos() == 60
+
+    login_as(client, admin_user)
+    datos = {'nombre': 'Corte de Prueba', 'precio': '20000', 'orden': '1', 'activo': 'y'}
+    resp = client.post(f'/admin/servicios/editar/{servicio.id}', data=dict(datos, duracion_estimada='un rato'))
+    assert 'indícala en minutos' in resp.get_data(as_text=True)
+    client.post(f'/admin/servicios/editar/{servicio.id}', data=dict(datos, duracion_estimada='1 hora y media',
+                                                                     duracion_minutos='90'))
+    db.session.expire_all()
+    assert db.session.get(Servicio, servicio.id).get_duracion_minutos() == 90
+
+    # Formulario precargado: cambiar solo el texto vuelve a derivar los minutos
+    client.post(f'/admin/servicios/editar/{servicio.id}', data=dict(datos, duracion_estimada='45 min',
+                                                                     duracion_minutos='90'))
+    db.session.expire_all()
+    assert db.session.get(Servicio, servicio.id).get_duracion_minutos() == 45
+    # Los minutos derivados también respetan el rango 5-480
+    resp = client.post(f'/admin/servicios/editar/{servicio.id}', data=dict(datos, duracion_estimada='10 horas',
+                                                                            duracion_minutos='45'))
+    assert 'entre 5 y 480 minutos' in resp.get_data(as_text=True)
+    db.session.expire_all()
+    assert db.session.get(Servicio, servicio.id).get_duracion_minutos() == 45
+
+
+def test_migracion_email_unico_exige_fusionar_duplicados_antes(app):
+    import importlib.util
+    import os
+
+    import pytest
+    from alembic.migration import MigrationContext
+    from alembic.operations import Operations
+    from app.models.cliente import Cliente
+    from app.models.tareas import fusionar_clientes_duplicados
+
+    ruta = os.path.join(os.path.dirname(__file__), os.pardir, 'migrations', 'versions',
+                        'c3e5a7b9d1f2_email_unico_normalizado_en_cliente.py')
+    spec = importlib.util.spec_from_file_location('migracion_email_unico', ruta)
+    migracion = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migracion)
+
+    def aplicar():
+        with db.engine.begin() as conexion:
+            with Operations.context(MigrationContext.configure(conexion)):
+                migracion.upgrade()
+
+    # Datos anteriores a la normalización: dos filas para el mismo email
+    db.session.add(Cliente(nombre='Ana', email='ana@test.com'))
+    db.session.execute(Cliente.__table__.insert().values(nombre='Ana M.', email=' ANA@test.com'))
+    db.session.commit()
+
+    with pytest.raises(RuntimeError, match='fusionar-clientes'):
+        aplicar()
+    assert Cliente.query.count() == 2  # La migración no toca nada
+
+    fusionar_clientes_duplicados()
+    aplicar()
+    assert [c.email for c in Cliente.query.all()] == ['ana@test.com']
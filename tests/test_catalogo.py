@@ -0,0 +1,180 @@
+from sqlalchemy import event
+
+from app import db
+from app.models.catalogo import CatalogoVersion, obtener_catalogo_publico
+from app.models.servicio import Servicio
+
+
+def _contar_consultas(app):
+    consultas = []
+    with app.app_context():
+        motor = db.engine
+    escuchar = lambda *args, **kwargs: consultas.append(1)
+    event.listen(motor, 'before_cursor_execute', escuchar)
+    return consultas, lambda: event.remove(motor, 'before_cursor_execute', escuchar)
+
+
+def test_paginas_publicas_sin_consultas_de_catalogo(app, client, barbero, servicio):
+    for ruta in ('/servicios', '/productos'):
+        assert client.get(ruta).status_code == 200
+    consultas, quitar = _contar_consultas(app)
+    try:
+        for ruta in ('/servicios', '/productos', '/sitemap.xml'):
+            resp = client.get(ruta)
+            assert resp.status_code == 200
+    finally:
+        quitar()
+    assert consultas == []
+    assert b'Corte de Prueba' in client.get('/servicios').data
+    assert b'Barbero de Prueba' in client.get('/').data
+
+
+def test_catalogo_se_invalida_con_cambios(app, servicio):
+    catalogo = obtener_catalogo_publico()
+    assert [s.nombre for s in catalogo.servicios] == ['Corte de Prueba']
+    assert obtener_catalogo_publico() is catalogo
+    version = db.session.get(CatalogoVersion, 1).version
+
+    servicio.nombre = 'Corte Clásico'
+    db.session.commit()
+    assert [s.nombre for s in obtener_catalogo_publico().servicios] == ['Corte Clásico']
+    # El cambio queda publicado para los demás workers
+    assert db.session.get(CatalogoVersion, 1).version == version + 1
+
+
+def test_cambio_de_otro_worker_se_detecta_por_la_tabla_de_version(app, servicio):
+    app.config['CATALOG_VERSION_POLL_SECONDS'] = 1e-9
+    catalogo = obtener_catalogo_publico()
+    assert obtener_catalogo_publico() is catalogo
+
+    # Otro proceso modifica el catálogo: aquí no se disparan los listeners
+    with db.engine.begin() as conexion:
+        conexion.execute(Servicio.__table__.update().values(nombre='Desde otro worker'))
+        conexion.execute(CatalogoVersion.__table__.update().values(version=CatalogoVersion.version + 1))
+    db.session.expire_all()  # Como en una petición nueva
+    assert [s.nombre for s in obtener_catalogo_publico().servicios] == ['Desde otro worker']
+
+
+def test_fragmentos_de_home_se_renderizan_una_vez_por_version(app, client, barbero, servicio):
+    from flask import template_rendered
+
+    renderizadas = []
+    registrar = lambda sender, template, context, **extra: renderizadas.append(template.name)
+    template_rendered.connect(registrar, app)
+    try:
+        assert b'Barbero de Prueba' in client.get('/').data
+        assert 'public/includes/home_equipo.html' in renderizadas
+        renderizadas.clear()
+        assert b'Barbero de Prueba' in client.get('/').data
+        assert renderizadas == ['public/Home.html']
+
+        barbero.nombre = 'Barbero Renombrado'
+        db.session.commit()
+        assert b'Barbero Renombrado' in client.get('/').data
+        assert 'public/includes/home_equipo.html' in renderizadas
+    finally:
+        template_rendered.disconnect(registrar, app)
+
+
+def test_listado_de_productos_en_una_consulta(app, client):
+    from app.models.catalogo import obtener_listado_productos
+    from app.models.categoria import Categoria
+    from app.models.producto import Producto
+
+    for nombre in ('Ceras', 'Aceites', 'Champús'):
+        categoria = Categoria(nombre=nombre)
+        db.session.add(categoria)
+        db.session.flush()
+        for producto in ('B', 'A'):
+            db.session.add(Producto(nombre=f'{producto} {nombre}', precio=10, cantidad=1,
+                                    categoria_id=categoria.id))
+    db.session.add(Producto(nombre='Sin categoría', precio=5))
+    db.session.commit()
+
+    consultas, quitar = _contar_consultas(app)
+    try:
+        listado = obtener_listado_productos()
+    finally:
+        quitar()
+    assert len(consultas) == 1
+    assert [g.categoria.nombre for g in listado.categorias_con_productos] == ['Aceites', 'Ceras', 'Champús']
+    assert [p.nombre for p in listado.categorias_con_productos[0].productos] == ['A Aceites', 'B Aceites']
+    assert len(listado.productos) == 7
+    assert obtener_listado_productos() is listado
+
+    datos = client.get('/api/productos').get_json()
+    assert [c['nombre'] for c in datos['categorias']] == ['Aceites', 'Ceras', 'Champús']
+    assert datos['categorias'][1]['productos'][0] == {
+        'id': listado.categorias_con_productos[1].productos[0].id, 'nombre': 'A Ceras',
+        'descripcion': None, 'precio': 10.0, 'imagen_url': None, 'placeholder': None,
+        'disponible': True,
+    }
+
+
+def test_galerias_de_servicios_en_una_consulta(app, client):
+    from app.models.catalogo import CatalogoPublico
+    from app.models.servicio_imagen import ServicioImagen
+
+    for n in range(5):
+        servicio = Servicio(nombre=f'Servicio {n}', precio=20000, duracion_estimada='30 min', orden=n)
+        db.session.add(servicio)
+        db.session.flush()
+        db.session.add_all([
+            ServicioImagen(servicio_id=servicio.id, ruta_imagen=f'/static/s{n}_b.jpg', orden=1),
+            ServicioImagen(servicio_id=servicio.id, ruta_imagen=f'/static/s{n}_a.jpg', orden=0),
+            ServicioImagen(servicio_id=servicio.id, ruta_imagen=f'/static/s{n}_x.jpg', orden=2, activa=False),
+        ])
+    db.session.commit()
+    db.session.expire_all()
+
+    with app.app_context():
+        motor = db.engine
+    sentencias = []
+    escuchar = lambda conn, cursor, sentencia, *args: sentencias.append(sentencia)
+    event.listen(motor, 'before_cursor_execute', escuchar)
+    try:
+        catalogo = CatalogoPublico.construir(0)
+    finally:
+        event.remove(motor, 'before_cursor_execute', escuchar)
+    assert len([s for s in sentencias if 'servicio_imagenes' in s]) == 1
+    assert [i.ruta_imagen for i in catalogo.servicios[0].get_imagenes_activas()] == \
+        ['/static/s0_a.jpg', '/static/s0_b.jpg']
+
+    servicio_id = catalogo.servicios[2].id
+    client.get(f'/api/servicio/{servicio_id}')
+    consultas, quitar = _contar_consultas(app)
+    try:
+        datos = client.get(f'/api/servicio/{servicio_id}').get_json()
+    finally:
+        quitar()
+    assert consultas == []
+    assert datos['imagen_url'] == '/static/s2_a.jpg'
+    assert datos['imagenes'] == ['/static/s2_a.jpg', '/static/s2_b.jpg']
+
+
+def test_sitemap_con_lastmod_real_etag_e_indice(app, client, servicio):
+    from datetime import datetime
+
+    servicio.actualizado = datetime(2026, 3, 4, 10, 0)
+    db.session.commit()
+
+    resp = client.get('/sitemap.xml')
+    assert resp.status_code == 200
+    assert b'<urlset' in resp.data
+    assert b'<lastmod>2026-03-04</lastmod>' in resp.data
+    assert b'/contacto</loc>\n    <changefreq>' in resp.data  # Sin datos detrás: sin lastmod
+    assert client.get('/sitemap.xml', headers={'If-None-Match': resp.headers['ETag']}).status_code == 304
+
+    indice = client.get('/sitemap-index.xml')
+    assert b'<sitemapindex' in indice.data and b'/sitemap.xml</loc>' in indice.data
+
+    # Con más URLs que el límite por archivo, /sitemap.xml pasa a ser un índice
+    app.config['SITEMAP_URLS_POR_ARCHIVO'] = 3
+    servicio.nombre = 'Corte renombrado'
+    db.session.commit()
+    resp = client.get('/sitemap.xml')
+    assert b'<sitemapindex' in resp.data
+    partes = resp.data.count(b'<sitemap>')
+    assert partes > 1 and b'/sitemap-2.xml</loc>' in resp.data
+    assert b'<urlset' in client.get('/sitemap-2.xml').data
+    assert client.get(f'/sitemap-{partes + 1}.xml').status_code == 404
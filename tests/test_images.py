@@ -0,0 +1,238 @@
+import io
+
+from PIL import Image
+from werkzeug.datastructures import FileStorage
+
+
+def _jpeg_con_exif(ancho, alto):
+    exif = Image.Exif()
+    exif[0x010F] = 'Camara de prueba'  # Make
+    buffer = io.BytesIO()
+    Image.new('RGB', (ancho, alto), (120, 80, 40)).save(buffer, 'JPEG', exif=exif)
+    buffer.seek(0)
+    return buffer
+
+
+def test_subida_genera_derivados_sin_exif(app, tmp_path):
+    from app.admin.utils import save_image
+    from app.models.barbero import Barbero
+
+    from app import db
+    from app.models.imagen import ProcesamientoImagen
+
+    app.config['UPLOAD_FOLDER'] = str(tmp_path)
+    with app.test_request_context():
+        url = save_image(FileStorage(_jpeg_con_exif(1000, 500), filename='foto.jpg'), 'barberos')
+        assert url.startswith('/static/uploads/barberos/')
+        nombre = url.rsplit('/', 1)[1].rsplit('.', 1)[0]
+        # Nada se procesa hasta que la vista hace commit
+        assert len(list((tmp_path / 'barberos').iterdir())) == 1
+        db.session.commit()
+        fila = ProcesamientoImagen.query.filter_by(ruta=url).one()
+        assert (fila.estado, fila.derivados) == ('listo', 6)
+        assert fila.placeholder.startswith('data:image/webp;base64,') and len(fila.placeholder) < 400
+
+        # 1280 > ancho original: no se amplía, pero hay una copia a su ancho real
+        generados = sorted(p.name for p in (tmp_path / 'barberos').iterdir())
+        assert generados == sorted([f'{nombre}.jpg'] + [f'{nombre}-{ancho}w.{ext}'
+                                                         for ancho in (320, 640, 1000) for ext in ('jpg', 'webp')])
+        with Image.open(tmp_path / 'barberos' / f'{nombre}-640w.jpg') as derivado:
+            assert derivado.size == (640, 320)
+            assert not derivado.getexif()
+
+        barbero = Barbero(nombre='Con foto', imagen_url=url)
+        base = url.rsplit('.', 1)[0]
+        # El candidato mayor es la imagen completa, con su ancho real
+        assert barbero.srcset() == f'{base}-320w.webp 320w, {base}-640w.webp 640w, {base}-1000w.webp 1000w'
+        assert barbero.srcset('jpg') == f'{base}-320w.jpg 320w, {base}-640w.jpg 640w, {base}-1000w.jpg 1000w'
+        assert Barbero(nombre='Externa', imagen_url='https://example.com/a.jpg').srcset() == ''
+
+
+def test_imagen_invalida_queda_en_error_visible_en_admin(app, client, admin_user, tmp_path):
+    from app import db
+    from app.admin.utils import save_image
+    from app.models.imagen import ProcesamientoImagen
+    from app.models.producto import Producto
+    from tests.conftest import login_as
+
+    app.config['UPLOAD_FOLDER'] = str(tmp_path)
+    datos = _jpeg_con_exif(400, 400).read()
+    cabecera_valida = datos[:len(datos) // 2]  # JPEG truncado: la cabecera se lee bien
+    with app.test_request_context():
+        url = save_image(FileStorage(io.BytesIO(cabecera_valida), filename='rota.jpg'), 'productos')
+        assert url is not None  # La comprobación rápida solo mira la cabecera
+        db.session.add(Producto(nombre='Cera', precio=10, imagen_url=url))
+        db.session.commit()
+        fila = ProcesamientoImagen.query.filter_by(ruta=url).one()
+        assert fila.estado == 'error' and fila.error
+
+    login_as(client, admin_user)
+    assert 'Error al procesar' in client.get('/admin/productos').get_data(as_text=True)
+
+
+def test_subidas_identicas_comparten_archivo_hasta_la_ultima_referencia(app, tmp_path):
+    from app import db
+    from app.admin.utils import save_image
+    from app.models.barbero import Barbero
+    from app.models.imagen import ProcesamientoImagen
+
+    app.config.update(UPLOAD_FOLDER=str(tmp_path), UPLOAD_REUSO_SEGUNDOS=0)
+    datos = _jpeg_con_exif(400, 200).read()
+    with app.test_request_context():
+        urls = [save_image(FileStorage(io.BytesIO(datos), filename=f'foto{i}.JPG'), 'barberos') for i in range(2)]
+        assert urls[0] == urls[1]
+        assert len(urls[0].rsplit('/', 1)[1]) == 64 + len('.jpg')
+        primero, segundo = Barbero(nombre='Uno', imagen_url=urls[0]), Barbero(nombre='Dos', imagen_url=urls[1])
+        db.session.add_all([primero, segundo])
+        db.session.commit()
+        archivos = sorted(p.name for p in (tmp_path / 'barberos').iterdir())
+        assert len(archivos) == 5  # original + derivados de 320w y de su ancho real (400w)
+
+        # Sigue referenciada por el segundo barbero
+        primero.imagen_url = None
+        db.session.commit()
+        assert sorted(p.name for p in (tmp_path / 'barberos').iterdir()) == archivos
+
+        db.session.delete(segundo)
+        db.session.commit()
+        assert list((tmp_path / 'barberos').iterdir()) == []
+        assert ProcesamientoImagen.query.filter_by(ruta=urls[0]).first() is None
+
+
+def test_recolector_borra_solo_huerfanas_fuera_del_periodo_de_gracia(app, tmp_path):
+    import os
+    import time
+    from app import db
+    from app.models.barbero import Barbero
+    from app.utils.uploads import recolectar_huerfanas
+
+    app.config['UPLOAD_FOLDER'] = str(tmp_path / 'uploads')
+    carpeta = tmp_path / 'uploads' / 'barberos'
+    carpeta.mkdir(parents=True)
+    antiguo = time.time() - 3 * 86400
+    for nombre in ('usada.jpg', 'usada-320w.webp', 'huerfana.jpg', 'huerfana-320w.webp', 'reciente.jpg', '.gitkeep'):
+        (carpeta / nombre).write_bytes(b'x' * 10)
+        if nombre != 'reciente.jpg':
+            os.utime(carpeta / nombre, (antiguo, antiguo))
+    db.session.add(Barbero(nombre='Con foto', imagen_url='/static/uploads/barberos/usada.jpg'))
+    db.session.commit()
+
+    with app.app_context():
+        assert recolectar_huerfanas(simular=True)['huerfanos'] == 2
+        resumen = recolectar_huerfanas(cuarentena=str(tmp_path / 'cuarentena'))
+
+    assert resumen == {'revisados': 5, 'huerfanos': 2, 'en_gracia': 1, 'bytes': 20}
+    assert sorted(p.name for p in carpeta.iterdir()) == ['.gitkeep', 'reciente.jpg', 'usada-320w.webp', 'usada.jpg']
+    assert sorted(p.name for p in (tmp_path / 'cuarentena' / 'barberos').iterdir()) == ['huerfana-320w.webp',
+                                                                                      'huerfana.jpg']
+
+
+def test_reoptimizar_biblioteca_renombra_actualiza_referencias_y_es_reanudable(app, tmp_path):
+    import hashlib
+    import time
+    from app import db
+    from app.models.producto import Producto
+    from app.utils.image_processing import reoptimizar_biblioteca
+    from app.utils.uploads import recolectar_huerfanas
+
+    app.config['UPLOAD_FOLDER'] = str(tmp_path)
+    buffer = io.BytesIO()
+    exif = Image.Exif()
+    exif[0x010F] = 'Camara de prueba'
+    Image.effect_noise((1600, 800), 40).convert('RGB').save(buffer, 'JPEG', quality=100, exif=exif)
+    datos = buffer.getvalue()
+    (tmp_path / 'productos').mkdir()
+    nombre = hashlib.sha256(datos).hexdigest() + '.jpg'
+    (tmp_path / 'productos' / nombre).write_bytes(datos)
+    producto = Producto(nombre='Cera', precio=10, imagen_url=f'/static/uploads/productos/{nombre}')
+    db.session.add(producto)
+    db.session.commit()
+
+    with app.app_context():
+        resumen = reoptimizar_biblioteca(procesos=0, ancho_maximo=1000)
+    assert (resumen['archivos'], resumen['recodificados'], resumen['renombrados']) == (1, 1, 1)
+    assert resumen['despues'] < resumen['antes'] == len(datos)
+
+    db.session.refresh(producto)
+    nuevo = producto.imagen_url.rsplit('/', 1)[1]
+    assert nuevo != nombre
+    # El original anterior queda para el recolector, con el periodo de gracia contado desde ahora
+    anterior = tmp_path / 'productos' / nombre
+    assert anterior.exists() and time.time() - anterior.stat().st_mtime < 60
+    with app.app_context():
+        assert reoptimizar_biblioteca(procesos=0)['archivos'] == 0  # Ni el nuevo ni el anterior
+        assert recolectar_huerfanas(gracia_segundos=3600)['huerfanos'] == 0
+        assert recolectar_huerfanas(gracia_segundos=0)['huerfanos'] >= 1
+    assert not anterior.exists() and (tmp_path / 'productos' / nuevo).exists()
+    with Image.open(tmp_path / 'productos' / nuevo) as imagen:
+        assert imagen.size == (1000, 500)
+        assert not imagen.getexif()
+        assert imagen.info.get('progressive') or imagen.info.get('progression')
+    assert resumen['derivados'] == 6  # 320w, 640w y 1000w (ancho real) en WebP y JPEG; no se amplía a 1280
+
+    with app.app_context():
+        assert reoptimizar_biblioteca(procesos=0)['archivos'] == 0
+
+
+def test_placeholder_en_api_de_servicio_y_en_plantillas(app, client, tmp_path):
+    from app import db
+    from app.admin.utils import save_image
+    from app.models.imagen import ProcesamientoImagen
+    from app.models.servicio import Servicio
+    from app.models.servicio_imagen import ServicioImagen
+
+    app.config['UPLOAD_FOLDER'] = str(tmp_path)
+    with app.test_request_context():
+        url = save_image(FileStorage(_jpeg_con_exif(800, 600), filename='galeria.jpg'), 'servicios')
+        servicio = Servicio(nombre='Afeitado', precio=15000, duracion_estimada='30 min')
+        db.session.add(servicio)
+        db.session.flush()
+        db.session.add(ServicioImagen(servicio_id=servicio.id, ruta_imagen=url, orden=0))
+        db.session.commit()
+        placeholder = ProcesamientoImagen.query.filter_by(ruta=url).one().placeholder
+
+    datos = client.get(f'/api/servicio/{servicio.id}').get_json()
+    assert datos['imagenes'] == [url] and datos['placeholders'] == [placeholder]
+    html = client.get('/servicios').get_data(as_text=True)
+    assert f"background:url(&#39;{placeholder}&#39;)" in html and 'loading="lazy"' in html
+
+
+def test_pool_roto_no_rompe_el_commit_y_se_recrea(app, tmp_path, monkeypatch):
+    import os
+    from concurrent.futures import Future
+    from concurrent.futures.process import BrokenProcessPool
+    from app import db
+    from app.admin.utils import save_image
+    from app.models.barbero import Barbero
+    from app.models.imagen import ProcesamientoImagen
+
+    class PoolRoto:
+        cerrado = False
+
+        def submit(self, *args, **kwargs):
+            raise BrokenProcessPool('un proceso hijo terminó de forma abrupta')
+
+        def shutdown(self, wait=True, cancel_futures=False):
+            self.cerrado = True
+
+    procesador = app.extensions['image_processor']
+    roto = PoolRoto()
+    monkeypatch.setattr(procesador, '_pool', roto)
+    monkeypatch.setattr(procesador, '_pid', os.getpid())
+    app.config.update(UPLOAD_FOLDER=str(tmp_path), IMAGE_WORKERS=1)
+    with app.test_request_context():
+        url = save_image(FileStorage(_jpeg_con_exif(400, 200), filename='foto.jpg'), 'barberos')
+        db.session.add(Barbero(nombre='Con foto', imagen_url=url))
+        db.session.commit()  # No propaga el error del pool
+        assert ProcesamientoImagen.query.filter_by(ruta=url).one().estado == ProcesamientoImagen.PENDIENTE
+    assert procesador._pool is None and roto.cerrado and procesador._en_vuelo == 0
+
+    # Un trabajo en vuelo cuando el pool se rompe también vuelve a pendiente
+    monkeypatch.setattr(procesador, '_pool', roto)
+    procesador._en_vuelo = 1
+    futuro = Future()
+    futuro.set_exception(BrokenProcessPool('roto'))
+    procesador._terminado(futuro, url, db.engine, roto)
+    assert procesador._pool is None and procesador._en_vuelo == 0
+    db.session.expire_all()
+    assert ProcesamientoImagen.query.filter_by(ruta=url).one().estado == ProcesamientoImagen.PENDIENTE
@@ -0,0 +1,62 @@
+from decimal import Decimal
+
+from app import db
+from app.models.barbero_servicio import BarberoServicio
+from app.utils.pricing import obtener_matriz_precios, obtener_precio_servicio, obtener_servicios_barbero
+
+
+def test_matriz_de_precios_se_invalida_al_cambiar_precios(app, barbero, servicio):
+    info = obtener_precio_servicio(barbero.id, servicio.id)
+    assert info['precio'] == servicio.precio
+    assert info['es_personalizado'] is False
+    matriz = obtener_matriz_precios()
+    assert obtener_matriz_precios() is matriz
+
+    db.session.add(BarberoServicio(barbero_id=barbero.id, servicio_id=servicio.id,
+                                   precio_personalizado=Decimal('45000')))
+    db.session.commit()
+    assert obtener_matriz_precios() is not matriz
+    info = obtener_precio_servicio(barbero.id, servicio.id)
+    assert (info['precio'], info['es_personalizado']) == (Decimal('45000'), True)
+
+    # Desactivar la configuración vuelve al precio base (también con UPDATE masivo)
+    BarberoServicio.query.filter_by(barbero_id=barbero.id).update({'activo': False})
+    db.session.commit()
+    assert obtener_precio_servicio(barbero.id, servicio.id)['precio'] == servicio.precio
+    item = obtener_servicios_barbero(barbero.id)[0]
+    assert item['activo'] is False
+    assert item['precio_final'] == Decimal('45000')
+
+    assert obtener_precio_servicio(barbero.id, 9999) is None
+
+
+def test_catalogo_reservas_con_etag(client, barbero, servicio):
+    resp = client.get('/api/catalogo-reservas')
+    assert resp.status_code == 200
+    data = resp.get_json()
+    assert [b['id'] for b in data['barberos']] == [barbero.id]
+    assert data['precios'][str(barbero.id)][str(servicio.id)] == [float(servicio.precio), 0]
+
+    etag = resp.headers['ETag']
+    assert client.get('/api/catalogo-reservas', headers={'If-None-Match': etag}).status_code == 304
+
+    # Un servicio desactivado para el barbero desaparece y cambia el ETag
+    db.session.add(BarberoServicio(barbero_id=barbero.id, servicio_id=servicio.id, activo=False))
+    db.session.commit()
+    resp = client.get('/api/catalogo-reservas', headers={'If-None-Match': etag})
+    assert resp.status_code == 200
+    assert resp.get_json()['precios'][str(barbero.id)] == {}
+
+
+def test_servicios_barbero_desde_la_cache(app, barbero, servicio):
+    from tests.test_catalogo import _contar_consultas
+
+    assert [item['servicio'].id for item in obtener_servicios_barbero(barbero.id)] == [servicio.id]
+    consultas, quitar = _contar_consultas(app)
+    try:
+        item = obtener_servicios_barbero(barbero.id)[0]
+    finally:
+        quitar()
+    assert consultas == []
+    assert (item['precio_final'], item['activo']) == (servicio.precio, True)
+    assert item['servicio'].get_duracion_minutos() == 30
@@ -0,0 +1,73 @@
+from app.utils.rate_limit import parse_limite
+
+
+def test_parse_limite():
+    assert parse_limite('30/minute') == (30, 60)
+    assert parse_limite('5/10seconds') == (5, 10)
+
+
+def test_agendar_cita_limitado_por_ip(app, client, barbero, servicio):
+    app.config['RATELIMIT_ENABLED'] = True
+    limiter = app.extensions['rate_limiter']
+    limiter.backend.reset()
+    limiter._limites['agendar_cita'] = parse_limite('2/minute')
+
+    payload = {'barbero_id': barbero.id, 'servicio_id': servicio.id, 'fecha': '2026-09-01',
+               'nombre': 'Cliente', 'email': 'c@test.com', 'telefono': '3000000000'}
+    for hora in ('10:00', '11:00'):
+        resp = client.post('/api/agendar-cita', json=dict(payload, hora=hora))
+        assert resp.status_code == 200
+        assert 'X-RateLimit-Remaining' in resp.headers
+
+    bloqueada = client.post('/api/agendar-cita', json=dict(payload, hora='12:00'))
+    assert bloqueada.status_code == 429
+    assert int(bloqueada.headers['Retry-After']) >= 1
+
+    # Otra IP tiene su propio cubo
+    resp = client.post('/api/agendar-cita', json=dict(payload, hora='12:00'),
+                       environ_base={'REMOTE_ADDR': '10.0.0.2'})
+    assert resp.status_code == 200
+
+
+def test_backend_en_memoria_acotado_con_parametros_por_cubo(monkeypatch):
+    from app.utils import rate_limit as modulo
+    from app.utils.rate_limit import MemoryBackend
+
+    reloj = [1000.0]
+    monkeypatch.setattr(modulo.time, 'monotonic', lambda: reloj[0])
+    backend = MemoryBackend(max_claves=3)
+    # Cubo lento de otro endpoint, agotado: no debe descartarse con la tasa de uno rápido
+    assert backend.consumir('lento:1.1.1.1', 1, 3600)[0]
+    for ip in range(10):  # Tráfico nunca limitado desde muchas IPs
+        assert backend.consumir(f'rapido:10.0.0.{ip}', 10, 1)[0]
+        reloj[0] += 5
+    assert len(backend._cubos) <= 3
+    assert 'lento:1.1.1.1' in backend._cubos
+    assert not backend.consumir('lento:1.1.1.1', 1, 3600)[0]
+
+
+def test_contacto_limitado_devuelve_pagina_html(app, client):
+    app.config['RATELIMIT_ENABLED'] = True
+    limiter = app.extensions['rate_limiter']
+    limiter.backend.reset()
+    limiter._limites['contacto'] = parse_limite('1/minute')
+    datos = {'nombre': 'Ana', 'email': 'ana@test.com', 'telefono': '3000000000',
+             'asunto': 'Hola', 'mensaje': 'Consulta'}
+    assert client.post('/contacto', data=datos).status_code == 201
+    resp = client.post('/contacto', data=datos)
+    assert resp.status_code == 429
+    assert resp.mimetype == 'text/html' and 'Demasiadas solicitudes' in resp.get_data(as_text=True)
+
+
+def test_sin_proxy_no_se_confia_en_x_forwarded_for(app, client):
+    assert app.config['RATELIMIT_PROXY_COUNT'] == 0
+    app.config['RATELIMIT_ENABLED'] = True
+    limiter = app.extensions['rate_limiter']
+    limiter.backend.reset()
+    limiter._limites['contacto'] = parse_limite('1/minute')
+    datos = {'nombre': 'Ana', 'email': 'ana@test.com', 'telefono': '3000000000',
+             'asunto': 'Hola', 'mensaje': 'Consulta'}
+    assert client.post('/contacto', data=datos).status_code == 201
+    # Cambiar la cabecera no da un cubo nuevo
+    resp = client.post('/contacto', data=datos, headers={'X-Forwarded-For': '203.0.113.9'})
+    assert resp.status_code == 429
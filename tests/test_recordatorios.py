@@ -0,0 +1,40 @@
+from datetime import datetime, timedelta
+
+from app import db, mail
+from app.models.cliente import Cita, Cliente
+from app.models.email import send_appointment_reminders
+
+
+def _cita(barbero, servicio, cliente, horas, estado='confirmada'):
+    cita = Cita(cliente_id=cliente.id, barbero_id=barbero.id, servicio_id=servicio.id,
+                fecha=datetime.now() + timedelta(hours=horas), estado=estado)
+    db.session.add(cita)
+    return cita
+
+
+def test_recordatorios_por_ventana_e_idempotentes(app, barbero, servicio):
+    cliente = Cliente(nombre='Ana', email='ana@test.com')
+    db.session.add(cliente)
+    db.session.flush()
+    manana = _cita(barbero, servicio, cliente, 20)
+    pronto = _cita(barbero, servicio, cliente, 1)
+    _cita(barbero, servicio, cliente, 20, estado='pendiente_confirmacion')
+    _cita(barbero, servicio, cliente, 30)
+    db.session.commit()
+
+    with mail.record_messages() as enviados:
+        r24 = send_appointment_reminders('24h', tamano_lote=1)
+        r2 = send_appointment_reminders('2h')
+    assert (r24['enviados'], r2['enviados']) == (1, 1)
+    assert len(enviados) == 2
+    assert 'Barbero de Prueba' in enviados[0].body
+
+    db.session.expire_all()
+    assert db.session.get(Cita, manana.id).recordatorio_24h_enviado is not None
+    assert db.session.get(Cita, pronto.id).recordatorio_2h_enviado is not None
+
+    # Una segunda ejecución no reenvía nada
+    with mail.record_messages() as enviados:
+        assert send_appointment_reminders('24h')['enviados'] == 0
+        assert send_appointment_reminders('2h')['enviados'] == 0
+    assert enviados == []
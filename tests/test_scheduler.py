@@ -0,0 +1,103 @@
+from datetime import timedelta
+
+from app import db
+from app.models.tareas import TareaProgramada
+from tests.conftest import login_as
+
+
+def test_tarea_se_ejecuta_una_vez_por_intervalo(app):
+    scheduler = app.extensions['scheduler']
+    llamadas = []
+    scheduler.tarea('prueba', cada=timedelta(hours=1))(lambda: llamadas.append(1) or {'ok': True})
+    try:
+        tarea = scheduler.tareas['prueba']
+        assert scheduler.ejecutar_si_corresponde(tarea) is True
+        # Todavía no toca: otra vuelta (o otro worker) no la repite
+        assert scheduler.ejecutar_si_corresponde(tarea) is False
+        assert len(llamadas) == 1
+
+        estado = db.session.get(TareaProgramada, 'prueba')
+        assert estado.ejecuciones == 1
+        assert estado.lease_owner is None
+        assert TareaProgramada.resultado_de('prueba') == {'ok': True}
+
+        # Un lease vigente de otro proceso impide la ejecución aunque se fuerce
+        TareaProgramada.query.filter_by(nombre='prueba').update(
+            {'lease_owner': 'otro-worker', 'lease_expira': estado.proxima_ejecucion})
+        db.session.commit()
+        assert scheduler.ejecutar_si_corresponde(tarea, forzar=True) is False
+        assert len(llamadas) == 1
+    finally:
+        scheduler.tareas.pop('prueba', None)
+
+
+def test_panel_mantenimiento_muestra_tareas(client, admin_user):
+    login_as(client, admin_user)
+    resp = client.get('/admin/mantenimiento')
+    assert resp.status_code == 200
+    assert b'expirar_citas' in resp.data
+
+    resp = client.post('/admin/mantenimiento/expirar_citas/ejecutar')
+    assert resp.status_code == 302
+    assert db.session.get(TareaProgramada, 'expirar_citas').proxima_ejecucion is not None
+
+
+def test_fusionar_clientes_duplicados_por_email(app, barbero, servicio):
+    from datetime import datetime
+    from app.models.cliente import Cita, Cliente, Mensaje
+    from app.models.tareas import fusionar_clientes_duplicados
+
+    assert 'fusionar_clientes' not in app.extensions['scheduler'].tareas  # Solo manual
+
+    original = Cliente(nombre='Ana', email='ana@test.com', telefono='300 123 4567', total_visitas=2)
+    otro = Cliente(nombre='Luis', email='luis@test.com', telefono='311 000 0000')
+    db.session.add_all([original, otro])
+    db.session.flush()
+    # Registro antiguo sin normalizar (anterior a la validación del email)
+    copia_id = db.session.execute(Cliente.__table__.insert().values(
+        nombre='Ana M.', email=' ANA@test.com', telefono=None, total_visitas=3,
+        ultima_visita=datetime(2024, 5, 1))).inserted_primary_key[0]
+    # Comparte teléfono con Ana pero es otra persona: se informa, no se fusiona
+    familiar = Cliente(nombre='Marta', email='marta@test.com', telefono='+57 300-123-4567')
+    db.session.add(familiar)
+    db.session.flush()
+    for cliente_id in (original.id, copia_id, copia_id):
+        db.session.add(Cita(cliente_id=cliente_id, barbero_id=barbero.id, servicio_id=servicio.id,
+                            fecha=datetime(2024, 5, 1, 10), estado='completada'))
+    db.session.add(Mensaje(cliente_id=copia_id, mensaje='Hola'))
+    db.session.commit()
+    original_id, familiar_id = original.id, familiar.id
+
+    simulado = fusionar_clientes_duplicados(simular=True)
+    assert simulado['duplicados'] == 1
+    assert simulado['por_confirmar'] == [[original_id, familiar_id]]
+    assert Cliente.query.count() == 4
+
+    resumen = fusionar_clientes_duplicados(tamano_lote=1)
+    assert resumen == {'grupos': 1, 'duplicados': 1, 'citas_reasignadas': 2, 'mensajes_reasignados': 1,
+                       'por_confirmar': [[original_id, familiar_id]]}
+    db.session.expire_all()
+    assert db.session.get(Cliente, copia_id) is None
+    assert db.session.get(Cliente, familiar_id) is not None
+    conservado = db.session.get(Cliente, original_id)
+    assert conservado.total_visitas == 5
+    assert conservado.ultima_visita == datetime(2024, 5, 1)
+    assert conservado.segmento == conservado.clasificar_segmento() == 'inactivo'
+    assert Cita.query.filter_by(cliente_id=original_id).count() == 3
+    assert Mensaje.query.filter_by(cliente_id=original_id).count() == 1
+    # Una segunda ejecución no encuentra nada que fusionar
+    assert fusionar_clientes_duplicados()['duplicados'] == 0
+
+
+def test_fallo_de_limpiar_bloqueos_queda_registrado(app, monkeypatch):
+    import app.models.tareas as tareas
+
+    class BloqueoRoto:
+        @property
+        def query(self):
+            raise RuntimeError('tabla no disponible')
+
+    monkeypatch.setattr(tareas, 'BloqueoHorario', BloqueoRoto())
+    scheduler = app.extensions['scheduler']
+    assert scheduler.ejecutar_si_corresponde(scheduler.tareas['limpiar_bloqueos'], forzar=True) is True
+    assert 'tabla no disponible' in db.session.get(TareaProgramada, 'limpiar_bloqueos').ultimo_error
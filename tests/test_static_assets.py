@@ -0,0 +1,109 @@
+import re
+
+from flask import url_for
+
+
+def test_url_static_con_huella_y_cache_inmutable(app, client):
+    with app.test_request_context():
+        url = url_for('static', filename='css/public_styles.css')
+        subida = url_for('static', filename='uploads/servicios/foto.jpg')
+    assert re.fullmatch(r'/static/css/public_styles\.[0-9a-f]{12}\.css', url)
+    assert subida == '/static/uploads/servicios/foto.jpg'
+
+    resp = client.get(url)
+    assert resp.status_code == 200
+    assert resp.headers['Cache-Control'] == 'public, max-age=31536000, immutable'
+    with open(f'{app.static_folder}/css/public_styles.css', 'rb') as archivo:
+        assert resp.data == archivo.read()
+    resp.close()
+
+    # El nombre original sigue funcionando, sin caché de un año
+    resp = client.get('/static/css/public_styles.css')
+    assert resp.status_code == 200
+    assert 'immutable' not in resp.headers.get('Cache-Control', '')
+    resp.close()
+
+    assert url.encode() in client.get('/contacto').data
+
+
+def test_variantes_precomprimidas_por_accept_encoding(tmp_path):
+    import gzip
+
+    from flask import Flask
+
+    from app.utils.static_assets import StaticAssets, comprimir_carpeta
+
+    (tmp_path / 'css').mkdir()
+    contenido = b'body { color: #111; }\n' * 200
+    (tmp_path / 'css' / 'app.css').write_bytes(contenido)
+    (tmp_path / 'logo.png').write_bytes(b'\x89PNG' + b'\0' * 100)
+
+    resumen = comprimir_carpeta(str(tmp_path))
+    assert resumen['archivos'] == 1  # Las imágenes no se comprimen
+    assert (tmp_path / 'css' / 'app.css.gz').exists()
+    assert comprimir_carpeta(str(tmp_path))['generados'] == 0  # Ya al día
+
+    app = Flask(__name__, static_folder=str(tmp_path))
+    StaticAssets(app)
+    cliente = app.test_client()
+    with app.test_request_context():
+        url = url_for('static', filename='css/app.css')
+
+    resp = cliente.get(url, headers={'Accept-Encoding': 'gzip, deflate'})
+    assert resp.headers['Content-Encoding'] == 'gzip'
+    assert resp.headers['Content-Type'].startswith('text/css')
+    assert 'Accept-Encoding' in resp.headers['Vary']
+    assert gzip.decompress(resp.data) == contenido
+    resp.close()
+
+    resp = cliente.get(url, headers={'Accept-Encoding': 'identity'})
+    assert 'Content-Encoding' not in resp.headers
+    assert 'Accept-Encoding' in resp.headers['Vary']
+    assert resp.data == contenido
+    resp.close()
+
+
+def test_descarga_delegada_en_nginx_o_x_sendfile(app, client, tmp_path):
+    from flask import Flask
+
+    from app.utils.static_assets import StaticAssets
+
+    app.config['FILE_OFFLOAD'] = 'x-accel'
+    with app.test_request_context():
+        url = url_for('static', filename='css/public_styles.css')
+    resp = client.get(url)
+    assert resp.status_code == 200 and resp.data == b''
+    assert resp.headers['X-Accel-Redirect'] == '/_archivos/css/public_styles.css'
+    assert resp.headers['Content-Type'].startswith('text/css')
+    assert resp.headers['Cache-Control'] == 'public, max-age=31536000, immutable'
+    assert client.get('/ads.txt').headers['X-Accel-Redirect'] == '/_archivos/ads.txt'
+    assert client.get('/static/no-existe.css').status_code == 404
+
+    (tmp_path / 'logo.png').write_bytes(b'\x89PNG' + b'\0' * 100)
+    otra = Flask(__name__, static_folder=str(tmp_path))
+    otra.config['FILE_OFFLOAD'] = 'x-sendfile'
+    StaticAssets(otra)
+    with otra.test_request_context():
+        url = url_for('static', filename='logo.png')
+    resp = otra.test_client().get(url)
+    assert resp.headers['X-Sendfile'] == str(tmp_path / 'logo.png') and resp.data == b''
+
+
+def test_variante_desactualizada_no_se_registra(tmp_path):
+    import os
+
+    from app.utils.static_assets import StaticAssets, comprimir_carpeta
+
+    original = tmp_path / 'app.js'
+    original.write_bytes(b'console.log("v1");\n' * 200)
+    comprimir_carpeta(str(tmp_path))
+    assets = StaticAssets()
+    assets.construir(str(tmp_path))
+    assert 'gzip' in assets.variantes['app.js']
+
+    # Despliegue que cambia el original sin regenerar la variante
+    original.write_bytes(b'console.log("v2");\n' * 200)
+    marca = os.path.getmtime(str(original) + '.gz') + 10
+    os.utime(original, (marca, marca))
+    assets.construir(str(tmp_path))
+    assert assets.variantes == {}